@@ -0,0 +1,227 @@
+"""Bounded LRU cache of the server, and the signature fingerprints PBTs are cached by"""
+
+# pylint: disable=invalid-name
+
+import ast
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+# pylint: disable-next=too-many-instance-attributes
+class LruCache:
+    """Bounded, thread-safe LRU cache. Entries can be given a time to live (in seconds)
+    and a weight (e.g. their size), in which case the total weight is bounded by maxWeight
+    """
+
+    def __init__(self, maxSize: int, maxWeight: int = None) -> None:
+        self.maxSize = maxSize
+        self.maxWeight = maxWeight
+        self.weight = 0
+        self.entries: OrderedDict = (
+            OrderedDict()
+        )  # key -> (value, expiresAt | None, weight)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Value of key, or default when it is missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if (
+                entry is not None
+                and entry[1] is not None
+                and entry[1] <= time.monotonic()
+            ):
+                del self.entries[key]
+                self.weight -= entry[2]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, ttl: float = None, weight: int = 1):
+        """Adds or replaces key, evicting the least recently used entries over the bounds"""
+        with self.lock:
+            expiresAt = time.monotonic() + ttl if ttl is not None else None
+            if key in self.entries:
+                self.weight -= self.entries[key][2]
+            self.entries[key] = (value, expiresAt, weight)
+            self.entries.move_to_end(key)
+            self.weight += weight
+
+            while len(self.entries) > self.maxSize or (
+                self.maxWeight is not None
+                and self.weight > self.maxWeight
+                and len(self.entries) > 1
+            ):
+                _, evicted = self.entries.popitem(last=False)
+                self.weight -= evicted[2]
+                self.evictions += 1
+
+    def clear(self):
+        """Removes all entries, the statistics are kept"""
+        with self.lock:
+            self.entries.clear()
+            self.weight = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def getStats(self) -> dict:
+        """Size, weight, bounds, hits, misses and evictions of the cache"""
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "maxSize": self.maxSize,
+                "weight": self.weight,
+                "maxWeight": self.maxWeight,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def _dumpSignature(node: ast.AST) -> str:
+    """Dumps everything of a function or class definition that ghostwriter looks at
+    (signature, annotations, defaults, decorators and docstring), but not its body"""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        parts = [
+            type(node).__name__,
+            node.name,
+            ast.dump(node.args),
+            ast.dump(node.returns) if node.returns else "",
+            str(ast.get_docstring(node)),
+        ]
+        parts += [ast.dump(d) for d in node.decorator_list]
+        return "\n".join(parts)
+
+    if isinstance(node, ast.ClassDef):
+        parts = ["class", node.name, str(ast.get_docstring(node))]
+        parts += [ast.dump(b) for b in node.bases + node.keywords + node.decorator_list]
+        parts += [
+            _dumpSignature(child)
+            for child in node.body
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        ]
+        return "\n".join(parts)
+
+    return ""
+
+
+def _getSignatureNodes(node: ast.AST) -> list:
+    """The parts of a definition that _dumpSignature looks at, where referenced names can appear"""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return [
+            node.args,
+            *([node.returns] if node.returns else []),
+            *node.decorator_list,
+        ]
+    if isinstance(node, ast.ClassDef):
+        nodes = node.bases + node.keywords + node.decorator_list
+        for child in node.body:
+            nodes += (
+                _getSignatureNodes(child)
+                if not isinstance(child, ast.AnnAssign)
+                else [child]
+            )
+        return nodes
+    return [node]
+
+
+def _getReferencedNames(nodes: list) -> set:
+    """Names used in nodes, e.g. 'Point' in 'p: Point' and 'models' in 'm: models.User'"""
+    return {
+        child.id
+        for node in nodes
+        for child in ast.walk(node)
+        if isinstance(child, ast.Name)
+    }
+
+
+def _getModuleDefinitions(tree: ast.Module) -> dict:
+    """Top-level statements of a module by the names they define"""
+    definitions = {}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names = [node.name]
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names = [
+                n.id
+                for target in targets
+                for n in ast.walk(target)
+                if isinstance(n, ast.Name)
+            ]
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names = [(alias.asname or alias.name).split(".")[0] for alias in node.names]
+        elif type(node).__name__ == "TypeAlias":  # Python 3.12+
+            names = [node.name.id]
+        else:
+            continue
+        for name in names:
+            definitions.setdefault(name, []).append(node)
+    return definitions
+
+
+def _dumpReferencedDefinitions(trees: list, moduleTree: ast.Module) -> list[str]:
+    """Dumps the module-level definitions (types, aliases, imports, ...) the signatures of
+    the SUTs refer to, and those these refer to in turn. Classes are dumped whole, as
+    ghostwriter builds strategies from their fields and constructors"""
+    definitions = _getModuleDefinitions(moduleTree)
+    pending = sorted(
+        _getReferencedNames(
+            [
+                n
+                for tree in trees
+                for node in tree.body
+                for n in _getSignatureNodes(node)
+            ]
+        )
+    )
+    seen = set()
+    dumps = []
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        for node in definitions.get(name, []):
+            dumps.append(name + "=" + ast.dump(node))
+            pending += sorted(_getReferencedNames(_getSignatureNodes(node)) - seen)
+    return sorted(dumps)
+
+
+def makeSignatureFingerprint(
+    sutNames: list[str], sutSourceList: list[str], moduleTree: ast.Module = None
+):
+    """Returns a hash of the signatures of the SUTs, ignoring their bodies, and of the
+    module-level definitions of moduleTree these signatures refer to (when given).
+    Returns None when a source cannot be parsed"""
+    digest = hashlib.sha1()
+
+    for name in sutNames:
+        digest.update(name.encode("utf-8") + b"\0")
+
+    trees = []
+    for source in sutSourceList:
+        try:
+            trees.append(ast.parse(source))
+        except SyntaxError:
+            return None
+        for node in trees[-1].body:
+            digest.update(_dumpSignature(node).encode("utf-8") + b"\0")
+
+    if moduleTree is not None:
+        for dump in _dumpReferencedDefinitions(trees, moduleTree):
+            digest.update(dump.encode("utf-8") + b"\0")
+
+    return digest.hexdigest()
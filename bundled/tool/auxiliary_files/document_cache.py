@@ -0,0 +1,60 @@
+"""Cache of parsed documents, shared by the handlers that read the same sources"""
+
+# pylint: disable=invalid-name
+
+import ast
+import hashlib
+import threading
+
+from auxiliary_files.caching import LruCache
+
+# Bounds of the document cache: number of documents and total size of their sources
+DOCUMENT_CACHE_SIZE = 64
+DOCUMENT_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+
+# pylint: disable-next=too-few-public-methods
+class ParsedDocument:
+    """A parsed source and the data derived from it (function list, symbols, ...).
+    The tree is shared by all handlers and must not be modified"""
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.tree = ast.parse(source)
+        self.derived = {}
+        self.lock = threading.Lock()
+
+    def getDerived(self, name: str, compute):
+        """Returns compute(tree), computing it only the first time it is asked for"""
+        with self.lock:
+            if name not in self.derived:
+                self.derived[name] = compute(self.tree)
+            return self.derived[name]
+
+
+DOCUMENT_CACHE = LruCache(DOCUMENT_CACHE_SIZE, DOCUMENT_CACHE_MAX_BYTES)
+
+
+def getDocumentKey(source: str, uri: str = None, version: int = None):
+    """(uri, version) when both are given, the hash of the source otherwise"""
+    if uri is not None and version is not None:
+        return (uri, version)
+    return hashlib.sha1(source.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def getParsedDocument(
+    source: str, uri: str = None, version: int = None
+) -> ParsedDocument:
+    """Returns the parsed document of a source (keyed by URI and version when given,
+    by content hash otherwise). Raises SyntaxError like ast.parse"""
+    key = getDocumentKey(source, uri, version)
+    document = DOCUMENT_CACHE.get(key)
+    if document is None:
+        document = ParsedDocument(source)
+        DOCUMENT_CACHE.put(key, document, weight=len(source))
+    return document
+
+
+def parseSource(source: str) -> ast.Module:
+    """Cached, read-only replacement of ast.parse"""
+    return getParsedDocument(source).tree
@@ -0,0 +1,233 @@
+"""Incrementally updated index of the functions of open documents"""
+
+# pylint: disable=invalid-name
+
+import ast
+import threading
+
+from auxiliary_files.symbol_table import SymbolTable
+
+# Syntax errors that may be caused by a bracket or string continuing after the parsed region
+CONTINUATION_ERRORS = ("never closed", "unterminated", "EOF")
+
+
+def collectFunctions(node: ast.AST, lineOffset: int = 0) -> list[dict]:
+    """Returns the functions and methods defined in a (top-level) node, in the format of
+    custom/getDefinedFunctionsFromFile. lineOffset is added to all line numbers"""
+    return SymbolTable(node, lineOffset).getFunctions()
+
+
+def mergeFunctions(functionLists) -> list[dict]:
+    """Merges per-block function lists, later definitions replacing earlier ones
+    with the same name"""
+    functions = {}
+    for functionList in functionLists:
+        for function in functionList:
+            functions[function["name"]] = function
+    return list(functions.values())
+
+
+def getStatementStart(node: ast.stmt) -> int:
+    """First line of a statement, including its decorators"""
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [d.lineno for d in decorators])
+
+
+# pylint: disable-next=too-few-public-methods
+class Block:
+    """A top-level statement (1-based, inclusive line range) and the functions it defines"""
+
+    __slots__ = ("start", "end", "functions")
+
+    def __init__(self, start: int, end: int, functions: list[dict]) -> None:
+        self.start = start
+        self.end = end
+        self.functions = functions
+
+    def shift(self, delta: int):
+        """Moves the block and its functions delta lines down"""
+        self.start += delta
+        self.end += delta
+        for function in self.functions:
+            function["lineStart"] += delta
+            function["lineEnd"] += delta
+
+
+def parseBlocks(source: str, lineOffset: int = 0) -> list[Block]:
+    """Parses a source made of whole top-level statements into blocks. Raises SyntaxError"""
+    tree = ast.parse(source)
+    return [
+        Block(
+            getStatementStart(node) + lineOffset,
+            node.end_lineno + lineOffset,
+            collectFunctions(node, lineOffset),
+        )
+        for node in tree.body
+    ]
+
+
+class FunctionIndex:
+    """Function index of an open document, updated incrementally from didChange ranges.
+
+    Only the top-level blocks touched by an edit (and their neighbours) are re-parsed.
+    While the document has a syntax error, the last good list of functions is served."""
+
+    def __init__(self, lines: list[str]) -> None:
+        self.lock = threading.Lock()
+        self.blocks: list[Block] = []
+        self.dirty: list[list[int]] = (
+            []
+        )  # line ranges (1-based, inclusive) that need parsing
+        self.lastGood: list[dict] = []
+        self.fullParses = 0
+        self.regionParses = 0
+        self.rebuild(lines)
+
+    def rebuild(self, lines: list[str]) -> bool:
+        """Parses the whole document from scratch (e.g. after a full text replacement).
+        Returns False, keeping the last good function list, on syntax errors"""
+        self.blocks = []
+        self.dirty = [[1, max(1, len(lines))]]
+        return self._fullParse(lines)
+
+    def _fullParse(self, lines: list[str]) -> bool:
+        self.fullParses += 1
+        try:
+            blocks = parseBlocks("".join(lines))
+        except SyntaxError:
+            return False
+
+        self.blocks = blocks
+        self.dirty = []
+        self.lastGood = mergeFunctions(b.functions for b in blocks)
+        return True
+
+    def _isLocalError(self, error: SyntaxError, regionLength: int) -> bool:
+        """Whether a syntax error in a region also is one in the whole document.
+        Regions start at a statement boundary, so only errors at their end, or caused
+        by something left open, may disappear when the rest of the document follows"""
+        if error.lineno is None or error.lineno >= regionLength:
+            return False
+        return not any(message in str(error.msg) for message in CONTINUATION_ERRORS)
+
+    def _getReparsedBlocks(self, start: int, end: int):
+        """(first, last) indexes of the blocks touching the 1-based lines start..end,
+        plus one neighbour on each side, which are re-parsed"""
+        touched = [
+            i for i, b in enumerate(self.blocks) if b.end >= start and b.start <= end
+        ]
+        if touched:
+            return max(touched[0] - 1, 0), min(touched[-1] + 1, len(self.blocks) - 1)
+        after = next(
+            (i for i, b in enumerate(self.blocks) if b.start > end),
+            len(self.blocks),
+        )
+        return max(after - 1, 0), min(after, len(self.blocks) - 1)
+
+    def applyChange(self, startLine: int, endLine: int, text: str):
+        """Records a change replacing the 0-based lines startLine..endLine with text"""
+        start = startLine + 1
+        end = endLine + 1
+        newEnd = start + text.count("\n")
+        delta = newEnd - end
+
+        first, last = self._getReparsedBlocks(start, end)
+        regionStart, regionEnd = start, newEnd
+        if self.blocks:
+            regionStart = min(regionStart, self.blocks[first].start)
+            lastBlock = self.blocks[last]
+            regionEnd = max(
+                regionEnd, lastBlock.end + (delta if lastBlock.end >= end else 0)
+            )
+
+        self._dropBlocks(first, last, end, delta)
+
+        dirty = []
+        for region in self.dirty:
+            if region[0] > end:
+                region = [region[0] + delta, region[1] + delta]
+            elif region[1] >= start:
+                region = [region[0], max(region[1] + delta, start)]
+            dirty.append(region)
+        dirty.append([regionStart, regionEnd])
+        self.dirty = self._mergeRegions(dirty)
+
+    def _dropBlocks(self, first: int, last: int, end: int, delta: int):
+        """Drops the blocks first..last and moves those after line end delta lines down"""
+        kept = []
+        for i, block in enumerate(self.blocks):
+            if first <= i <= last:
+                continue
+            if block.start > end:
+                block.shift(delta)
+            kept.append(block)
+        self.blocks = kept
+
+    def _mergeRegions(self, regions):
+        regions.sort()
+        merged = []
+        for region in regions:
+            if merged and region[0] <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], region[1])
+            else:
+                merged.append(list(region))
+        return merged
+
+    def _expandRegions(self, lineCount: int):
+        """Widens the dirty regions to all lines between the kept blocks around them,
+        so that each region starts and ends at a statement boundary"""
+        regions = []
+        for regionStart, regionEnd in self.dirty:
+            before = [b.end for b in self.blocks if b.end < regionStart]
+            after = [b.start for b in self.blocks if b.start > regionEnd]
+            regions.append(
+                [max(before, default=0) + 1, min(after, default=lineCount + 1) - 1]
+            )
+        return [r for r in self._mergeRegions(regions) if r[0] <= r[1]]
+
+    def reparse(self, lines: list[str]) -> bool:
+        """Parses the dirty regions of the (already updated) document lines.
+        Falls back to a full parse when a region cannot be parsed on its own (e.g. a string
+        continues after it). On syntax errors, the regions stay dirty until the next change
+        """
+        if not self.dirty:
+            return True
+
+        # A region may not cut a block that was kept
+        for regionStart, regionEnd in self.dirty:
+            for block in self.blocks:
+                if block.start <= regionEnd and block.end >= regionStart:
+                    return self._fullParse(lines)
+
+        newBlocks = []
+        for regionStart, regionEnd in self._expandRegions(len(lines)):
+            self.regionParses += 1
+            try:
+                newBlocks += parseBlocks(
+                    "".join(lines[regionStart - 1 : regionEnd]), regionStart - 1
+                )
+            except SyntaxError as error:
+                if self._isLocalError(error, regionEnd - regionStart + 1):
+                    return False
+                return self._fullParse(lines)
+
+        self.blocks = sorted(self.blocks + newBlocks, key=lambda b: b.start)
+        self.dirty = []
+        self.lastGood = mergeFunctions(b.functions for b in self.blocks)
+        return True
+
+    def update(self, changes, lines: list[str]) -> bool:
+        """Applies didChange content changes. changes are (startLine, endLine, text) tuples,
+        or None for a full text replacement. lines are the document lines after the changes
+        """
+        with self.lock:
+            for change in changes:
+                if change is None:
+                    return self.rebuild(lines)
+                self.applyChange(*change)
+            return self.reparse(lines)
+
+    def getFunctions(self) -> list[dict]:
+        """The functions of the document, or of its last version without syntax errors"""
+        with self.lock:
+            return [dict(f) for f in self.lastGood]
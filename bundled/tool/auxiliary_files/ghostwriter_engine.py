@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import os
+import sys
+import threading
+import traceback
+import types
+
+import lsp_utils as utils
+
+# Guards sys.modules while modules are (re)loaded, as requests may be served by several threads
+MODULE_LOCK = threading.RLock()
+
+
+def getGhostwriter():
+    """`hypothesis.extra.ghostwriter`, imported on first use: importing it (and hypothesis
+    and black with it) takes a few hundred milliseconds"""
+    return importlib.import_module("hypothesis.extra.ghostwriter")
+
+
+def getHypothesisVersion() -> str:
+    return importlib.import_module("hypothesis").__version__
+
+
+def getWriterName(argument: str, functionCount: int) -> str:
+    """Maps a ghostwriter CLI argument (e.g. '--roundtrip') to the name of the
+    `hypothesis.extra.ghostwriter` function the CLI would have called"""
+    writer = argument[2:].replace("-", "_") if argument else "magic"
+    if writer == "binary_op":
+        writer = "binary_operation"
+
+    # Same adjustments as `hypothesis write`
+    if writer == "roundtrip" and functionCount == 1:
+        writer = "idempotent"
+    elif "equivalent" in writer and functionCount == 1:
+        writer = "fuzz"
+
+    return writer
+
+
+def getDefaultStyle() -> str:
+    """The CLI writes pytest-style tests when pytest is importable"""
+    return "pytest" if importlib.util.find_spec("pytest") else "unittest"
+
+
+def loadModule(moduleName: str, cwd: str):
+    """Imports (or re-imports when the file changed) the module the way the CLI would,
+    with `cwd` on the import path"""
+    with MODULE_LOCK:
+        return _loadModule(moduleName, cwd)
+
+
+def _loadModule(moduleName: str, cwd: str):
+    filePath = os.path.join(cwd, moduleName.replace(".", os.sep) + ".py")
+
+    # cwd is on the import path of this thread only while the module (and the ones it
+    # imports) is loaded, other threads do not see it
+    with utils.thread_import_path(cwd):
+        if not os.path.isfile(filePath):
+            return importlib.import_module(moduleName)
+
+        module = sys.modules.get(moduleName)
+        if module is not None and _isUpToDate(module, filePath):
+            return module
+
+        # Modules of the workspace it imported may have changed too: they are imported again
+        for name in getattr(module, "__easypbt_dependencies__", {}):
+            sys.modules.pop(name, None)
+
+        mtime = os.path.getmtime(filePath)
+        loaded = set(sys.modules)
+        spec = importlib.util.spec_from_file_location(moduleName, filePath)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[moduleName] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[moduleName]
+            raise
+
+    module.__easypbt_mtime__ = mtime
+    module.__easypbt_dependencies__ = _getWorkspaceModules(
+        set(sys.modules) - loaded - {moduleName}, cwd
+    )
+    return module
+
+
+def _getWorkspaceModules(names: set, cwd: str) -> dict:
+    """{name: (path, mtime)} of the modules loaded from files of the workspace (not of an
+    environment inside it)"""
+    modules = {}
+    root = os.path.abspath(cwd)
+    for name in names:
+        path = getattr(sys.modules.get(name), "__file__", None)
+        if not path or "site-packages" in path.split(os.sep):
+            continue
+        try:
+            if os.path.commonpath([root, os.path.abspath(path)]) == root:
+                modules[name] = (path, os.path.getmtime(path))
+        except (OSError, ValueError):
+            continue
+    return modules
+
+
+def _isUpToDate(module, filePath: str) -> bool:
+    """True when neither the module's file nor those of the workspace modules it imported changed"""
+    try:
+        if getattr(module, "__easypbt_mtime__", None) != os.path.getmtime(filePath):
+            return False
+        return all(
+            os.path.getmtime(path) == mtime
+            for path, mtime in getattr(module, "__easypbt_dependencies__", {}).values()
+        )
+    except OSError:
+        return False
+
+
+def resolveFunction(module, name: str):
+    """Gets a function (e.g. 'func') or method (e.g. 'Class.method') from a module"""
+    obj = module
+    for part in name.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+def writeForFunctions(functions: list, argument: str) -> str:
+    """Calls the ghostwriter function the CLI would have used with the CLI's defaults"""
+    writer = getattr(getGhostwriter(), getWriterName(argument, len(functions)))
+    return writer(*functions, except_=(), style=getDefaultStyle(), annotate=None)
+
+
+def writeUsingGhostwriter(
+    moduleName: str, functionNames: list[str], argument: str, cwd: str, onOutput=None
+):
+    """Runs Hypothesis' ghostwriter on the functions of a module without a subprocess.
+    onOutput(stream, text) gets what the module prints, as it prints it
+    Returns: (isError, PBT | ERROR)"""
+
+    def write(context):
+        module = loadModule(moduleName, context.cwd)
+        return writeForFunctions(
+            [resolveFunction(module, name) for name in functionNames], argument
+        )
+
+    # What the module prints is captured: stdout may carry protocol messages
+    try:
+        pbt, output = utils.run_in_context(write, cwd, on_output=onOutput)
+    except Exception:  # pylint: disable=broad-except
+        return (True, traceback.format_exc(chain=True))
+    if pbt is None:
+        return (True, f"{moduleName} exited while being imported\n{output.stderr}")
+
+    # The CLI prints the code, which adds a trailing newline
+    return (False, pbt + "\n")
+
+
+def writeUsingGhostwriterFromSource(
+    moduleName: str,
+    source: str,
+    functionNames: list[str],
+    argument: str,
+    onOutput=None,
+    cwd: str = None,
+):
+    """Runs Hypothesis' ghostwriter on functions defined in a source string, without
+    writing the source to a file. The modules the source imports are found in cwd (when
+    given) like in writeUsingGhostwriter, on the import path of this thread only.
+    onOutput is as in writeUsingGhostwriter
+    Returns: (isError, PBT | ERROR)"""
+    module = types.ModuleType(moduleName)
+
+    def write(_context):
+        exec(  # pylint: disable=exec-used
+            compile(source, moduleName + ".py", "exec"), module.__dict__
+        )
+        return writeForFunctions(
+            [resolveFunction(module, name) for name in functionNames], argument
+        )
+
+    with MODULE_LOCK:
+        previous = sys.modules.get(moduleName)
+        sys.modules[moduleName] = module
+        try:
+            pbt, output = utils.run_in_context(write, cwd, on_output=onOutput)
+        except Exception:  # pylint: disable=broad-except
+            return (True, traceback.format_exc(chain=True))
+        finally:
+            if previous is None:
+                del sys.modules[moduleName]
+            else:
+                sys.modules[moduleName] = previous
+
+    if pbt is None:
+        return (True, f"{moduleName} exited while being run\n{output.stderr}")
+    return (False, pbt + "\n")
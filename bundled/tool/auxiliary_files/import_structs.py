@@ -1,14 +1,25 @@
+"""Import structures: the imports of a source, by module, to compare and merge them"""
+
+# pylint: disable=invalid-name
+
 import ast
 
+from auxiliary_files.document_cache import parseSource
+
 
 class MaybeAlias:
-    def __init__(self, name, alias = None) -> None:
+    """A module or imported name, with its alias if any"""
+
+    __slots__ = ("str", "alias")
+
+    def __init__(self, name, alias=None) -> None:
         self.str = name
         self.alias = alias
 
     def hasAlias(self):
-        return self.alias != None
-    
+        """Whether the name is imported under an alias"""
+        return self.alias is not None
+
     def __str__(self) -> str:
         if self.alias:
             return self.str + " as " + self.alias
@@ -16,120 +27,194 @@ class MaybeAlias:
 
 
 class ImportEntry:
-    def __init__(self, module: MaybeAlias, names: list[MaybeAlias] = [], importNameSpace = False) -> None:
+    """Imports of one module. Names are indexed by (name, alias), so lookups and merges take
+    constant time per name and 'x' and 'x as y' are different imports"""
+
+    __slots__ = ("module", "names", "importNameSpace", "saturated")
+
+    def __init__(
+        self, module: MaybeAlias, names: list[MaybeAlias] = (), importNameSpace=False
+    ) -> None:
         self.module = module
-        self.names = names
+        self.names: dict[tuple, MaybeAlias] = (
+            {}
+        )  # (name, alias) -> name with its alias, in import order
         self.importNameSpace = importNameSpace
-        self.saturated = True if "*" in list(map(lambda n: n.str, names)) else False
+        self.saturated = False  # 'from module import *'
+        self.addNames(names)
 
     def _isSameModule(self, other):
         return self.module.str == other.module.str
 
     def hasName(self, name: MaybeAlias):
-        return name.str in list(map(lambda name: name.str, self.names))
+        """Whether the name is imported, with the same alias"""
+        return (name.str, name.alias) in self.names
 
     def addName(self, name: MaybeAlias):
-        if not self.hasName(name):
-            self.names += [name]
+        """Adds a name, unless it already is imported with the same alias"""
+        key = (name.str, name.alias)
+        if key not in self.names:
+            self.names[key] = name
+            if name.str == "*":
+                self.saturated = True
 
     def addNames(self, names: list[MaybeAlias]):
+        """Adds names in order, see addName"""
         for name in names:
             self.addName(name)
 
+    def merge(self, other):
+        """Adds the imports of other (of the same module) to this entry, in place"""
+        self.importNameSpace = self.importNameSpace or other.importNameSpace
+        self.saturated = self.saturated or other.saturated
+        for key, name in other.names.items():
+            self.names.setdefault(key, name)
+
+    def copy(self):
+        """Copy of the entry that does not share its names"""
+        temp = ImportEntry(self.module, importNameSpace=self.importNameSpace)
+        temp.names = dict(self.names)
+        temp.saturated = self.saturated
+        return temp
+
     def __add__(self, other):
-        temp = ImportEntry(self.module, self.names, self.importNameSpace)
-        temp.addNames(other.names)
+        temp = self.copy()
+        temp.merge(other)
         return temp
-    
+
     def __str__(self) -> str:
         string = self.module.str + ("[+]" if self.importNameSpace else "") + ": "
 
-        for name in self.names:
-            string += "\n\t" + name.str
+        for name in self.names.values():
+            string += "\n\t" + str(name)
 
         return string
-    
+
     def __eq__(self, __value: object) -> bool:
         return self.module.str == __value.module.str
 
-        
+
 class ImportStructure:
+    """Import entries indexed by module and alias ('import x as y' is an entry of its own,
+    'from x import ...' entries have no alias). Merging adds the entries of the other structure
+    in place (+=) or into one copy (+), so its cost is in the number of merged names"""
+
+    __slots__ = ("structure", "substitutions")
+
     def __init__(self) -> None:
-        self.structure: dict[str: ImportEntry] = {}
-        self.substitutions: dict[str: str] = {}
+        self.structure: dict[tuple, ImportEntry] = {}
+        self.substitutions: dict[str:str] = {}
 
     def _isModuleInStructure(self, entry: ImportEntry):
-        return entry.module.str in self.structure.keys()
+        return _getKey(entry) in self.structure
 
     def addEntry(self, entry: ImportEntry):
-        if self._isModuleInStructure(entry):
-            self.structure[entry.module.str] += entry
+        """Adds an entry, which this structure then owns (it may be merged into later)"""
+        existing = self.structure.get(_getKey(entry))
+        if existing is not None:
+            existing.merge(entry)
         else:
-            self.structure[entry.module.str] = entry
+            self.structure[_getKey(entry)] = entry
 
     def addEntries(self, entries: list[ImportEntry]):
+        """Adds entries in order, see addEntry"""
         for e in entries:
             self.addEntry(e)
-    
+
     def getEntries(self):
+        """Entries of the structure, in import order"""
         return self.structure.values()
-    
+
     def containsName(self, module: str, name: str) -> bool:
-        for entry in self.getEntries():
-            if entry.module.str == module:
-                return entry.hasName(MaybeAlias(name=name))
-                
-        return False
+        """Whether name is imported from module (under any alias, or by a *)"""
+        entry = self.structure.get((module, None))
+        return entry is not None and (
+            entry.saturated or any(key[0] == name for key in entry.names)
+        )
 
     def toSource(self):
-        string = ""
+        """Import statements of the structure, one per line"""
+        lines = []
 
         for entry in self.structure.values():
             if entry.importNameSpace:
-                string += f"import {entry.module}\n"
-            
+                lines.append(f"import {entry.module}\n")
+
             if entry.saturated:
-                string += f"from {entry.module} import *\n"
+                lines.append(f"from {entry.module.str} import *\n")
                 continue
-                
+
             if entry.names:
-                string += f"from {entry.module} import "
-                for name in entry.names:
-                    string += name.str
-
-                    if name.hasAlias():
-                        string += " as " + name.alias
-
-                    string += ", "
-                string = string[:-2] # removes last comma
-                string += "\n"
-                
-        
-        return string
-    
-    def __add__(self, other): 
+                lines.append(
+                    f"from {entry.module.str} import "
+                    + ", ".join(map(str, entry.names.values()))
+                    + "\n"
+                )
+
+        return "".join(lines)
+
+    def without(self, other):
+        """Returns the imports of this structure that other does not have"""
         temp = ImportStructure()
-        temp.addEntries([ImportEntry(entry.module, entry.names, entry.importNameSpace) for entry in self.getEntries()])
-        temp.addEntries([ImportEntry(entry.module, entry.names, entry.importNameSpace) for entry in other.getEntries()])
+
+        for entry in self.getEntries():
+            otherEntry = other.structure.get(_getKey(entry))
+            if otherEntry is None:
+                temp.addEntry(entry.copy())
+                continue
+
+            importNameSpace = entry.importNameSpace and not otherEntry.importNameSpace
+            names = (
+                []
+                if otherEntry.saturated
+                else [
+                    name
+                    for key, name in entry.names.items()
+                    if key not in otherEntry.names
+                ]
+            )
+            if importNameSpace or names:
+                temp.addEntry(ImportEntry(entry.module, names, importNameSpace))
+
         return temp
 
+    def __iadd__(self, other):
+        for entry in other.getEntries():
+            existing = self.structure.get(_getKey(entry))
+            if existing is not None:
+                existing.merge(entry)
+            else:
+                self.structure[_getKey(entry)] = entry.copy()
+        return self
+
+    def __add__(self, other):
+        temp = ImportStructure()
+        temp.structure = {
+            module: entry.copy() for module, entry in self.structure.items()
+        }
+        temp += other
+        return temp
 
     def __str__(self) -> str:
         string = ""
 
         for entry in self.structure.values():
             string += str(entry) + "\n"
-        
+
         return string
 
 
+def _getKey(entry: ImportEntry):
+    return (entry.module.str, entry.module.alias)
+
+
 def makeImportStructure(source: str) -> ImportStructure:
     """Returns the import structure of a Python source file"""
 
     if not source:
         return ImportStructure()
 
-    tree = ast.parse(source)
+    tree = parseSource(source)
     structure = ImportStructure()
 
     for node in ast.walk(tree):
@@ -140,18 +225,28 @@ def makeImportStructure(source: str) -> ImportStructure:
 
     return structure
 
+
 def addImportFromNodeToStructure(struct: ImportStructure, node: ast.ImportFrom):
+    """Adds a 'from module import ...' statement to a structure"""
     struct.addEntry(makeImportFromEntry(node))
 
+
 def addImportNodeToStructure(struct: ImportStructure, node: ast.Import):
+    """Adds an 'import module, ...' statement to a structure"""
     struct.addEntries(makeImportEntries(node))
 
+
 def makeImportFromEntry(node: ast.ImportFrom):
+    """Entry of a 'from module import ...' statement"""
     module = MaybeAlias(node.module)
     names = list(map(lambda name: MaybeAlias(name.name, name.asname), node.names))
     return ImportEntry(module, names)
 
+
 def makeImportEntries(node: ast.Import):
+    """Entries of an 'import module, ...' statement, one per module"""
     modules = list(map(lambda name: MaybeAlias(name.name, name.asname), node.names))
-    entries = list(map(lambda module: ImportEntry(module, importNameSpace=True), modules))
-    return entries
\ No newline at end of file
+    entries = list(
+        map(lambda module: ImportEntry(module, importNameSpace=True), modules)
+    )
+    return entries
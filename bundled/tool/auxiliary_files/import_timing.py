@@ -0,0 +1,59 @@
+"""Import times of modules, measured with `python -X importtime`"""
+
+# pylint: disable=invalid-name
+
+import os
+import re
+import subprocess
+import sys
+
+# A line of `python -X importtime`: 'import time:   self [us] | cumulative | <indent>module'
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parseImportTimes(output: str) -> list[dict]:
+    """Entries (module, selfUs, cumulativeUs, depth) of `-X importtime` output, in import order"""
+    entries = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            selfUs, cumulativeUs, indent, module = match.groups()
+            entries.append(
+                {
+                    "module": module,
+                    "selfUs": int(selfUs),
+                    "cumulativeUs": int(cumulativeUs),
+                    "depth": len(indent) // 2,
+                }
+            )
+    return entries
+
+
+def measureImportTimes(modules: list[str], cwd: str, env: dict = None) -> list[dict]:
+    """Imports modules in a fresh interpreter with `-X importtime` and returns its entries"""
+    code = "import " + ", ".join(modules)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd,
+        env=env if env is not None else os.environ.copy(),
+        capture_output=True,
+        text=True,
+        timeout=120,
+        check=False,
+    )
+    return parseImportTimes(completed.stderr)
+
+
+def formatImportTimes(entries: list[dict], limit: int = 25) -> str:
+    """The slowest imports (by cumulative time) as a table like the one of `-X importtime`"""
+    total = sum(entry["selfUs"] for entry in entries)
+    lines = [
+        f"Imports: {len(entries)} modules, {total / 1000:.1f} ms",
+        "   self [ms] | cumulative [ms] | module",
+    ]
+    for entry in sorted(entries, key=lambda e: e["cumulativeUs"], reverse=True)[:limit]:
+        lines.append(
+            f"{entry['selfUs'] / 1000:>12.1f} | "
+            f"{entry['cumulativeUs'] / 1000:>15.1f} | {entry['module']}"
+        )
+    return "\n".join(lines)
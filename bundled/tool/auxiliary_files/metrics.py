@@ -0,0 +1,184 @@
+"""Latency and payload size metrics of the server's requests and their stages"""
+
+# pylint: disable=invalid-name
+
+import functools
+import threading
+import time
+from collections import deque
+
+from auxiliary_files.profiling import PROFILER
+
+# Percentiles are computed over the last SAMPLE_SIZE values of a histogram
+SAMPLE_SIZE = 2048
+
+
+class Histogram:
+    """Count, total and maximum of all values, and percentiles of the most recent ones"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def add(self, value: float):
+        """Records a value"""
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def getStats(self) -> dict:
+        """Count, mean, max and p50/p95/p99 of the recorded values"""
+        samples = sorted(self.samples)
+
+        def percentile(p):
+            return (
+                round(samples[min(len(samples) - 1, int(p * len(samples)))], 3)
+                if samples
+                else 0
+            )
+
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0,
+            "max": round(self.max, 3),
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+        }
+
+
+class Span:
+    """Times a block (with statement) into the latency histogram of its name"""
+
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name: str) -> None:
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        self.metrics.recordLatency(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class NullSpan:
+    """Span used while metrics are disabled: does nothing"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Metrics:
+    """Latency (ms) and payload size (characters) histograms, by name, e.g.
+    'generatePBT' for a whole request and 'generatePBT.ghostwriter' for one of its stages.
+    While disabled, span() returns a shared no-op span and nothing is recorded"""
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.latencies = {}  # name -> Histogram
+        self.sizes = {}  # name -> Histogram
+        self.lock = threading.Lock()
+        self.since = time.time()
+
+    def span(self, name: str):
+        """Span timing its block into the latency histogram of name (no-op while disabled)"""
+        return Span(self, name) if self.enabled else NULL_SPAN
+
+    def _record(self, histograms: dict, name: str, value: float):
+        with self.lock:
+            histogram = histograms.get(name)
+            if histogram is None:
+                histogram = histograms[name] = Histogram()
+            histogram.add(value)
+
+    def recordLatency(self, name: str, milliseconds: float):
+        """Adds a latency to the histogram of name"""
+        if self.enabled:
+            self._record(self.latencies, name, milliseconds)
+
+    def recordSize(self, name: str, size: int):
+        """Adds a payload size to the histogram of name"""
+        if self.enabled:
+            self._record(self.sizes, name, size)
+
+    def getStats(self) -> dict:
+        """Stats of all histograms, by kind and name"""
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "since": self.since,
+                "latencyMs": {
+                    name: h.getStats() for name, h in sorted(self.latencies.items())
+                },
+                "payloadSize": {
+                    name: h.getStats() for name, h in sorted(self.sizes.items())
+                },
+            }
+
+    def reset(self):
+        """Clears all histograms"""
+        with self.lock:
+            self.latencies.clear()
+            self.sizes.clear()
+            self.since = time.time()
+
+
+METRICS = Metrics()
+
+
+def getPayloadSize(value, depth: int = 3) -> int:
+    """Approximate size of a request or response: the total length of its strings.
+    Only the first levels of nested objects are visited"""
+    if isinstance(value, str):
+        return len(value)
+    if depth == 0:
+        return 0
+    if isinstance(value, dict):
+        value = value.values()
+    elif hasattr(value, "__dict__"):
+        value = vars(value).values()
+    elif not isinstance(value, (list, tuple)):
+        return 0
+    return sum(getPayloadSize(item, depth - 1) for item in value)
+
+
+def timed(name: str):
+    """Records the latency of a handler, and the payload sizes of its request ('name.request')
+    and response ('name.response'). Requests the profiler was armed for are profiled"""
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def timedHandler(*args):
+            if PROFILER.take(name):
+                return PROFILER.run(name, _runTimed, name, handler, *args)
+            return _runTimed(name, handler, *args)
+
+        return timedHandler
+
+    return decorator
+
+
+def _runTimed(name: str, handler, *args):
+    if not METRICS.enabled:
+        return handler(*args)
+    with METRICS.span(name):
+        result = handler(*args)
+    METRICS.recordSize(name + ".request", getPayloadSize(args))
+    METRICS.recordSize(name + ".response", getPayloadSize(result))
+    return result
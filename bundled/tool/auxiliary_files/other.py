@@ -1,25 +1,196 @@
 import ast
 import re
+import tokenize
 from supported_strategies import supportedStrategies
-from auxiliary_files.import_structs import ImportStructure
+from auxiliary_files.import_structs import (
+    ImportStructure,
+    addImportFromNodeToStructure,
+    addImportNodeToStructure,
+    makeImportStructure,
+)
+from auxiliary_files.document_cache import getParsedDocument, parseSource
+from auxiliary_files.symbol_table import getSymbolTable
+
+
+GHOSTWRITER_NOTICE = "# This test code was written by the `hypothesis.extra.ghostwriter` module\n# and is provided under the Creative Commons Zero public domain dedication\n\n\n"
+
+
+def _iterLines(source: str):
+    """readline for tokenize that does not copy the source"""
+    start = 0
+    while start < len(source):
+        end = source.find("\n", start)
+        end = len(source) if end == -1 else end + 1
+        yield source[start:end]
+        start = end
+
+
+def _findImportRegionByTokens(source: str):
+    """findImportRegion of a source that does not parse. Only the tokens up to the first
+    statement that is not an import are read"""
+    lineOffsets = [0]
+    lines = _iterLines(source)
+
+    def readline():
+        line = next(lines, "")
+        lineOffsets.append(lineOffsets[-1] + len(line))
+        return line
+
+    def offset(position):
+        return lineOffsets[position[0] - 1] + position[1]
+
+    start = end = None
+    statementStart = None  # first token of the current logical line
+    isImport = False
+    try:
+        for token in tokenize.generate_tokens(readline):
+            if token.type in (tokenize.NL, tokenize.COMMENT, tokenize.ENCODING):
+                continue
+            if token.type == tokenize.ENDMARKER:
+                break
+
+            if statementStart is None:
+                statementStart = token
+                isImport = token.type == tokenize.NAME and token.string in ("import", "from")
+                isDocstring = token.type == tokenize.STRING and start is None and end is None
+                if not isImport and not isDocstring:
+                    break
+
+            if token.type == tokenize.NEWLINE:
+                if isImport:
+                    start = offset(statementStart.start) if start is None else start
+                end = min(offset(token.end), len(source))  # at the end of a source, NEWLINE is virtual
+                statementStart = None
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        pass
+
+    if start is None:
+        # No imports: they go after the docstring, or before the first statement
+        if end is None:
+            end = lineOffsets[statementStart.start[0] - 1] if statementStart is not None else 0
+        return (end, end)
+    return (start, end)
+
+
+def _getLineOffsets(source: str, linenos):
+    """Offsets of the starts of the given (sorted, 1-based) lines; len(source) past its end"""
+    offsets = {}
+    lineno, offset = 1, 0
+    for wanted in linenos:
+        while lineno < wanted and offset < len(source):
+            newline = source.find("\n", offset)
+            offset = len(source) if newline == -1 else newline + 1
+            lineno += 1
+        offsets[wanted] = offset
+    return offsets
+
+
+def _getImportLayout(source: str, tree: ast.Module):
+    """(start, end, structure): the import block at the top of a parsed source, as in
+    findImportRegion, and the import structure of all of its module-level imports"""
+    body = tree.body
+    index = 0
+    if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant):
+        if isinstance(body[0].value.value, str):
+            index = 1  # module docstring
+    first = index
+    while index < len(body) and isinstance(body[index], (ast.Import, ast.ImportFrom)):
+        index += 1
+
+    if index > first:
+        lines = _getLineOffsets(source, [body[first].lineno, body[index - 1].end_lineno + 1])
+        start, end = lines[body[first].lineno], lines[body[index - 1].end_lineno + 1]
+    elif first:
+        end = _getLineOffsets(source, [body[0].end_lineno + 1])[body[0].end_lineno + 1]
+        start = end
+    elif body:
+        node = body[0]
+        lineno = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", ())])
+        start = end = _getLineOffsets(source, [lineno])[lineno]
+    else:
+        start = end = 0
+
+    structure = ImportStructure()
+    nodes = list(body)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, ast.Import):
+            addImportNodeToStructure(structure, node)
+        elif isinstance(node, ast.ImportFrom):
+            addImportFromNodeToStructure(structure, node)
+        elif not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            nodes += [child for child in ast.iter_child_nodes(node) if isinstance(child, ast.stmt)]
+    return (start, end, structure)
+
+
+def getImportLayout(source: str):
+    """(start, end, structure): the offsets of the import block at the top of a source and the
+    import structure of its module-level imports, wherever they are (also in top-level if/try
+    blocks, not in functions or classes). Computed from the cached tree of the source, once per
+    source. When the source does not parse (e.g. a test file being edited), the structure is
+    that of its top import block. The structure is shared and must not be modified"""
+    try:
+        document = getParsedDocument(source)
+    except (SyntaxError, ValueError):
+        start, end = _findImportRegionByTokens(source)
+        return (start, end, makeImportStructure(source[start:end]))
+    return document.getDerived("importLayout", lambda tree: _getImportLayout(source, tree))
+
+
+def findImportRegion(source: str):
+    """Returns the (start, end) offsets of the import block at the top of a source: its top-level
+    imports up to the first other statement. Without imports, start == end is where imports
+    belong (after a module docstring)"""
+    start, end, _ = getImportLayout(source)
+    return (start, end)
+
+
+def getImportRegionStructure(source: str) -> ImportStructure:
+    """Import structure of the import block at the top of a source"""
+    start, end = findImportRegion(source)
+    return makeImportStructure(source[start:end])
+
+
+def getModuleImportStructure(source: str) -> ImportStructure:
+    """Import structure of all module-level imports of a source (see getImportLayout)"""
+    return getImportLayout(source)[2]
+
+
+def spliceImports(source: str, imports: ImportStructure):
+    """Returns (offset, text): the lines to insert at offset so that the import block of source
+    has all imports that are not already imported elsewhere in the module. Nothing else of the
+    source changes"""
+    start, end, moduleImports = getImportLayout(source)
+    missing = imports.without(moduleImports)
+    text = missing.toSource()
+    if not text:
+        return (end, "")
+
+    if not source.strip():
+        return (0, text + "\n" + GHOSTWRITER_NOTICE)
+    if start == end:
+        return (end, text + "\n")
+    if source[end - 1] != "\n":
+        text = "\n" + text.rstrip("\n")
+    return (end, text)
+
+
+def addImports(source: str, imports: ImportStructure) -> str:
+    """Adds the imports the import block of source lacks, keeping the rest of it as is"""
+    offset, text = spliceImports(source, imports)
+    if not text:
+        return source
+    return source[:offset] + text + source[offset:]
 
 
-def rewriteImports(source, newStructure: ImportStructure):
-    sourceWOimports = removeImports(source)
-    imports = newStructure.toSource() + "\n"
-    imports += "# This test code was written by the `hypothesis.extra.ghostwriter` module\n# and is provided under the Creative Commons Zero public domain dedication\n\n\n"
-    return imports + sourceWOimports
-
 def removeImports(source: str):
-    tree = ast.parse(source)
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Import) or isinstance(node, ast.ImportFrom):
-            if node in tree.body:
-                tree.body.remove(node)
-    return ast.unparse(tree)    
+    tree = parseSource(source)
+    # The cached tree is shared, so the top-level imports are left out of a new module instead of removed
+    body = [node for node in tree.body if not (isinstance(node, ast.Import) or isinstance(node, ast.ImportFrom))]
+    return ast.unparse(ast.Module(body=body, type_ignores=[]))
 
 def removeComments(source: str):
-    return ast.unparse(ast.parse(source))
+    return ast.unparse(parseSource(source))
 
 def replaceNothingPlaceholder(pbt: str):
     i = 1
@@ -48,7 +219,7 @@ def getTestFileName(fileName, pattern):
     return result
 
 def fishOutPbt(pbtSource, selectedPbtName):
-    tree = ast.parse(pbtSource)
+    tree = parseSource(pbtSource)
     for node in ast.walk(tree):
         if isinstance(node, ast.FunctionDef) and node.name == selectedPbtName:
             return (ast.unparse(node), node.lineno, node.col_offset)
@@ -62,7 +233,7 @@ def getArgsFromPbt(pbt):
                 # print("func: ", node.func, " ## ", "keywords: ", node.keywords, " ## " "args: ", node.args, " ## " "type: ", type(node))
                 return node
     
-    tree = ast.parse(pbt)
+    tree = parseSource(pbt)
     givenNode = getGivenNode(tree)
     args = list(map(lambda keyword: keyword.arg, givenNode.keywords))
 
@@ -75,7 +246,7 @@ def getArgsFromSut(sut):
                 # print("func: ", node.func, " ## ", "keywords: ", node.keywords, " ## " "args: ", node.args, " ## " "type: ", type(node))
                 return node
     
-    tree = ast.parse(sut)
+    tree = parseSource(sut)
     functionNode = getFunctionNode(tree)
     args = list(map(lambda arg: arg.arg, functionNode.args.args))
 
@@ -95,7 +266,7 @@ def split_generated_code(pbt):
     return (ast.unparse(tree), importNodes)
 
 def getParameters(pbt):
-    tree = ast.parse(pbt)
+    tree = parseSource(pbt)
 
     for node in ast.walk(tree):
         if isinstance(node, ast.FunctionDef):
@@ -124,12 +295,6 @@ def makeCustomGenerators(customArgStrategyZip, sutName):
         else:
             strategiesNames += ["st.nothing"]
 
-    print("\n")
-    print(customArgStrategyZip)
-    print(argNames)
-    print(strategiesNames)
-
-
     return strategiesString, argNames, strategiesNames
 
 def isClassMethod(name: str):
@@ -155,33 +320,17 @@ def getMethodName(fullName: str) -> str:
     """
     return fullName.split('.')[::-1][0]
 
-def getSutSourceList(source: str, sutNames: list[str]):
-    tree = ast.parse(source)
+def getSutSourceList(source: str, sutNames: list[str], sutRanges: list = None):
+    """Returns the sources of the SUTs. Methods come with a stub of their class.
+    sutRanges optionally gives the (lineStart, lineEnd) of each SUT, as listed by
+    custom/getDefinedFunctionsFromFile, to pick one of equally named definitions"""
+    table = getSymbolTable(source)
     result = []
-    
-    def lookupFunction(tree, funcName):
-        nonlocal result
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                if node.name == funcName:
-                    result += [ast.unparse(node)]
-                    return
 
-    def lookupClass(tree, className, methodName):
-        nonlocal result
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                if node.name == className:
-                    # return lookupFunction(node, methodName) # This line returns the method, not the entire class
-                    result += [ast.unparse(node)]
-                    return
-
-    for sut in sutNames:
-        if isClassMethod(sut):
-            (className, methodName) = sut.split('.')
-            lookupClass(tree, className, methodName)
-        else:
-            lookupFunction(tree, sut)
+    for i, sut in enumerate(sutNames):
+        sutSource = table.getSource(sut, sutRanges[i] if sutRanges else None)
+        if sutSource is not None:
+            result += [sutSource]
 
     return result
         
@@ -202,7 +351,7 @@ def getEvaluatedSouceList(sutNames, sutSourceList):
     return result
 
 def getSutNamesFromSelection(selectedCode):
-    tree = ast.parse(selectedCode)
+    tree = parseSource(selectedCode)
 
     sutNames = []
 
@@ -0,0 +1,166 @@
+"""On-demand profiling (cProfile and tracemalloc) of the next requests of chosen handlers"""
+
+# pylint: disable=invalid-name
+
+import os
+import sys
+import threading
+import time
+
+# cProfile, tracemalloc and tempfile are imported when first needed, most servers never profile
+
+ALL_HANDLERS = "*"
+TOP_ALLOCATIONS = 30  # allocation sites written per request
+TRACEMALLOC_FRAMES = 10
+
+
+def getDefaultDirectory() -> str:
+    """LS_PROFILE_DIR, or a folder of the temporary directory"""
+    import tempfile  # pylint: disable=import-outside-toplevel
+
+    return os.getenv("LS_PROFILE_DIR") or os.path.join(
+        tempfile.gettempdir(), "easypbt-profiles"
+    )
+
+
+def parseProfileSpec(spec: str):
+    """'generatePBT,getTemplate:3' -> (['generatePBT', 'getTemplate'], 3); '5' -> (['*'], 5).
+    The count defaults to 1"""
+    names, _, count = spec.rpartition(":") if ":" in spec else ("", "", spec)
+    if not count.strip().isdigit():
+        names, count = spec, "1"
+    handlers = [name.strip() for name in names.split(",") if name.strip()] or [
+        ALL_HANDLERS
+    ]
+    return handlers, int(count)
+
+
+class Profiler:
+    """Captures a cProfile profile and the allocations (tracemalloc) of the next requests
+    to chosen handlers, and writes them to a directory ('.pstats' and '.allocations.txt' files).
+
+    Only the thread running the handler is profiled, work done in other processes
+    (e.g. the ghostwriter runners) is not"""
+
+    def __init__(self) -> None:
+        self.remaining = {}  # handler name | '*' -> number of requests still to profile
+        self.chosenDirectory = None  # set by arm, getDefaultDirectory() until then
+        self.lock = threading.Lock()
+        self.tracing = (
+            0  # number of requests being profiled, tracemalloc runs while > 0
+        )
+        self.sequence = 0
+        self.log = lambda message: print(message, file=sys.stderr)
+
+    def arm(self, handlers: list[str], count: int, directory: str = None) -> dict:
+        """Profiles the next count requests of each handler ('*' for all). count 0 disarms"""
+        with self.lock:
+            self.remaining = (
+                {name: count for name in handlers or [ALL_HANDLERS]}
+                if count > 0
+                else {}
+            )
+            if directory:
+                self.chosenDirectory = directory
+            return dict(self.remaining)
+
+    @property
+    def directory(self) -> str:
+        """Folder the profiles are written to"""
+        return self.chosenDirectory or getDefaultDirectory()
+
+    def armFromEnvironment(self):
+        """Arms the profiler as LS_PROFILE says (see parseProfileSpec), if set"""
+        spec = os.getenv("LS_PROFILE", "")
+        if spec:
+            self.arm(*parseProfileSpec(spec))
+
+    def take(self, name: str) -> bool:
+        """True when this request of the handler is to be profiled (counts it)"""
+        if not self.remaining:
+            return False
+        with self.lock:
+            for key in (name, ALL_HANDLERS):
+                if self.remaining.get(key, 0) > 0:
+                    self.remaining[key] -= 1
+                    if self.remaining[key] == 0:
+                        del self.remaining[key]
+                    return True
+        return False
+
+    def _startTracing(self):
+        import tracemalloc  # pylint: disable=import-outside-toplevel
+
+        with self.lock:
+            self.tracing += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    def _stopTracing(self):
+        import tracemalloc  # pylint: disable=import-outside-toplevel
+
+        with self.lock:
+            self.tracing -= 1
+            if self.tracing == 0:
+                tracemalloc.stop()
+
+    def run(self, name: str, function, *args):
+        """Runs function(*args) under cProfile and tracemalloc and writes the results"""
+        import cProfile  # pylint: disable=import-outside-toplevel
+        import tracemalloc  # pylint: disable=import-outside-toplevel
+
+        self._startTracing()
+        try:
+            before = tracemalloc.take_snapshot()
+            profile = cProfile.Profile()
+            start = time.perf_counter()
+            profile.enable()
+            try:
+                return function(*args)
+            finally:
+                profile.disable()
+                duration = time.perf_counter() - start
+                after = tracemalloc.take_snapshot()
+                self._write(name, profile, before, after, duration)
+        finally:
+            self._stopTracing()
+
+    def _write(self, name, profile, before, after, duration):
+        import tracemalloc  # pylint: disable=import-outside-toplevel
+
+        with self.lock:
+            self.sequence += 1
+            sequence = self.sequence
+        directory = self.directory
+        prefix = os.path.join(
+            directory,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{sequence}-{name}",
+        )
+        try:
+            os.makedirs(directory, exist_ok=True)
+            profile.dump_stats(prefix + ".pstats")
+
+            ignored = [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ]
+            differences = after.filter_traces(ignored).compare_to(
+                before.filter_traces(ignored), "lineno"
+            )
+            with open(prefix + ".allocations.txt", "w", encoding="utf-8") as file:
+                file.write(
+                    f"Top {TOP_ALLOCATIONS} allocation sites of {name} "
+                    f"({duration * 1000:.1f} ms)\n\n"
+                )
+                for difference in differences[:TOP_ALLOCATIONS]:
+                    file.write(str(difference) + "\n")
+        except OSError as error:
+            self.log(f"Could not write the profile of {name} to {directory}: {error}")
+            return
+        self.log(
+            f"Profile of {name} ({duration * 1000:.1f} ms): "
+            f"{prefix}.pstats, {prefix}.allocations.txt"
+        )
+
+
+PROFILER = Profiler()
@@ -1,4 +1,7 @@
 import ast
+import re
+from typing import NamedTuple
+from pbt_types import PbtTypeId
 from auxiliary_files.import_structs import *
 from auxiliary_files.other import *
 
@@ -83,305 +86,152 @@ def processDiffPathSameDest(pbt, moduleName, functionName):
     return result
     
 
-def makeWithinExpectedBoundsSnippet(source, moduleName, functionName):
-    # Add imports
-    tempPbt = "import unittest\nfrom hypothesis import given, strategies as st\nimport " + moduleName + "\n\n"
-
-    # Add wrapper class
-    className = "TestWithinExpectedBounds" + functionName.replace('.', '_').capitalize()
-    tempPbt += "class " + className + "(unittest.TestCase):\n\n\t"
-
-    # Add @given decorator
-    tempPbt += "@given("
-    args = getArgsFromSut(source)
-    for arg in args:
-        tempPbt += arg + "=st.nothing(), "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\t"
-
-    # Add pbt
-    tempPbt += "def test_within_expected_bounds_" + functionName.replace('.', '_') + "(self, "
-    for arg in args:
-        if arg != "self":
-            tempPbt += arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += "):\n\t\t"
-
-    argCounter = len(args) + 1
-    tempPbt += "lowerBound, upperBound = '${" + str(argCounter) + ":lowerBound}', '${"
-    argCounter += 1
-    tempPbt +=  str(argCounter) + ":upperBound}'\n\t\t"
-
-    tempPbt += "output = " + moduleName + "." + functionName + "("
-    for arg in args:
-        tempPbt += arg + "=" + arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\t\t"
-
-    tempPbt += "assert lowerBound <= output and output <= upperBound\n"
-
-    return tempPbt
-
-
-def makeSomeThingsNeverChangeSnippet(source, moduleName, functionName):
-    # Add imports
-    tempPbt = "import unittest\nfrom hypothesis import given, strategies as st\nimport " + moduleName + "\n\n"
-
-    # Add wrapper class
-    className = "TestSomeThingsNeverChange" + functionName.replace('.', '_').capitalize()
-    tempPbt += "class " + className + "(unittest.TestCase):\n\n\t"
-
-    # Add @given decorator
-    tempPbt += "@given("
-    args = getArgsFromSut(source)
-    for arg in args:
-        tempPbt += arg + "=st.nothing(), "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\t"
-
-    # Add pbt
-    tempPbt += "def test_some_things_never_change_" + functionName.replace('.', '_') + "(self,"
-    for arg in args:
-        if arg != "self":
-            tempPbt += arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += "):\n\t\t"
-
-    tempPbt += "output = " + moduleName + "." + functionName + "("
-    for arg in args:
-        tempPbt += arg + "=" + arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\t\t"
-
-    tempPbt += "assert ("
-    for arg in args:
-        tempPbt += arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ") == output\n"
-
-    return tempPbt
-
-
-def makeHardToProveEasyToVerifySnippet(sutSource, moduleName, sutName, testerName):
-    # Add imports
-    tempPbt = "import unittest\nfrom hypothesis import given, strategies as st\nimport " + moduleName + "\n\n"
-
-    # Add wrapper class
-    className = "TestHardToProveEasyToVerify" + sutName.replace('.', '_').capitalize()
-    tempPbt += "class " + className + "(unittest.TestCase):\n\n\t"
-
-    # Add @given decorator
-    tempPbt += "@given("
-    args = getArgsFromSut(sutSource)
-    for arg in args:
-        tempPbt += arg + "=st.nothing(), "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\t"
-
-    # Add pbt
-    tempPbt += "def test_hard_to_prove_easy_to_verify_" + sutName.replace('.', '_') + "(self, "
-    for arg in args:
-        if arg != "self":
-            tempPbt += arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += "):\n\t\t"
-
-    tempPbt += "solution = " + moduleName + "." + sutName.replace('.', '_') + "("
-    for arg in args:
-        tempPbt += arg + "=" + arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\t\t"
-
-    tempPbt += "assert " + moduleName + "." + testerName + "(solution) == True\n"
-
-    return tempPbt
-    
-
-def makeSolveSmallerProblemFirstSnippet(sutSource, moduleName, functionName):
-    # Add imports
-    tempPbt = "import unittest\nfrom hypothesis import given, strategies as st\nimport " + moduleName + "\n\n"
-
-    # Add wrapper class
-    className = "TestSolveSmallerProblemFirst" + functionName.replace('.', '_').capitalize()
-    tempPbt += "class " + className + "(unittest.TestCase):\n\n\t"
-
-
-    # Add auxiliary functions
-    tempPbt += "def isCorrect(self, element):\n\t\t"
-    args = getArgsFromSut(sutSource)
-    counter = len(args) + 1
-    tempPbt += '"""Tests the current element"""\n\t\t\'${' + str(counter) + ':pass}\'\n\t\n\t'
-    counter += 1
-
-    tempPbt += "def isDone(self, element):\n\t\t"
-    tempPbt += '"""Returns true if element is empty"""\n\t\t\'${' + str(counter) + ':pass}\'\n\t\n\t'
-    counter += 1
-
-    tempPbt += "def getNextElement(self, element):\n\t\t"
-    tempPbt += '"""Returns the next element"""\n\t\t\'${' + str(counter) + ':pass}\'\n\t\n\t'
-    counter += 1
-
-    # Add @given decorator
-    tempPbt += "@given("
-    args = getArgsFromSut(sutSource)
-    for arg in args:
-        tempPbt += arg + "=st.nothing(), "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\t"
-
-    # Add pbt
-    tempPbt += "def test_solve_smaller_problem_first_" + functionName.replace('.', '_') + "(self, "
-    for arg in args:
-        if arg != "self":
-            tempPbt += arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += "):\n\t\t"
-
-    tempPbt += "output = " + moduleName + "." + functionName + "("
-    for arg in args:
-        tempPbt += arg + "=" + arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\t\t\n\t\t"
-
-    tempPbt += "currentElement = output\n\t\t"
-    tempPbt += "while not self.isDone(currentElement):\n\t\t\t"
-    tempPbt += "assert self.isCorrect(currentElement)\n\t\t\t"
-    tempPbt += "currentElement = self.getNextElement(currentElement)\n"
-
-    return tempPbt
-
-
-def makeMetamorphicPropertySnippet(sutSource, moduleName, sutName, testerName):
-    # Add imports
-    tempPbt = "import unittest\nfrom hypothesis import given, strategies as st\nimport " + moduleName + "\n\n"
-
-    # Add wrapper class
-    className = "TestMetamorphicProperty" + sutName.replace('.', '_').capitalize()
-    tempPbt += "class " + className + "(unittest.TestCase):\n\n\t"
-
-    # Add auxiliary functions
-    tempPbt += "def testMetamorphicProperty(self, sutOutput, oracleOutput, extraArg):\n\t\t"
-    args = getArgsFromSut(sutSource) + ["extraArg"]
-    counter = len(args) + 1
-    tempPbt += '"""Compare the outputs based on the metamorphic property"""\n\t\t'
-    tempPbt += "return '${" + str(counter) + ":sutOutput(extraArg) == oracleOutput(extraArg)}'\n\t\n\t"
-    counter += 1
-
-    # Add @given decorator
-    tempPbt += "@given("
-    args = getArgsFromSut(sutSource) + ["extraArg"]
-    for arg in args:
-        tempPbt += arg + "=st.nothing(), "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\t"
-
-    # Add pbt
-    tempPbt += "def test_metamorphic_property_" + sutName.replace('.', '_') + "(self, "
-    for arg in args:
-        if arg != "self":
-            tempPbt += arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += "):\n\t\t"
-
-    args = getArgsFromSut(sutSource)
-    tempPbt += "sutOutput = " + moduleName + "." + sutName + "("
-    for arg in args:
-        tempPbt += arg + "=" + arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\t\t"
-
-    tempPbt += "oracleOutput = " + moduleName + "." + testerName + "("
-    for arg in args:
-        tempPbt += arg + "=" + arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\n\t\t"
-
-    tempPbt += '\'"""Adding arguments should also be added to the @given decorator, this function and isCorrect"""\'\n\t\t'
-    tempPbt += "extraArguments = [extraArg]\n\t\t"
-    tempPbt += "isCorrect = self.testMetamorphicProperty(sutOutput, oracleOutput, *extraArguments)\n\n\t\t"
-    
-    tempPbt += "assert isCorrect == True\n"
-
-    return tempPbt
-
-def makeDiffPathSameDestSnippet(source, moduleName, functionName):
-    # Add imports
-    tempPbt = "import unittest\nfrom hypothesis import given, strategies as st\nimport " + moduleName + "\n\n"
-
-    # Add wrapper class
-    className = "TestDiffPathSameDest" + functionName.replace('.', '_').capitalize()
-    tempPbt += "class " + className + "(unittest.TestCase):\n\n\t"
-
-    # Add @given decorator
-    tempPbt += "@given("
-    args = getArgsFromSut(source)
-    for arg in args:
-        tempPbt += arg + "=st.nothing(), "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\t"
-
-    # Add pbt
-    tempPbt += "def test_different_path_same_destination_" + functionName.replace('.', '_') + "(self, "
-    for arg in args:
-        if arg != "self":
-            tempPbt += arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += "):\n\t\t"
-
-    tempPbt += "right = " + moduleName + "." + functionName + "("
-    for arg in args:
-        tempPbt += arg + "=" + arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\t\t"
-
-    tempPbt += "left = " + moduleName + "." + functionName + "("
-    
-    tmpArgs = args.copy()
-    args.reverse()
-    reverseArgs = args.copy()
-    args = tmpArgs
-
-    for arg in reverseArgs:
-        tempPbt += arg + "=" + arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\t\t"
-
-    tempPbt += "assert left == right\n"
-
-    return tempPbt
-
-def makeTheMoreThingsChangeSnippet(source, moduleName, functionName):
-    # Add imports
-    tempPbt = "import unittest\nfrom hypothesis import given, strategies as st\nimport " + moduleName + "\n\n"
-
-    # Add wrapper class
-    className = "TestTheMoreThingsChange" + functionName.replace('.', '_').capitalize()
-    tempPbt += "class " + className + "(unittest.TestCase):\n\n\t"
-
-    # Add @given decorator
-    tempPbt += "@given("
-    args = getArgsFromSut(source)
-    for arg in args:
-        tempPbt += arg + "=st.nothing(), "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\t"
-
-    # Add pbt
-    tempPbt += "def test_the_more_things_change_" + functionName.replace('.', '_') + "(self, "
-    for arg in args:
-        if arg != "self":
-            tempPbt += arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += "):\n\t\t"
-
-    tempPbt += "first = " + moduleName + "." + functionName + "("
-    for arg in args:
-        tempPbt += arg + "=" + arg + ", "
-    tempPbt = tempPbt[:-2]
-    tempPbt += ")\n\t\t"
-
-    tempPbt += "second = " + moduleName + "." + functionName + "(first)\n\t\t"
-
-    tempPbt += "assert first == second\n"
-
-    return tempPbt
\ No newline at end of file
+class SignatureDescriptor(NamedTuple):
+    """What the snippet templates need to know about the SUT(s), extracted once per request"""
+
+    moduleName: str
+    sutName: str  # e.g. 'Class.method'
+    testerName: str  # second function (oracle, checker) of the PBT types that need one, else ""
+    args: tuple  # argument names of the SUT
+
+
+def getSignatureDescriptor(sutSource, moduleName, sutName, testerName=""):
+    return SignatureDescriptor(moduleName, sutName, testerName or "", tuple(getArgsFromSut(sutSource)))
+
+
+# Fields of a template: {name} is replaced by a value of the signature, {$:default} by
+# the next tab stop of the snippet. Tab stops are numbered after the strategy placeholders
+# of the @given arguments (see replaceNothingPlaceholder)
+TEMPLATE_FIELD = re.compile(r"\{(\$)?(\w*)(?::([^}]*))?\}")
+
+
+class SnippetTemplate:
+    """A snippet template, compiled once into literal parts and fields"""
+
+    def __init__(self, text: str, extraArgs: tuple = ()) -> None:
+        self.extraArgs = extraArgs  # arguments of the PBT that the SUT does not have
+        self.parts = []  # str (literal) | (False, name) | (True, default)
+        position = 0
+        for match in TEMPLATE_FIELD.finditer(text):
+            self.parts.append(text[position : match.start()])
+            isTabStop, name, default = match.groups()
+            self.parts.append((True, default or "") if isTabStop else (False, name))
+            position = match.end()
+        self.parts.append(text[position:])
+
+    def getValues(self, signature: SignatureDescriptor) -> dict:
+        testName = signature.sutName.replace(".", "_")
+        givenArgs = signature.args + self.extraArgs
+        return {
+            "module": signature.moduleName,
+            "sut": signature.sutName,
+            "tester": signature.testerName,
+            "testName": testName,
+            "className": testName.capitalize(),
+            "given": ", ".join(arg + "=st.nothing()" for arg in givenArgs),
+            "args": ", ".join(signature.args),
+            "params": ", ".join(["self"] + [arg for arg in givenArgs if arg != "self"]),
+            "call": ", ".join(arg + "=" + arg for arg in signature.args),
+            "reversedCall": ", ".join(arg + "=" + arg for arg in reversed(signature.args)),
+        }
+
+    def render(self, signature: SignatureDescriptor) -> str:
+        values = self.getValues(signature)
+        tabStop = len(signature.args) + len(self.extraArgs)
+        result = []
+        for part in self.parts:
+            if isinstance(part, str):
+                result.append(part)
+            elif part[0]:
+                tabStop += 1
+                result.append("${" + str(tabStop) + ":" + part[1] + "}")
+            else:
+                result.append(values[part[1]])
+        return "".join(result)
+
+
+SNIPPET_HEADER = "import unittest\nfrom hypothesis import given, strategies as st\nimport {module}\n\n"
+
+SNIPPET_TEMPLATES = {
+    PbtTypeId.WITHIN_EXPECTED_BOUNDS.value: SnippetTemplate(
+        SNIPPET_HEADER
+        + "class TestWithinExpectedBounds{className}(unittest.TestCase):\n\n"
+        + "\t@given({given})\n"
+        + "\tdef test_within_expected_bounds_{testName}({params}):\n"
+        + "\t\tlowerBound, upperBound = '{$:lowerBound}', '{$:upperBound}'\n"
+        + "\t\toutput = {module}.{sut}({call})\n"
+        + "\t\tassert lowerBound <= output and output <= upperBound\n"
+    ),
+    PbtTypeId.SOME_THINGS_NEVER_CHANGE.value: SnippetTemplate(
+        SNIPPET_HEADER
+        + "class TestSomeThingsNeverChange{className}(unittest.TestCase):\n\n"
+        + "\t@given({given})\n"
+        + "\tdef test_some_things_never_change_{testName}({params}):\n"
+        + "\t\toutput = {module}.{sut}({call})\n"
+        + "\t\tassert ({args}) == output\n"
+    ),
+    PbtTypeId.HARD_TO_PROVE.value: SnippetTemplate(
+        SNIPPET_HEADER
+        + "class TestHardToProveEasyToVerify{className}(unittest.TestCase):\n\n"
+        + "\t@given({given})\n"
+        + "\tdef test_hard_to_prove_easy_to_verify_{testName}({params}):\n"
+        + "\t\tsolution = {module}.{sut}({call})\n"
+        + "\t\tassert {module}.{tester}(solution) == True\n"
+    ),
+    PbtTypeId.SOLVE_SMALLER_PROBLEM_FIRST.value: SnippetTemplate(
+        SNIPPET_HEADER
+        + "class TestSolveSmallerProblemFirst{className}(unittest.TestCase):\n\n"
+        + "\tdef isCorrect(self, element):\n"
+        + '\t\t"""Tests the current element"""\n\t\t\'{$:pass}\'\n\t\n'
+        + "\tdef isDone(self, element):\n"
+        + '\t\t"""Returns true if element is empty"""\n\t\t\'{$:pass}\'\n\t\n'
+        + "\tdef getNextElement(self, element):\n"
+        + '\t\t"""Returns the next element"""\n\t\t\'{$:pass}\'\n\t\n'
+        + "\t@given({given})\n"
+        + "\tdef test_solve_smaller_problem_first_{testName}({params}):\n"
+        + "\t\toutput = {module}.{sut}({call})\n\t\t\n"
+        + "\t\tcurrentElement = output\n"
+        + "\t\twhile not self.isDone(currentElement):\n"
+        + "\t\t\tassert self.isCorrect(currentElement)\n"
+        + "\t\t\tcurrentElement = self.getNextElement(currentElement)\n"
+    ),
+    PbtTypeId.METAMORPHIC_PROP.value: SnippetTemplate(
+        SNIPPET_HEADER
+        + "class TestMetamorphicProperty{className}(unittest.TestCase):\n\n"
+        + "\tdef testMetamorphicProperty(self, sutOutput, oracleOutput, extraArg):\n"
+        + '\t\t"""Compare the outputs based on the metamorphic property"""\n'
+        + "\t\treturn '{$:sutOutput(extraArg) == oracleOutput(extraArg)}'\n\t\n"
+        + "\t@given({given})\n"
+        + "\tdef test_metamorphic_property_{testName}({params}):\n"
+        + "\t\tsutOutput = {module}.{sut}({call})\n"
+        + "\t\toracleOutput = {module}.{tester}({call})\n\n"
+        + '\t\t\'"""Adding arguments should also be added to the @given decorator, this function and isCorrect"""\'\n'
+        + "\t\textraArguments = [extraArg]\n"
+        + "\t\tisCorrect = self.testMetamorphicProperty(sutOutput, oracleOutput, *extraArguments)\n\n"
+        + "\t\tassert isCorrect == True\n",
+        extraArgs=("extraArg",),
+    ),
+    PbtTypeId.DIFF_PATH_SAME_DEST.value: SnippetTemplate(
+        SNIPPET_HEADER
+        + "class TestDiffPathSameDest{className}(unittest.TestCase):\n\n"
+        + "\t@given({given})\n"
+        + "\tdef test_different_path_same_destination_{testName}({params}):\n"
+        + "\t\tright = {module}.{sut}({call})\n"
+        + "\t\tleft = {module}.{sut}({reversedCall})\n"
+        + "\t\tassert left == right\n"
+    ),
+    PbtTypeId.THE_MORE_THINGS_CHANGE.value: SnippetTemplate(
+        SNIPPET_HEADER
+        + "class TestTheMoreThingsChange{className}(unittest.TestCase):\n\n"
+        + "\t@given({given})\n"
+        + "\tdef test_the_more_things_change_{testName}({params}):\n"
+        + "\t\tfirst = {module}.{sut}({call})\n"
+        + "\t\tsecond = {module}.{sut}(first)\n"
+        + "\t\tassert first == second\n"
+    ),
+}
+
+
+def makeSnippet(typeId, sutSource, moduleName, sutName, testerName=""):
+    """Renders the snippet template of a PBT type (see SNIPPET_TEMPLATES)"""
+    return SNIPPET_TEMPLATES[typeId].render(getSignatureDescriptor(sutSource, moduleName, sutName, testerName))
@@ -0,0 +1,120 @@
+"""Symbol tables of parsed sources: their functions and methods, by name and line range"""
+
+# pylint: disable=invalid-name
+
+import ast
+import copy
+
+from auxiliary_files.document_cache import getParsedDocument
+
+# Fields holding the statements (or except handlers and match cases) of a node.
+# Definitions are statements, so expressions are never visited
+STATEMENT_FIELDS = ("body", "orelse", "finalbody", "handlers", "cases")
+
+
+def iterDefinitions(tree: ast.AST):
+    """Yields the class and function definitions of a tree in source order, each with
+    the classes around it. Iterative, so deeply nested statements do not recurse"""
+    stack = [(tree, ())]
+    while stack:
+        node, classes = stack.pop()
+        if isinstance(node, (ast.ClassDef, ast.FunctionDef)):
+            yield node, classes
+            if isinstance(node, ast.ClassDef):
+                classes = classes + (node,)
+        children = []
+        for field in STATEMENT_FIELDS:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                children += value
+        stack.extend((child, classes) for child in reversed(children))
+
+
+class SymbolTable:
+    """Functions, classes and methods of a source, indexed by name and by line range.
+
+    Built in a single traversal. Like at runtime, a later definition replaces an earlier
+    one with the same name. Functions nested in a class are methods of every class around
+    them (e.g. 'Class.method')"""
+
+    def __init__(self, tree: ast.AST, lineOffset: int = 0) -> None:
+        self.entries = (
+            {}
+        )  # name -> entry in the format of custom/getDefinedFunctionsFromFile
+        self.nodes = {}  # name -> (ast.FunctionDef, ast.ClassDef of a method | None)
+        self.classes = {}  # class name -> ast.ClassDef
+        self.ranges = (
+            {}
+        )  # (lineStart, lineEnd) -> (name, ast.FunctionDef, ast.ClassDef | None)
+
+        for node, classes in iterDefinitions(tree):
+            if isinstance(node, ast.ClassDef):
+                self.classes[node.name] = node
+                continue
+
+            for classNode in classes or (None,):
+                className = classNode.name if classNode else ""
+                name = className + "." + node.name if classNode else node.name
+                entry = {
+                    "name": name,
+                    "lineStart": node.lineno + lineOffset,
+                    "lineEnd": node.end_lineno + lineOffset,
+                    "class": className,
+                    "method": node.name if classNode else "",
+                }
+                self.entries[name] = entry
+                self.nodes[name] = (node, classNode)
+                self.ranges[(entry["lineStart"], entry["lineEnd"])] = (
+                    name,
+                    node,
+                    classNode,
+                )
+
+    def getFunctions(self) -> list[dict]:
+        """Functions and methods in the format of custom/getDefinedFunctionsFromFile"""
+        return list(self.entries.values())
+
+    def lookup(self, name: str, lineRange: tuple = None):
+        """Returns (function node, class node of a method | None) for the given name,
+        or (None, None).
+        lineRange (lineStart, lineEnd) picks one of several definitions with the same name
+        """
+        if lineRange is not None:
+            found = self.ranges.get(tuple(lineRange))
+            if found is not None and found[0] == name:
+                return found[1:]
+        return self.nodes.get(name, (None, None))
+
+    def getSource(self, name: str, lineRange: tuple = None):
+        """Source of a function, or of a method in a stub of its class holding only what is needed
+        to construct instances (annotated fields and __init__). Returns None when not found
+        """
+        node, classNode = self.lookup(name, lineRange)
+        if node is None:
+            return None
+        if classNode is None:
+            return ast.unparse(node)
+
+        # The method comes first, as the snippet generators read the arguments of the first function
+        body = [node]
+        for child in classNode.body:
+            if isinstance(child, ast.AnnAssign):
+                body.append(child)
+            elif (
+                isinstance(child, ast.FunctionDef)
+                and child.name == "__init__"
+                and child is not node
+            ):
+                init = copy.copy(child)
+                init.body = [ast.Expr(ast.Constant(...))]
+                body.append(init)
+
+        # A copy, as the tree is shared through the document cache
+        stub = copy.copy(classNode)
+        stub.body = body
+        return ast.unparse(stub)
+
+
+def getSymbolTable(source: str) -> SymbolTable:
+    """Returns the (cached) symbol table of a source. Raises SyntaxError like ast.parse"""
+    return getParsedDocument(source).getDerived("symbols", SymbolTable)
@@ -0,0 +1,375 @@
+"""Background index of the functions of all Python files of the workspace folders"""
+
+# pylint: disable=invalid-name
+
+import ast
+import os
+import queue
+import subprocess
+import sys
+import threading
+import uuid
+from typing import NamedTuple
+
+import lsp_jsonrpc as jsonrpc
+from auxiliary_files.symbol_table import SymbolTable
+
+# Directories that are never scanned
+IGNORED_DIRECTORIES = {
+    ".git",
+    ".hg",
+    ".svn",
+    ".venv",
+    "venv",
+    "env",
+    ".tox",
+    ".nox",
+    "node_modules",
+    "__pycache__",
+    "site-packages",
+    "build",
+    "dist",
+}
+
+MAX_FILE_SIZE = 2 * 1024 * 1024  # bigger (mostly generated) files are not indexed
+FILES_PER_TASK = (
+    32  # files parsed per worker task, to amortize the inter-process overhead
+)
+MAX_WORKERS = 4
+WORKER_SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lsp_index_worker.py"
+)
+WORKER_TIMEOUT = 60  # seconds a worker has to index a chunk
+
+
+class FunctionDescriptor(NamedTuple):
+    """Compact description of a function or method found in the workspace"""
+
+    module: str  # dotted module path, relative to the workspace folder
+    name: str  # qualified name, e.g. 'Class.method'
+    lineStart: int
+    lineEnd: int
+    signature: str  # e.g. '(a: int, b=1) -> str'
+
+    def toDict(self, path: str) -> dict:
+        """The descriptor in the format of custom/getDefinedFunctionsFromFile"""
+        className, _, methodName = self.name.rpartition(".")
+        return {
+            "name": self.name,
+            "module": self.module,
+            "path": path,
+            "lineStart": self.lineStart,
+            "lineEnd": self.lineEnd,
+            "signature": self.signature,
+            "class": className,
+            "method": methodName if className else "",
+        }
+
+
+def getModuleName(root: str, path: str) -> str:
+    """'root/pkg/mod.py' -> 'pkg.mod', 'root/pkg/__init__.py' -> 'pkg'"""
+    parts = os.path.splitext(os.path.relpath(path, root))[0].split(os.sep)
+    if parts[-1] == "__init__" and len(parts) > 1:
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def getSignature(node: ast.FunctionDef) -> str:
+    """Parameters and return annotation of a function, e.g. '(x: int) -> str'"""
+    signature = "(" + ast.unparse(node.args) + ")"
+    if node.returns is not None:
+        signature += " -> " + ast.unparse(node.returns)
+    return signature
+
+
+def indexFile(root: str, path: str):
+    """Returns (mtime, descriptors) of a file, with descriptors None when it cannot
+    be read or parsed"""
+    try:
+        mtime = os.path.getmtime(path)
+        if os.path.getsize(path) > MAX_FILE_SIZE:
+            return (mtime, None)
+        with open(path, "rb") as file:
+            tree = ast.parse(file.read(), path)
+    except (OSError, SyntaxError, ValueError):
+        return (None, None)
+
+    module = getModuleName(root, path)
+    table = SymbolTable(tree)
+    descriptors = [
+        FunctionDescriptor(
+            module,
+            name,
+            entry["lineStart"],
+            entry["lineEnd"],
+            getSignature(table.nodes[name][0]),
+        )
+        for name, entry in table.entries.items()
+    ]
+    return (mtime, descriptors)
+
+
+def indexFiles(root: str, paths: list[str]):
+    """Worker task: indexes a chunk of files. Returns [(path, mtime, descriptors)]"""
+    return [(path, *indexFile(root, path)) for path in paths]
+
+
+def dumpIndexedFiles(results) -> list:
+    """indexFiles results as plain lists, to send them to another process"""
+    return [
+        [path, mtime, None if d is None else [list(x) for x in d]]
+        for path, mtime, d in results
+    ]
+
+
+def findPythonFiles(root: str):
+    """Paths of the .py files under root, skipping hidden and ignored directories"""
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = [
+            d
+            for d in subdirectories
+            if d not in IGNORED_DIRECTORIES and not d.startswith(".")
+        ]
+        for file in files:
+            if file.endswith(".py"):
+                yield os.path.join(directory, file)
+
+
+class WorkspaceIndex:
+    """Functions of all Python files of a workspace folder, parsed in a process pool"""
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.files = {}  # path -> (mtime, [FunctionDescriptor])
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+
+    def _store(self, results):
+        with self.lock:
+            for path, mtime, descriptors in results:
+                if mtime is None:
+                    self.files.pop(path, None)
+                elif descriptors is not None:
+                    self.files[path] = (mtime, descriptors)
+
+    def scan(self, executor):
+        """Indexes all files that are new or changed since they were last indexed"""
+        with self.lock:
+            known = {path: mtime for path, (mtime, _) in self.files.items()}
+
+        paths = []
+        for path in findPythonFiles(self.root):
+            try:
+                if known.get(path) == os.path.getmtime(path):
+                    continue
+            except OSError:
+                continue
+            paths.append(path)
+
+        chunks = [
+            paths[i : i + FILES_PER_TASK] for i in range(0, len(paths), FILES_PER_TASK)
+        ]
+        for results in _map(executor, self.root, chunks):
+            self._store(results)
+        self.ready.set()
+
+    def update(self, executor, paths: list[str]):
+        """Re-indexes created or changed files"""
+        self._store(sum(_map(executor, self.root, [paths]), []))
+
+    def remove(self, paths: list[str]):
+        """Forgets deleted files"""
+        with self.lock:
+            for path in paths:
+                self.files.pop(path, None)
+
+    def contains(self, path: str) -> bool:
+        """Whether path is in the workspace folder of this index"""
+        try:
+            return os.path.commonpath([self.root, path]) == self.root
+        except ValueError:  # e.g. on another drive
+            return False
+
+    def getFunctions(self, query: str = "", limit: int = None) -> list[dict]:
+        """Descriptors (as dicts) of the functions whose name contains query (case-insensitive)"""
+        query = query.lower()
+        result = []
+        with self.lock:
+            for path, (_, descriptors) in self.files.items():
+                for descriptor in descriptors:
+                    if limit is not None and len(result) >= limit:
+                        return result
+                    if query in descriptor.name.lower():
+                        result.append(descriptor.toDict(path))
+        return result
+
+    def getFileFunctions(self, path: str):
+        """Descriptors of one file, or None when it is not indexed"""
+        with self.lock:
+            entry = self.files.get(path)
+        return None if entry is None else [d.toDict(path) for d in entry[1]]
+
+
+def _map(executor, root: str, chunks: list[list[str]]):
+    if executor is None:
+        return (indexFiles(root, chunk) for chunk in chunks)
+    return executor.map(root, chunks)
+
+
+class IndexWorkerPool:
+    """Worker processes (lsp_index_worker.py) that parse files, so that the GIL does not serialize
+    parsing. They only import what indexing needs, and their stdin and stdout are pipes to this
+    process, never the server's own streams. A chunk whose worker fails is indexed in this process
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.workers = []  # [(process, JsonRpcClient)]
+        self.lock = threading.Lock()
+
+    def _getWorkers(self):
+        with self.lock:
+            self.workers = [
+                (p, c) for p, c in self.workers if p.poll() is None and not c.closed
+            ]
+            while len(self.workers) < self.size:
+                # pylint: disable=consider-using-with
+                process = subprocess.Popen(
+                    [sys.executable, WORKER_SCRIPT],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                )
+                rpc = jsonrpc.create_json_rpc(process.stdout, process.stdin)
+                rpc.negotiate_codec()
+                self.workers.append((process, jsonrpc.JsonRpcClient(rpc)))
+            return list(self.workers)
+
+    def map(self, root: str, chunks: list[list[str]]):
+        """Yields the results of indexFiles for each chunk, in the order they complete"""
+        tasks = queue.Queue()
+        for chunk in chunks:
+            tasks.put(chunk)
+        results = queue.Queue()
+
+        def work(client):
+            while True:
+                try:
+                    chunk = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    msg = {
+                        "id": str(uuid.uuid4()),
+                        "method": "indexFiles",
+                        "root": root,
+                        "paths": chunk,
+                    }
+                    reply = client.request(msg, WORKER_TIMEOUT)["result"]
+                    results.put(
+                        [(path, mtime, _toDescriptors(d)) for path, mtime, d in reply]
+                    )
+                except Exception:  # pylint: disable=broad-except
+                    results.put(indexFiles(root, chunk))
+
+        try:
+            workers = self._getWorkers()
+        except Exception:  # pylint: disable=broad-except
+            workers = []
+        if not workers:
+            yield from (indexFiles(root, chunk) for chunk in chunks)
+            return
+
+        for _, client in workers[: len(chunks)]:
+            threading.Thread(target=work, args=(client,), daemon=True).start()
+        for _ in chunks:
+            yield results.get()
+
+    def shutdown(self, timeout: float = 5):
+        """Asks the workers to exit and waits for them"""
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for process, client in workers:
+            try:
+                client.notify({"id": str(uuid.uuid4()), "method": "exit"})
+            except Exception:  # pylint: disable=broad-except
+                pass
+            client.close()
+        for process, _ in workers:
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def _toDescriptors(descriptors):
+    return (
+        None if descriptors is None else [FunctionDescriptor(*d) for d in descriptors]
+    )
+
+
+class WorkspaceIndexer:
+    """Keeps a WorkspaceIndex per workspace folder up to date in the background"""
+
+    def __init__(self) -> None:
+        self.indexes = {}  # workspace folder -> WorkspaceIndex
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def _getExecutor(self):
+        # The pool is created lazily, its workers are started on first use
+        with self.lock:
+            if self.executor is None:
+                self.executor = IndexWorkerPool(
+                    max(1, min(MAX_WORKERS, (os.cpu_count() or 2) - 1))
+                )
+            return self.executor
+
+    def start(self, roots: list[str]):
+        """Indexes the workspace folders in a background thread"""
+        for root in roots:
+            self.indexes.setdefault(root, WorkspaceIndex(root))
+        threading.Thread(target=self._scanAll, daemon=True).start()
+
+    def _scanAll(self):
+        for index in list(self.indexes.values()):
+            index.scan(self._getExecutor())
+
+    def onFilesChanged(self, changed: list[str], deleted: list[str]):
+        """Handles file events (paths of created or changed and of deleted .py files)"""
+        for index in list(self.indexes.values()):
+            index.remove([path for path in deleted if index.contains(path)])
+            paths = [path for path in changed if index.contains(path)]
+            if paths:
+                threading.Thread(
+                    target=index.update, args=(self._getExecutor(), paths), daemon=True
+                ).start()
+
+    def getFunctions(self, query: str = "", limit: int = None) -> list[dict]:
+        """WorkspaceIndex.getFunctions of all workspace folders, at most limit of them"""
+        result = []
+        for index in list(self.indexes.values()):
+            result += index.getFunctions(
+                query, None if limit is None else limit - len(result)
+            )
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def getFileFunctions(self, path: str):
+        """WorkspaceIndex.getFileFunctions of the workspace folder of path"""
+        for index in list(self.indexes.values()):
+            if index.contains(path):
+                return index.getFileFunctions(path)
+        return None
+
+    def isReady(self) -> bool:
+        """Whether every workspace folder was scanned once"""
+        return all(index.ready.is_set() for index in list(self.indexes.values()))
+
+    def shutdown(self):
+        """Stops the index workers"""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown()
@@ -3,6 +3,11 @@
 CUSTOM_GET_PBT_TYPES = "custom/getPbtTypes"
 CUSTOM_GET_ALL_DEFINED_FUNCTIONS_FROM_FILE = "custom/getDefinedFunctionsFromFile"
 CUSTOM_GENERATE_PBT = "custom/generatePBT"
+CUSTOM_GENERATE_PBT_BATCH = "custom/generatePBTBatch"
 CUSTOM_GENERATE_SNIPPET = "custom/generateSnippet"
 CUSTOM_GENERATE_EXAMPLE = "custom/generateExample"
-CUSTOM_GET_TEMPLATE = "custom/getTemplate"
\ No newline at end of file
+CUSTOM_GET_TEMPLATE = "custom/getTemplate"
+CUSTOM_GET_CACHE_STATS = "custom/getCacheStats"
+CUSTOM_GET_SERVER_STATS = "custom/getServerStats"
+CUSTOM_PROFILE_REQUESTS = "custom/profileRequests"
+CUSTOM_GET_WORKSPACE_FUNCTIONS = "custom/getWorkspaceFunctions"
\ No newline at end of file
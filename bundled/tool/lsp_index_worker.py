@@ -0,0 +1,25 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Worker process of the workspace index: parses the files it is sent.
+It only imports what indexing needs, not the server.
+"""
+
+import sys
+
+# pylint: disable=wrong-import-position
+import lsp_jsonrpc as jsonrpc
+from auxiliary_files.workspace_index import dumpIndexedFiles, indexFiles
+
+RPC = jsonrpc.create_json_rpc(sys.stdin.buffer, sys.stdout.buffer)
+# stdout carries the replies: anything printed goes to stderr
+sys.stdout = sys.stderr
+
+for msg in RPC.receive_requests():
+    if msg["method"] == "indexFiles":
+        RPC.send_data(
+            {
+                "id": msg["id"],
+                "result": dumpIndexedFiles(indexFiles(msg["root"], msg["paths"])),
+            }
+        )
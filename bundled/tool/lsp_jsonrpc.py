@@ -4,17 +4,23 @@
 
 
 import atexit
-import io
 import json
+import os
 import pathlib
 import subprocess
 import threading
+import time
 import uuid
-from concurrent.futures import ThreadPoolExecutor
-from typing import BinaryIO, Dict, Optional, Sequence, Union
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import BinaryIO, Callable, Dict, Optional, Sequence, Union
 
 CONTENT_LENGTH = "Content-Length: "
 RUNNER_SCRIPT = str(pathlib.Path(__file__).parent / "lsp_runner.py")
+HEADER_END = b"\r\n\r\n"
+READ_SIZE = 65536
+# Times a request is sent again to a new runner when its runner exits before replying
+REQUEST_REPLAYS = 1
 
 
 def to_str(text) -> str:
@@ -28,12 +34,91 @@ class StreamClosedException(Exception):
     pass  # pylint: disable=unnecessary-pass
 
 
+class RunnerStartError(Exception):
+    """Raised when a runner exits before it is ready to take requests, e.g. because its
+    interpreter cannot import the runner's modules."""
+
+
+class JsonCodec:
+    """Encodes messages with the standard library's json (always available)."""
+
+    name = "json"
+
+    @staticmethod
+    def encode(data) -> bytes:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def decode(content: bytes):
+        return json.loads(content)
+
+
+class OrjsonCodec:
+    """Encodes messages with orjson, when it is installed."""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson  # pylint: disable=import-outside-toplevel
+
+        self._orjson = orjson
+
+    def encode(self, data) -> bytes:
+        return self._orjson.dumps(data)
+
+    def decode(self, content: bytes):
+        return self._orjson.loads(content)
+
+
+class MsgpackCodec:
+    """Encodes messages with msgpack, when it is installed."""
+
+    name = "msgpack"
+
+    def __init__(self):
+        import msgpack  # pylint: disable=import-outside-toplevel
+
+        self._msgpack = msgpack
+
+    def encode(self, data) -> bytes:
+        return self._msgpack.packb(data, use_bin_type=True)
+
+    def decode(self, content: bytes):
+        return self._msgpack.unpackb(content, raw=False)
+
+
+# Codecs by name, in order of preference. JSON is the one every connection starts with.
+CODECS = {"orjson": OrjsonCodec, "msgpack": MsgpackCodec, "json": JsonCodec}
+
+
+def get_codec(name: str):
+    """Returns the codec of the given name, None when it is unknown or not installed."""
+    try:
+        return CODECS[name]()
+    except (KeyError, ImportError):
+        return None
+
+
+def get_available_codecs() -> "list[str]":
+    """Names of the codecs this interpreter can use, by preference.
+    LS_RPC_CODECS (e.g. 'msgpack,json') restricts and orders them."""
+    names = [name.strip() for name in os.getenv("LS_RPC_CODECS", "").split(",") if name.strip()]
+    return [name for name in names or list(CODECS) if get_codec(name)] or [JsonCodec.name]
+
+
+def choose_codec(offered: Sequence[str]) -> str:
+    """The first offered codec that is also available here (json when none is)."""
+    available = get_available_codecs()
+    return next((name for name in offered if name in available), JsonCodec.name)
+
+
 class JsonWriter:
     """Manages writing JSON-RPC messages to the writer stream."""
 
-    def __init__(self, writer: io.TextIOWrapper):
+    def __init__(self, writer: BinaryIO, codec=None):
         self._writer = writer
         self._lock = threading.Lock()
+        self.codec = codec or JsonCodec()
 
     def close(self):
         """Closes the underlying writer stream."""
@@ -46,20 +131,21 @@ class JsonWriter:
         if self._writer.closed:
             raise StreamClosedException()
 
+        # Encoded once, the header and content are written without joining them
+        content = self.codec.encode(data)
         with self._lock:
-            content = json.dumps(data)
-            length = len(content.encode("utf-8"))
-            self._writer.write(
-                f"{CONTENT_LENGTH}{length}\r\n\r\n{content}".encode("utf-8")
-            )
+            self._writer.write(f"{CONTENT_LENGTH}{len(content)}\r\n\r\n".encode("ascii"))
+            self._writer.write(content)
             self._writer.flush()
 
 
 class JsonReader:
     """Manages reading JSON-RPC messages from stream."""
 
-    def __init__(self, reader: io.TextIOWrapper):
+    def __init__(self, reader: BinaryIO, codec=None):
         self._reader = reader
+        self._buffer = bytearray()
+        self.codec = codec or JsonCodec()
 
     def close(self):
         """Closes the underlying reader stream."""
@@ -70,39 +156,79 @@ class JsonReader:
         """Reads data from the stream in JSON-RPC format."""
         if self._reader.closed:
             raise StreamClosedException
-        length = None
-        while not length:
-            line = to_str(self._readline())
-            if line.startswith(CONTENT_LENGTH):
-                length = int(line[len(CONTENT_LENGTH) :])
-
-        line = to_str(self._readline()).strip()
-        while line:
-            line = to_str(self._readline()).strip()
-
-        content = to_str(self._reader.read(length))
-        return json.loads(content)
 
-    def _readline(self):
-        line = self._reader.readline()
-        if not line:
-            raise EOFError
-        return line
+        # Headers and small messages come from buffered chunks, a large content
+        # is read at once to its end
+        header_end = self._buffer.find(HEADER_END)
+        while header_end < 0:
+            searched = max(0, len(self._buffer) - len(HEADER_END) + 1)
+            self._fill(READ_SIZE)
+            header_end = self._buffer.find(HEADER_END, searched)
+
+        length = self._get_content_length(self._buffer[:header_end])
+        start = header_end + len(HEADER_END)
+        end = start + length
+        if len(self._buffer) < end:
+            self._fill(end - len(self._buffer), exact=True)
+
+        content = bytes(self._buffer[start:end])
+        del self._buffer[:end]
+        return self.codec.decode(content)
+
+    def _fill(self, size: int, exact: bool = False):
+        read = self._reader.read if exact else getattr(self._reader, "read1", self._reader.read)
+        while size > 0:
+            chunk = read(size)
+            if not chunk:
+                raise EOFError
+            self._buffer += chunk
+            size -= len(chunk)
+            if not exact:
+                return
+
+    @staticmethod
+    def _get_content_length(headers: bytes) -> int:
+        for line in bytes(headers).split(b"\r\n"):
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                return int(value)
+        raise ValueError(f"Missing {CONTENT_LENGTH.strip()} header: {to_str(bytes(headers))}")
 
 
 class JsonRpc:
     """Manages sending and receiving data over JSON-RPC."""
 
-    def __init__(self, reader: io.TextIOWrapper, writer: io.TextIOWrapper):
+    def __init__(self, reader: BinaryIO, writer: BinaryIO):
         self._reader = JsonReader(reader)
         self._writer = JsonWriter(writer)
 
+    @property
+    def codec(self) -> str:
+        """Name of the codec the messages are encoded with."""
+        return self._writer.codec.name
+
+    def set_codec(self, name: str):
+        """Switches both directions to the codec of the given name."""
+        codec = get_codec(name)
+        if codec is None:
+            raise ValueError(f"Unavailable codec: {name}")
+        self._reader.codec = codec
+        self._writer.codec = codec
+
     def close(self):
         """Closes the underlying streams."""
+        self.close_reader()
+        self.close_writer()
+
+    def close_reader(self):
+        """Closes the reader stream (not while another thread is blocked reading it)."""
         try:
             self._reader.close()
         except:  # pylint: disable=bare-except
             pass
+
+    def close_writer(self):
+        """Closes the writer stream, which tells the other end to stop."""
         try:
             self._writer.close()
         except:  # pylint: disable=bare-except
@@ -116,68 +242,235 @@ class JsonRpc:
         """Receive data in JSON-RPC format."""
         return self._reader.read()
 
+    def negotiate_codec(self) -> str:
+        """Offers the available codecs to the other end (in JSON) and switches to the one it
+        chose. The other end answers a 'negotiate' request with answer_codec_negotiation."""
+        msg_id = str(uuid.uuid4())
+        self.send_data({"id": msg_id, "method": "negotiate", "codecs": get_available_codecs()})
+        data = self.receive_data()
+        if data.get("id") != msg_id or "result" not in data:
+            return self.codec
+        self.set_codec(data["result"])
+        return self.codec
+
+    def answer_codec_negotiation(self, msg: Dict) -> str:
+        """Answers a 'negotiate' request (in JSON), then switches to the chosen codec."""
+        name = choose_codec(msg.get("codecs", []))
+        self.send_data({"id": msg["id"], "result": name})
+        self.set_codec(name)
+        return name
+
+    def receive_requests(self):
+        """Yields the requests of the other end until it sends "exit" or goes away.
+        "negotiate" requests are answered here."""
+        while True:
+            try:
+                msg = self.receive_data()
+            except EOFError:
+                # The other end went away without sending "exit"
+                return
+
+            if msg["method"] == "exit":
+                return
+            if msg["method"] == "negotiate":
+                self.answer_codec_negotiation(msg)
+                continue
+            yield msg
+
 
 def create_json_rpc(readable: BinaryIO, writable: BinaryIO) -> JsonRpc:
     """Creates JSON-RPC wrapper for the readable and writable streams."""
     return JsonRpc(readable, writable)
 
 
+class JsonRpcClient:
+    """Sends requests over a JSON-RPC connection and hands each reply to the request of
+    the same id, so that many requests can be in flight on one connection."""
+
+    def __init__(self, rpc: JsonRpc):
+        self._rpc = rpc
+        self._pending: Dict[str, Future] = {}
+        # Callbacks of the requests in flight for the notifications sent about them
+        self._listeners: Dict[str, Callable[[Dict], None]] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        threading.Thread(target=self._read_replies, daemon=True, name="json-rpc-replies").start()
+
+    @property
+    def codec(self) -> str:
+        """Name of the codec the messages are encoded with."""
+        return self._rpc.codec
+
+    @property
+    def closed(self) -> bool:
+        """True once the other end has closed the connection."""
+        return self._closed
+
+    @property
+    def pending_count(self) -> int:
+        """Number of requests waiting for their reply."""
+        return len(self._pending)
+
+    def _read_replies(self):
+        try:
+            while True:
+                data = self._rpc.receive_data()
+                if "method" in data:
+                    self._notify_listener(data)
+                    continue
+                with self._lock:
+                    future = self._pending.pop(data.get("id"), None)
+                # Replies to requests that timed out are dropped
+                if future is not None:
+                    future.set_result(data)
+        except Exception:  # pylint: disable=broad-except
+            pass
+        finally:
+            with self._lock:
+                self._closed = True
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                future.set_exception(StreamClosedException())
+            self._rpc.close_reader()
+
+    def _notify_listener(self, data: Dict):
+        listener = self._listeners.get(data.get("id"))
+        # Notifications about requests that are no longer waiting are dropped
+        if listener is not None:
+            try:
+                listener(data)
+            except Exception:  # pylint: disable=broad-except
+                pass
+
+    def request(
+        self,
+        msg: Dict,
+        timeout: Optional[float] = None,
+        on_notification: Optional[Callable[[Dict], None]] = None,
+    ) -> Dict:
+        """Sends a request (with an id) and waits for its reply, at most timeout seconds.
+        The messages with a method the other end sends with the id of the request before
+        replying (e.g. its output) are handed to on_notification, on the reply thread."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise StreamClosedException()
+            self._pending[msg["id"]] = future
+            if on_notification is not None:
+                self._listeners[msg["id"]] = on_notification
+        try:
+            self._rpc.send_data(msg)
+            return future.result(timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(f"No reply to {msg.get('method')} within {timeout} seconds") from None
+        finally:
+            with self._lock:
+                self._pending.pop(msg["id"], None)
+                self._listeners.pop(msg["id"], None)
+
+    def notify(self, msg: Dict):
+        """Sends a message that gets no reply."""
+        self._rpc.send_data(msg)
+
+    def close(self):
+        """Closes the writer stream. The reader is closed by the reply thread once the other
+        end has closed its side: closing it while the thread is blocked on it would deadlock."""
+        self._rpc.close_writer()
+
+
 class ProcessManager:
     """Manages sub-processes launched for running tools."""
 
     def __init__(self):
         self._args: Dict[str, Sequence[str]] = {}
         self._processes: Dict[str, subprocess.Popen] = {}
-        self._rpc: Dict[str, JsonRpc] = {}
+        self._rpc: Dict[str, JsonRpcClient] = {}
         self._lock = threading.Lock()
-        self._thread_pool = ThreadPoolExecutor(10)
 
     def stop_all_processes(self):
         """Send exit command to all processes and shutdown transport."""
         for i in self._rpc.values():
             try:
-                i.send_data({"id": str(uuid.uuid4()), "method": "exit"})
+                i.notify({"id": str(uuid.uuid4()), "method": "exit"})
             except:  # pylint: disable=bare-except
                 pass
-        self._thread_pool.shutdown(wait=False)
 
-    def start_process(self, workspace: str, args: Sequence[str], cwd: str) -> None:
-        """Starts a process and establishes JSON-RPC communication over stdio."""
+    def start_process(
+        self,
+        workspace: str,
+        args: Sequence[str],
+        cwd: str,
+        env: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Starts a process and establishes JSON-RPC communication over stdio. Raises
+        RunnerStartError when the process exits before answering the codec negotiation,
+        which it does once it has loaded its modules."""
         # pylint: disable=consider-using-with
         proc = subprocess.Popen(
             args,
             cwd=cwd,
             stdout=subprocess.PIPE,
             stdin=subprocess.PIPE,
+            env=env,
         )
-        self._processes[workspace] = proc
-        self._rpc[workspace] = create_json_rpc(proc.stdout, proc.stdin)
+        rpc = create_json_rpc(proc.stdout, proc.stdin)
+        try:
+            rpc.negotiate_codec()
+        except Exception as error:  # pylint: disable=broad-except
+            rpc.close()
+            try:
+                code = proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                code = proc.wait()
+            raise RunnerStartError(
+                f"{' '.join(args)} exited with code {code} before it was ready"
+            ) from error
+        client = JsonRpcClient(rpc)
+        with self._lock:
+            self._processes[workspace] = proc
+            self._rpc[workspace] = client
 
         def _monitor_process():
             proc.wait()
             with self._lock:
-                try:
+                # A runner started since under the same id is left alone
+                if self._processes.get(workspace) is proc:
                     del self._processes[workspace]
-                    rpc = self._rpc.pop(workspace)
-                    rpc.close()
-                except:  # pylint: disable=bare-except
-                    pass
+                    del self._rpc[workspace]
+            client.close()
+
+        threading.Thread(target=_monitor_process, daemon=True, name="process-monitor").start()
 
-        self._thread_pool.submit(_monitor_process)
+    def stop_process(self, workspace: str) -> None:
+        """Asks a process to exit. It is forgotten at once: the next request for the id
+        starts a new one."""
+        with self._lock:
+            self._processes.pop(workspace, None)
+            client = self._rpc.pop(workspace, None)
+        if client is not None:
+            try:
+                client.notify({"id": str(uuid.uuid4()), "method": "exit"})
+            except Exception:  # pylint: disable=broad-except
+                pass
+            client.close()
 
-    def get_json_rpc(self, workspace: str) -> JsonRpc:
-        """Gets the JSON-RPC wrapper for the a given id."""
+    def get_json_rpc(self, workspace: str) -> JsonRpcClient:
+        """Gets the JSON-RPC wrapper for the a given id, if its process is alive."""
         with self._lock:
-            if workspace in self._rpc:
+            proc = self._processes.get(workspace)
+            if proc is not None and proc.poll() is None and not self._rpc[workspace].closed:
                 return self._rpc[workspace]
         raise StreamClosedException()
 
 
 _process_manager = ProcessManager()
+_start_lock = threading.Lock()
+_start_locks: Dict[str, threading.Lock] = {}
 atexit.register(_process_manager.stop_all_processes)
 
 
-def _get_json_rpc(workspace: str) -> Union[JsonRpc, None]:
+def _get_json_rpc(workspace: str) -> Union[JsonRpcClient, None]:
     try:
         return _process_manager.get_json_rpc(workspace)
     except StreamClosedException:
@@ -187,17 +480,266 @@ def _get_json_rpc(workspace: str) -> Union[JsonRpc, None]:
 
 
 def get_or_start_json_rpc(
-    workspace: str, interpreter: Sequence[str], cwd: str
-) -> Union[JsonRpc, None]:
-    """Gets an existing JSON-RPC connection or starts one and return it."""
-    res = _get_json_rpc(workspace)
-    if not res:
-        args = [*interpreter, RUNNER_SCRIPT]
-        _process_manager.start_process(workspace, args, cwd)
+    workspace: str,
+    interpreter: Sequence[str],
+    cwd: str,
+    env: Optional[Dict[str, str]] = None,
+) -> Union[JsonRpcClient, None]:
+    """Gets an existing JSON-RPC connection or starts one and return it.
+    Processes of different ids start in parallel."""
+    with _start_lock:
+        lock = _start_locks.setdefault(workspace, threading.Lock())
+    with lock:
         res = _get_json_rpc(workspace)
+        if not res:
+            args = [*interpreter, RUNNER_SCRIPT]
+            _process_manager.start_process(workspace, args, cwd, env)
+            res = _get_json_rpc(workspace)
     return res
 
 
+class RunnerState:
+    """What the pool knows of one runner process."""
+
+    def __init__(self):
+        self.client: Optional[JsonRpcClient] = None
+        self.in_flight = 0
+        self.served = 0  # requests answered by the current process
+        self.rss_mb = 0.0  # resident memory reported with the last reply
+        self.last_used = time.monotonic()
+        self.retiring = False  # gets no new requests, recycled once the last one is answered
+
+    def reset(self, client: Optional[JsonRpcClient] = None):
+        """Forgets the counters of the previous process."""
+        self.client = client
+        self.served = 0
+        self.rss_mb = 0.0
+        self.retiring = False
+
+
+class RunnerPool:
+    """Supervises the warm runner processes of the workspaces: each request goes to the
+    least busy runner, each running up to `concurrency` requests at a time. Runners are
+    recycled after max_requests requests or once their resident memory passes max_rss_mb,
+    stopped after idle_timeout seconds without requests, and started again when needed."""
+
+    def __init__(self, size: int = 2, concurrency: int = 1):
+        self._size = max(1, size)
+        self._concurrency = max(1, concurrency)
+        self._max_requests = 0  # 0: never recycled
+        self._max_rss_mb = 0
+        self._memory_limit_mb = 0  # address space limit (rlimit) of the runners, 0: none
+        self._idle_timeout = 0  # seconds, 0: never stopped
+        self._runners: Dict[str, list] = {}
+        self._condition = threading.Condition()
+        self._reaper: Optional[threading.Thread] = None
+        # Workspace -> (interpreter, error) of the runners that could not start: requests
+        # fail at once instead of starting them again, until the pool is started again
+        self._start_errors: Dict[str, tuple] = {}
+        self.recycled = 0
+        self.evicted = 0
+
+    def set_size(self, size: int) -> None:
+        """Sets the number of runners used for workspaces that have no pool yet."""
+        self._size = max(1, size)
+
+    def set_concurrency(self, concurrency: int) -> None:
+        """Sets the number of requests a runner runs at the same time."""
+        self._concurrency = max(1, concurrency)
+
+    def set_limits(
+        self,
+        max_requests: int = 0,
+        max_rss_mb: float = 0,
+        memory_limit_mb: int = 0,
+        idle_timeout: float = 0,
+    ) -> None:
+        """Sets when runners are recycled or stopped, and their memory limit. 0 disables."""
+        self._max_requests = max(0, max_requests)
+        self._max_rss_mb = max(0, max_rss_mb)
+        self._memory_limit_mb = max(0, memory_limit_mb)
+        self._idle_timeout = max(0, idle_timeout)
+
+    def _get_env(self) -> Dict[str, str]:
+        return {
+            **os.environ,
+            "LS_RUNNER_CONCURRENCY": str(self._concurrency),
+            "LS_RUNNER_MEMORY_LIMIT_MB": str(self._memory_limit_mb),
+        }
+
+    def _get_runners(self, workspace: str) -> list:
+        # Called with the condition held
+        if workspace not in self._runners:
+            self._runners[workspace] = [RunnerState() for _ in range(self._size)]
+            if self._idle_timeout and self._reaper is None:
+                self._reaper = threading.Thread(
+                    target=self._evict_idle_runners, daemon=True, name="runner-reaper"
+                )
+                self._reaper.start()
+        return self._runners[workspace]
+
+    def start(self, workspace: str, interpreter: Sequence[str], cwd: str) -> None:
+        """Starts all runners of a workspace so that they are warm for the first request."""
+        with self._condition:
+            runners = self._get_runners(workspace)
+            self._start_errors.pop(workspace, None)
+        for index, runner in enumerate(runners):
+            client = self._start_runner(workspace, index, interpreter, cwd)
+            with self._condition:
+                runner.reset(client)
+
+    def _start_runner(
+        self, workspace: str, index: int, interpreter: Sequence[str], cwd: str
+    ) -> Union[JsonRpcClient, None]:
+        """Gets the process of a runner, starting it if needed. A runner that fails to
+        start is remembered."""
+        with self._condition:
+            error = self._start_errors.get(workspace)
+        if error is not None and error[0] == tuple(interpreter):
+            raise RunnerStartError(error[1])
+        try:
+            return get_or_start_json_rpc(
+                _runner_key(workspace, index), interpreter, cwd, self._get_env()
+            )
+        except RunnerStartError as start_error:
+            with self._condition:
+                self._start_errors[workspace] = (tuple(interpreter), str(start_error))
+            raise
+
+    def acquire(
+        self, workspace: str, interpreter: Sequence[str], cwd: str
+    ) -> "tuple[int, Union[JsonRpcClient, None]]":
+        """Waits for a runner of the workspace that can take a request, picking the one
+        with the fewest requests in flight, and starts it if needed."""
+        with self._condition:
+            runners = self._get_runners(workspace)
+            while True:
+                available = [
+                    index
+                    for index, runner in enumerate(runners)
+                    if not runner.retiring and runner.in_flight < self._concurrency
+                ]
+                if available:
+                    break
+                self._condition.wait()
+            index = min(available, key=lambda i: runners[i].in_flight)
+            runner = runners[index]
+            runner.in_flight += 1
+            runner.last_used = time.monotonic()
+        try:
+            client = self._start_runner(workspace, index, interpreter, cwd)
+        except Exception:
+            self.release(workspace, index)
+            raise
+        with self._condition:
+            # A new process (the previous one exited or was stopped) starts from zero
+            if runner.client is not client:
+                runner.reset(client)
+        return index, client
+
+    def release(self, workspace: str, index: int, reply: Optional[Dict] = None) -> None:
+        """Gives a runner back to the pool, with the reply it sent (if any). A runner
+        past its limits is recycled once it has no request in flight."""
+        with self._condition:
+            runner = self._runners[workspace][index]
+            runner.in_flight -= 1
+            if reply is not None:
+                runner.served += 1
+                runner.rss_mb = reply.get("rssMb") or runner.rss_mb
+                if (self._max_requests and runner.served >= self._max_requests) or (
+                    self._max_rss_mb and runner.rss_mb >= self._max_rss_mb
+                ):
+                    runner.retiring = True
+            if runner.retiring and runner.in_flight == 0:
+                # The next request starts a new process
+                _process_manager.stop_process(_runner_key(workspace, index))
+                runner.reset()
+                self.recycled += 1
+            self._condition.notify_all()
+
+    def _evict_idle_runners(self):
+        while True:
+            time.sleep(max(1.0, min(60.0, self._idle_timeout / 4)))
+            self.evict_idle_runners()
+
+    def evict_idle_runners(self) -> None:
+        """Stops the runners that got no request for idle_timeout seconds."""
+        if not self._idle_timeout:
+            return
+        now = time.monotonic()
+        with self._condition:
+            for workspace, runners in self._runners.items():
+                for index, runner in enumerate(runners):
+                    idle = runner.in_flight == 0 and runner.client is not None
+                    if idle and now - runner.last_used > self._idle_timeout:
+                        _process_manager.stop_process(_runner_key(workspace, index))
+                        runner.reset()
+                        self.evicted += 1
+
+    def get_stats(self) -> Dict:
+        """Requests in flight and served, memory and idle time of the runners, by workspace,
+        and the number of runners recycled and evicted."""
+        now = time.monotonic()
+        with self._condition:
+            return {
+                "runners": {
+                    workspace: [
+                        {
+                            "running": runner.client is not None,
+                            "inFlight": runner.in_flight,
+                            "served": runner.served,
+                            "rssMb": round(runner.rss_mb, 1),
+                            "idleS": round(now - runner.last_used, 1),
+                        }
+                        for runner in runners
+                    ]
+                    for workspace, runners in self._runners.items()
+                },
+                "recycled": self.recycled,
+                "evicted": self.evicted,
+                "startErrors": {
+                    workspace: error for workspace, (_, error) in self._start_errors.items()
+                },
+            }
+
+
+_runner_pool = RunnerPool()
+
+
+def _runner_key(workspace: str, index: int) -> str:
+    return f"{workspace}#{index}"
+
+
+def set_runner_pool_size(size: int) -> None:
+    """Sets the number of warm runners kept per workspace."""
+    _runner_pool.set_size(size)
+
+
+def set_runner_concurrency(concurrency: int) -> None:
+    """Sets the number of requests each warm runner runs at the same time."""
+    _runner_pool.set_concurrency(concurrency)
+
+
+def set_runner_limits(
+    max_requests: int = 0,
+    max_rss_mb: float = 0,
+    memory_limit_mb: int = 0,
+    idle_timeout: float = 0,
+) -> None:
+    """Sets when warm runners are recycled or stopped, and their memory limit."""
+    _runner_pool.set_limits(max_requests, max_rss_mb, memory_limit_mb, idle_timeout)
+
+
+def get_runner_stats() -> Dict:
+    """Returns the state of the warm runners."""
+    return _runner_pool.get_stats()
+
+
+def start_runner_pool(workspace: str, interpreter: Sequence[str], cwd: str) -> None:
+    """Starts the warm runners of a workspace."""
+    _runner_pool.start(workspace, interpreter, cwd)
+
+
 class RpcRunResult:
     """Object to hold result from running tool over RPC."""
 
@@ -205,6 +747,23 @@ class RpcRunResult:
         self.stdout: str = stdout
         self.stderr: str = stderr
         self.exception: Optional[str] = exception
+        # Milliseconds the request waited for a thread of the runner, and ran
+        self.queue_ms: Optional[float] = None
+        self.exec_ms: Optional[float] = None
+
+
+def _to_run_result(data: Dict) -> RpcRunResult:
+    result = data["result"] if "result" in data else ""
+    if "error" in data:
+        if data.get("exception", False):
+            run_result = RpcRunResult(result, "", data["error"])
+        else:
+            run_result = RpcRunResult(result, data["error"])
+    else:
+        run_result = RpcRunResult(result, "")
+    run_result.queue_ms = data.get("queueMs")
+    run_result.exec_ms = data.get("execMs")
+    return run_result
 
 
 # pylint: disable=too-many-arguments
@@ -216,15 +775,15 @@ def run_over_json_rpc(
     use_stdin: bool,
     cwd: str,
     source: str = None,
+    timeout: Optional[float] = None,
 ) -> RpcRunResult:
     """Uses JSON-RPC to execute a command."""
-    rpc: Union[JsonRpc, None] = get_or_start_json_rpc(workspace, interpreter, cwd)
+    rpc: Union[JsonRpcClient, None] = get_or_start_json_rpc(workspace, interpreter, cwd)
     if not rpc:
         raise Exception("Failed to run over JSON-RPC.")
 
-    msg_id = str(uuid.uuid4())
     msg = {
-        "id": msg_id,
+        "id": str(uuid.uuid4()),
         "method": "run",
         "module": module,
         "argv": argv,
@@ -234,24 +793,50 @@ def run_over_json_rpc(
     if source:
         msg["source"] = source
 
-    rpc.send_data(msg)
+    return _to_run_result(rpc.request(msg, timeout))
 
-    data = rpc.receive_data()
 
-    if data["id"] != msg_id:
-        return RpcRunResult(
-            "", f"Invalid result for request: {json.dumps(msg, indent=4)}"
-        )
-
-    result = data["result"] if "result" in data else ""
-    if "error" in data:
-        error = data["error"]
-
-        if data.get("exception", False):
-            return RpcRunResult(result, "", error)
-        return RpcRunResult(result, error)
-
-    return RpcRunResult(result, "")
+def run_request_over_json_rpc(
+    workspace: str,
+    interpreter: Sequence[str],
+    cwd: str,
+    method: str,
+    params: Dict,
+    timeout: Optional[float] = None,
+    on_output: Optional[Callable[[str, str], None]] = None,
+) -> RpcRunResult:
+    """Sends a request to one of the warm runners of the workspace. When the runner
+    exits before replying (e.g. it crashed), the request is sent again to a new one.
+    With on_output, the runner streams what the request prints: on_output(stream, text)
+    is called as it arrives."""
+    def forward_output(data: Dict):
+        if data["method"] == "output":
+            on_output(data["stream"], data["text"])
+
+    on_notification = None
+    if on_output is not None:
+        params = {**params, "streamOutput": True}
+        on_notification = forward_output
+
+    for attempt in range(REQUEST_REPLAYS + 1):
+        index, rpc = _runner_pool.acquire(workspace, interpreter, cwd)
+        data = None
+        try:
+            if not rpc:
+                raise Exception("Failed to run over JSON-RPC.")
+            data = rpc.request(
+                {"id": str(uuid.uuid4()), "method": method, **params},
+                timeout,
+                on_notification,
+            )
+            break
+        except (StreamClosedException, BrokenPipeError):
+            if attempt == REQUEST_REPLAYS:
+                raise
+        finally:
+            _runner_pool.release(workspace, index, data)
+
+    return _to_run_result(data)
 
 
 def shutdown_json_rpc():
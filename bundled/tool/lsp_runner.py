@@ -29,54 +29,175 @@ update_sys_path(
 )
 
 
+def set_memory_limit(limit_mb: int) -> None:
+    """Limits the address space of the runner (POSIX only): past it, allocations of
+    requests fail with MemoryError instead of exhausting the machine's memory."""
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return
+    limit = limit_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        pass
+
+
+def get_rss_mb():
+    """Resident memory of the runner in MB: the current one on Linux, the peak one on
+    other POSIX systems, None on Windows."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+# Set by the server's runner pool, before anything is loaded
+if int(os.getenv("LS_RUNNER_MEMORY_LIMIT_MB", "0")) > 0:
+    set_memory_limit(int(os.getenv("LS_RUNNER_MEMORY_LIMIT_MB")))
+
+
 # pylint: disable=wrong-import-position,import-error
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import lsp_jsonrpc as jsonrpc
 import lsp_utils as utils
 
+# Preload ghostwriter (and black, which it uses to format its output) at spawn
+# time so that requests served by this runner do not pay for the imports.
+from auxiliary_files.ghostwriter_engine import (
+    MODULE_LOCK,
+    getGhostwriter,
+    writeUsingGhostwriter,
+    writeUsingGhostwriterFromSource,
+)
+
+getGhostwriter()
+
+try:
+    import black  # pylint: disable=unused-import
+except ImportError:
+    pass
+
 RPC = jsonrpc.create_json_rpc(sys.stdin.buffer, sys.stdout.buffer)
+# stdout carries the replies: what request threads print outside of a capture goes to stderr
+sys.stdout = sys.stderr
+
+# Number of requests run at the same time, each on its own thread. Replies are sent
+# as requests finish, tagged with their id
+CONCURRENCY = max(1, int(os.getenv("LS_RUNNER_CONCURRENCY", "1")))
+EXECUTOR = ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix="request")
 
 def fac(n):
     if n == 0:
         return 1
     return n * fac(n - 1)
 
-EXIT_NOW = False
-while not EXIT_NOW:
-    msg = RPC.receive_data()
-
-    method = msg["method"]
-    if method == "exit":
-        EXIT_NOW = True
-        continue
-    
-    if method == "run":
-        is_exception = False
-        # This is needed to preserve sys.path, pylint modifies
-        # sys.path and that might not work for this scenario
-        # next time around.
-        with utils.substitute_attr(sys, "path", sys.path[:]):
-            try:
-                # TODO: `utils.run_module` is equivalent to running `python -m <pytool-module>`.
-                # If your tool supports a programmatic API then replace the function below
-                # with code for your tool. You can also use `utils.run_api` helper, which
-                # handles changing working directories, managing io streams, etc.
-                # Also update `_run_tool_on_document` and `_run_tool` functions in `lsp_server.py`.
-                result = utils.run_module(
-                    module=msg["module"],
-                    argv=msg["argv"],
-                    use_stdin=msg["useStdin"],
-                    cwd=msg["cwd"],
-                    source=msg["source"] if "source" in msg else None,
-                )
-            except Exception:  # pylint: disable=broad-except
-                result = utils.RunResult("", traceback.format_exc(chain=True))
-                is_exception = True
-
-        response = {"id": msg["id"]}
-        if result.stderr:
-            response["error"] = result.stderr
-            response["exception"] = is_exception
-        elif result.stdout:
-            response["result"] = result.stdout
-
-        RPC.send_data(response)
+
+def send_output(msg_id: str):
+    """Sends what a request prints to the server as it is printed, in "output"
+    notifications tagged with the id of the request."""
+
+    def on_output(stream: str, text: str):
+        RPC.send_data({"id": msg_id, "method": "output", "stream": stream, "text": text})
+
+    return on_output
+
+
+def ghostwrite(msg):
+    """Writes a PBT of functions of a module file ("ghostwrite") or of a source string
+    ("ghostwriteSource"). With "streamOutput", the output is sent as it is printed."""
+    on_output = send_output(msg["id"]) if msg.get("streamOutput") else None
+    if msg["method"] == "ghostwrite":
+        is_error, output = writeUsingGhostwriter(
+            msg["module"], msg["functions"], msg["argument"], msg["cwd"], on_output
+        )
+    else:
+        is_error, output = writeUsingGhostwriterFromSource(
+            msg["module"],
+            msg["source"],
+            msg["functions"],
+            msg["argument"],
+            on_output,
+            msg.get("cwd"),
+        )
+
+    response = {"id": msg["id"]}
+    if is_error:
+        response["error"] = output
+        response["exception"] = True
+    else:
+        response["result"] = output
+    return response
+
+
+def run(msg):
+    """Runs the tool as `python -m <module>` would."""
+    is_exception = False
+    # This is needed to preserve sys.path, pylint modifies
+    # sys.path and that might not work for this scenario
+    # next time around. The lock keeps other requests from changing it meanwhile.
+    with MODULE_LOCK, utils.substitute_attr(sys, "path", sys.path[:]):
+        try:
+            # TODO: `utils.run_module` is equivalent to running `python -m <pytool-module>`.
+            # If your tool supports a programmatic API then replace the function below
+            # with code for your tool. You can also use `utils.run_api` helper, which
+            # handles changing working directories, managing io streams, etc.
+            # Also update `_run_tool_on_document` and `_run_tool` functions in `lsp_server.py`.
+            result = utils.run_module(
+                module=msg["module"],
+                argv=msg["argv"],
+                use_stdin=msg["useStdin"],
+                cwd=msg["cwd"],
+                source=msg["source"] if "source" in msg else None,
+            )
+        except Exception:  # pylint: disable=broad-except
+            result = utils.RunResult("", traceback.format_exc(chain=True))
+            is_exception = True
+
+    response = {"id": msg["id"]}
+    if result.stderr:
+        response["error"] = result.stderr
+        response["exception"] = is_exception
+    elif result.stdout:
+        response["result"] = result.stdout
+    return response
+
+
+HANDLERS = {"ghostwrite": ghostwrite, "ghostwriteSource": ghostwrite, "run": run}
+
+
+def handle(msg, received: float):
+    """Runs a request on a worker thread and sends its reply, with the time it waited
+    for a thread (queueMs), the time it ran (execMs) and the runner's memory (rssMb),
+    which the server uses to recycle runners."""
+    started = time.perf_counter()
+    try:
+        response = HANDLERS[msg["method"]](msg)
+    except Exception:  # pylint: disable=broad-except
+        response = {
+            "id": msg["id"],
+            "error": traceback.format_exc(chain=True),
+            "exception": True,
+        }
+    response["queueMs"] = round((started - received) * 1000, 3)
+    response["execMs"] = round((time.perf_counter() - started) * 1000, 3)
+    rss_mb = get_rss_mb()
+    if rss_mb is not None:
+        response["rssMb"] = round(rss_mb, 1)
+    RPC.send_data(response)
+
+
+for msg in RPC.receive_requests():
+    EXECUTOR.submit(handle, msg, time.perf_counter())
+
+# Requests already running still get their reply
+EXECUTOR.shutdown(wait=True, cancel_futures=True)
@@ -3,22 +3,64 @@
 """Implementation of tool support over LSP."""
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import copy
+import functools
 import json
 import os
 import pathlib
-import re
 import sys
-import sysconfig
+import threading
+import time
 import traceback
-from typing import Any, Optional, Sequence
-
-from pbt_types import *
-from auxiliary_files.other import *
-from auxiliary_files.snippet_generators import *
+import types
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+# Start of the server's imports, see STARTUP_TIMES
+IMPORT_START = time.perf_counter()
+
+from pbt_types import PbtTypeId, pbtTypes
+from auxiliary_files.other import (
+    ImportStructure,
+    fishOutPbt,
+    getArgsFromPbt,
+    getImportRegionStructure,
+    getParameters,
+    getSutNamesFromSelection,
+    getSutSourceList,
+    getSymbolTable,
+    getTestFileName,
+    makeCustomGenerators,
+    makeImportStructure,
+    parseSource,
+    removeImports,
+    replaceNothingPlaceholder,
+    spliceImports,
+)
+from auxiliary_files.snippet_generators import (
+    SNIPPET_TEMPLATES,
+    addCustomStrategyPlaceholders,
+    createExampleSnippet,
+    makeSnippet,
+)
+from auxiliary_files.ghostwriter_engine import (
+    getDefaultStyle,
+    getGhostwriter,
+    getHypothesisVersion,
+    writeUsingGhostwriter,
+    writeUsingGhostwriterFromSource,
+)
+from auxiliary_files.caching import LruCache, makeSignatureFingerprint
+from auxiliary_files.document_cache import DOCUMENT_CACHE
+from auxiliary_files.function_index import FunctionIndex
+from auxiliary_files.metrics import METRICS, timed
+from auxiliary_files.profiling import PROFILER
 
-import ast
-import hypothesis.extra.ghostwriter as gw
+# workspace_index and import_timing are imported when first needed, see
+# _get_workspace_indexer and _warm_up: initialize does not wait for them
 
 
 # **********************************************************
@@ -49,6 +91,10 @@ import lsprotocol.types as lsp
 import custom_commands as lspCustom
 from pygls import server, uris, workspace
 
+# Durations (ms) of the server's startup: its imports, initialize, and the warm-up that
+# follows it (the ghostwriter import, which is deferred to it, and the templates)
+STARTUP_TIMES = {"importMs": round((time.perf_counter() - IMPORT_START) * 1000, 1)}
+
 WORKSPACE_SETTINGS = {}
 GLOBAL_SETTINGS = {}
 RUNNER = pathlib.Path(__file__).parent / "lsp_runner.py"
@@ -58,6 +104,122 @@ LSP_SERVER = server.LanguageServer(
     name="EasyPBT", version="0.0.1", max_workers=MAX_WORKERS
 )
 
+# Blocking work of the handlers runs in these executors instead of on the event loop:
+# - generations (ghostwriter, subprocesses, test file I/O), which can take seconds
+# - document work (function indexes, parsing), in order, so a query sees all earlier changes
+GENERATION_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="generation")
+DOCUMENT_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="documents")
+
+# Seconds a runner has to answer a request before the generation falls back to the CLI
+RUNNER_TIMEOUT = 120
+
+
+def offload(executor: ThreadPoolExecutor):
+    """Turns a blocking handler into an async one that runs it in executor,
+    so that other requests are served while it runs"""
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def asyncHandler(*args):
+            return await asyncio.get_running_loop().run_in_executor(executor, handler, *args)
+
+        return asyncHandler
+
+    return decorator
+
+
+# Where the engines stream the output of the generation run by the current thread,
+# see RequestProgress.streaming_output
+OUTPUT_LISTENER = threading.local()
+
+
+def _get_output_listener():
+    """on_output(stream, text) of the generation run by the current thread, or None"""
+    return getattr(OUTPUT_LISTENER, "listener", None)
+
+
+class RequestProgress:
+    """Reports the progress of a request whose params carry the LSP progress tokens, as
+    $/progress notifications: work done (begin, a report per finished job, end) on
+    workDoneToken, and partial results on partialResultToken: {"output": [chunk]} for what
+    a job prints and {"jobs": [result]} for every finished job, as soon as it is there.
+    The final response is still the whole result. Without tokens, nothing is sent"""
+
+    def __init__(self, params, title: str, total: int = 1):
+        self.work_done_token = getattr(params, "workDoneToken", None)
+        self.partial_result_token = getattr(params, "partialResultToken", None)
+        self.title = title
+        self.total = total
+        self.done = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        if self.work_done_token is not None:
+            self._notify(
+                LSP_SERVER.progress.begin,
+                self.work_done_token,
+                lsp.WorkDoneProgressBegin(title=self.title, percentage=0),
+            )
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.work_done_token is not None:
+            self._notify(
+                LSP_SERVER.progress.end, self.work_done_token, lsp.WorkDoneProgressEnd()
+            )
+            LSP_SERVER.progress.tokens.pop(self.work_done_token, None)
+
+    def report_job(self, index: int, jobResult: dict):
+        """Sends the result of a finished job, and how many jobs are done"""
+        with self.lock:
+            self.done += 1
+            done = self.done
+        self.send_partial_result({"jobs": [{"index": index, **jobResult}]})
+        if self.work_done_token is not None:
+            self._notify(
+                LSP_SERVER.progress.report,
+                self.work_done_token,
+                lsp.WorkDoneProgressReport(
+                    message=f"{done}/{self.total}",
+                    percentage=done * 100 // max(self.total, 1),
+                ),
+            )
+
+    def send_partial_result(self, value: dict):
+        if self.partial_result_token is not None:
+            self._notify(
+                LSP_SERVER.send_notification,
+                lsp.PROGRESS,
+                lsp.ProgressParams(token=self.partial_result_token, value=value),
+            )
+
+    @contextlib.contextmanager
+    def streaming_output(self, index: int = 0):
+        """Streams what the engines print while generating job index on this thread"""
+        if self.partial_result_token is None:
+            yield
+            return
+
+        def onOutput(stream: str, text: str):
+            self.send_partial_result(
+                {"output": [{"index": index, "stream": stream, "text": text}]}
+            )
+
+        previous = _get_output_listener()
+        OUTPUT_LISTENER.listener = onOutput
+        try:
+            yield
+        finally:
+            OUTPUT_LISTENER.listener = previous
+
+    @staticmethod
+    def _notify(send, *args):
+        # Progress is best effort: a client that went away must not fail the generation
+        try:
+            send(*args)
+        except Exception:  # pylint: disable=broad-except
+            pass
+
 
 # **********************************************************
 # Tool specific code goes below this.
@@ -79,12 +241,58 @@ TOOL_DISPLAY = "EasyPBT"
 TOOL_NAME = ["hypothesis"]
 TOOL_ARGS = ["write"]  # default arguments always passed to your tool.
 
+# How ghostwriter is run:
+#  "cli": spawn `hypothesis write` for every request
+#  "inProcess": call `hypothesis.extra.ghostwriter` directly in the server process
+#  "runner": send the request to a pool of warm runner processes (lsp_runner.py)
+#            started with the workspace interpreter
+#  "compare": run both, log their latency and whether the outputs match, return the in-process one
+GHOSTWRITER_ENGINES = ["cli", "inProcess", "runner", "compare"]
+
+# Generated PBTs, keyed by the fingerprint of the SUT signatures (see _get_PBT)
+PBT_CACHE_SIZE = 256
+PBT_CACHE_ERROR_TTL = 10  # seconds a failed generation stays cached
+PBT_CACHE = LruCache(PBT_CACHE_SIZE)
+
+# Generations waiting for the client's strategy choices, keyed by session token: generatePBT
+# keeps the PBT without its imports and the SUT it tests, generateSnippet only gets the token back
+GENERATION_SESSION_COUNT = 64
+GENERATION_SESSION_TTL = 600  # seconds
+GENERATION_SESSIONS = LruCache(GENERATION_SESSION_COUNT)
+
+# Incrementally updated function indexes of the open documents, keyed by URI
+FUNCTION_INDEXES = {}
+
+# Functions of all Python files of the workspace folders, indexed in the background.
+# Created by its first user, see _get_workspace_indexer
+WORKSPACE_INDEXER = None
+WORKSPACE_INDEXER_LOCK = threading.Lock()
+
+
+def _get_workspace_indexer():
+    global WORKSPACE_INDEXER  # pylint: disable=global-statement
+    with WORKSPACE_INDEXER_LOCK:
+        if WORKSPACE_INDEXER is None:
+            # pylint: disable-next=import-outside-toplevel
+            from auxiliary_files.workspace_index import WorkspaceIndexer
+
+            WORKSPACE_INDEXER = WorkspaceIndexer()
+        return WORKSPACE_INDEXER
+
+
+def _shutdown_workspace_indexer():
+    with WORKSPACE_INDEXER_LOCK:
+        indexer = WORKSPACE_INDEXER
+    if indexer is not None:
+        indexer.shutdown()
+
 # **********************************************************
 # Required Language Server Initialization and Exit handlers.
 # **********************************************************
 @LSP_SERVER.feature(lsp.INITIALIZE)
 def initialize(params: lsp.InitializeParams) -> None:
     """LSP handler for initialize request."""
+    start = time.perf_counter()
     log_to_output(f"CWD Server: {os.getcwd()}")
 
     paths = "\r\n   ".join(sys.path)
@@ -101,17 +309,96 @@ def initialize(params: lsp.InitializeParams) -> None:
         f"Global settings:\r\n{json.dumps(GLOBAL_SETTINGS, indent=4, ensure_ascii=False)}\r\n"
     )
 
+    METRICS.enabled = bool(_get_global_defaults()["metrics"])
+    PROFILER.log = log_to_output
+    PROFILER.armFromEnvironment()
+
+    if _get_ghostwriter_engine() == "runner":
+        threading.Thread(target=_start_runners, daemon=True).start()
+    threading.Thread(target=_warm_up, daemon=True).start()
+
+    roots = [key for key, value in WORKSPACE_SETTINGS.items() if value.get("workspaceIndex", True)]
+    if roots:
+        threading.Thread(target=lambda: _get_workspace_indexer().start(roots), daemon=True).start()
+    STARTUP_TIMES["initializeMs"] = round((time.perf_counter() - start) * 1000, 1)
+
 
 @LSP_SERVER.feature(lsp.EXIT)
 def on_exit(_params: Optional[Any] = None) -> None:
     """Handle clean up on exit."""
     jsonrpc.shutdown_json_rpc()
+    _shutdown_workspace_indexer()
+    _shutdown_executors()
 
 
 @LSP_SERVER.feature(lsp.SHUTDOWN)
 def on_shutdown(_params: Optional[Any] = None) -> None:
     """Handle clean up on shutdown."""
     jsonrpc.shutdown_json_rpc()
+    _shutdown_workspace_indexer()
+    _shutdown_executors()
+
+
+def _shutdown_executors():
+    for executor in (GENERATION_EXECUTOR, DOCUMENT_EXECUTOR):
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+@LSP_SERVER.feature(lsp.TEXT_DOCUMENT_DID_OPEN)
+def on_did_open(params: lsp.DidOpenTextDocumentParams) -> None:
+    """Indexes the functions of an opened document."""
+    document = LSP_SERVER.workspace.get_text_document(params.text_document.uri)
+    DOCUMENT_EXECUTOR.submit(_update_function_index, document.uri, None, document.lines)
+
+
+@LSP_SERVER.feature(lsp.TEXT_DOCUMENT_DID_CHANGE)
+def on_did_change(params: lsp.DidChangeTextDocumentParams) -> None:
+    """Re-indexes only the parts of a document touched by the changes."""
+    document = LSP_SERVER.workspace.get_text_document(params.text_document.uri)
+
+    changes = []
+    for change in params.content_changes:
+        if hasattr(change, "range"):
+            changes.append((change.range.start.line, change.range.end.line, change.text))
+        else:
+            changes.append(None)
+
+    # The lines are taken now, as the document may change again before the update runs
+    DOCUMENT_EXECUTOR.submit(_update_function_index, document.uri, changes, document.lines)
+
+
+@LSP_SERVER.feature(lsp.TEXT_DOCUMENT_DID_CLOSE)
+def on_did_close(params: lsp.DidCloseTextDocumentParams) -> None:
+    """Drops the function index of a closed document."""
+    DOCUMENT_EXECUTOR.submit(FUNCTION_INDEXES.pop, params.text_document.uri, None)
+
+
+def _update_function_index(uri: str, changes, lines: list[str]):
+    """Applies changes to the function index of a document (changes is None when it was opened)"""
+    try:
+        index = FUNCTION_INDEXES.get(uri)
+        if index is None or changes is None:
+            FUNCTION_INDEXES[uri] = FunctionIndex(lines)
+        else:
+            index.update(changes, lines)
+    except Exception:  # pylint: disable=broad-except
+        log_error(f"Function index update failed:\r\n{traceback.format_exc()}")
+
+
+@LSP_SERVER.feature(lsp.WORKSPACE_DID_CHANGE_WATCHED_FILES)
+def on_did_change_watched_files(params: lsp.DidChangeWatchedFilesParams) -> None:
+    """Keeps the workspace index up to date with created, changed and deleted files."""
+    changed = []
+    deleted = []
+    for event in params.changes:
+        path = uris.to_fs_path(event.uri)
+        if not path or not path.endswith(".py"):
+            continue
+        if event.type == lsp.FileChangeType.Deleted:
+            deleted.append(path)
+        else:
+            changed.append(path)
+    _get_workspace_indexer().onFilesChanged(changed, deleted)
 
 
 @LSP_SERVER.feature(lspCustom.CUSTOM_GET_PBT_TYPES)
@@ -123,16 +410,124 @@ def on_get_pbt_types_command(params: Optional[Any] = None):
     return result
 
 
+@LSP_SERVER.feature(lspCustom.CUSTOM_GET_CACHE_STATS)
+def on_get_cache_stats(params: Optional[Any] = None):
+    """Returns a JSON-RPC response with the hit/miss/eviction counts of the server caches"""
+    result = {}
+    result["isError"] = False
+    result["pbtCache"] = PBT_CACHE.getStats()
+    result["documentCache"] = DOCUMENT_CACHE.getStats()
+    result["generationSessions"] = GENERATION_SESSIONS.getStats()
+    return result
+
+
+@LSP_SERVER.feature(lspCustom.CUSTOM_GET_SERVER_STATS)
+def on_get_server_stats(params: Optional[Any] = None):
+    """Returns a JSON-RPC response with the latency (p50/p95/p99, in ms) and payload size
+    histograms of the custom requests and their stages, the cache statistics, the startup times
+    and the state of the warm runners. With reset set, the histograms start over"""
+    result = {}
+    result["isError"] = False
+    result["metrics"] = METRICS.getStats()
+    result["pbtCache"] = PBT_CACHE.getStats()
+    result["documentCache"] = DOCUMENT_CACHE.getStats()
+    result["startup"] = dict(STARTUP_TIMES)
+    result["runners"] = jsonrpc.get_runner_stats()
+    if getattr(params, "reset", False):
+        METRICS.reset()
+    return result
+
+
+@LSP_SERVER.feature(lspCustom.CUSTOM_PROFILE_REQUESTS)
+def on_profile_requests(params: Optional[Any] = None):
+    """Profiles (cProfile and tracemalloc) the next count requests of the given handlers
+    (e.g. 'generatePBT', all when none are given), count 0 stops. The paths of the written
+    files are logged to the output channel. Returns a JSON-RPC response with what is armed"""
+    handlers = list(getattr(params, "handlers", None) or [])
+    count = getattr(params, "count", None)
+    directory = getattr(params, "directory", None)
+
+    result = {}
+    result["isError"] = False
+    result["remaining"] = PROFILER.arm(handlers, 1 if count is None else int(count), directory)
+    result["directory"] = PROFILER.directory
+    return result
+
+
 @LSP_SERVER.feature(lspCustom.CUSTOM_GET_ALL_DEFINED_FUNCTIONS_FROM_FILE)
+@offload(DOCUMENT_EXECUTOR)
+@timed("getDefinedFunctionsFromFile")
 def on_get_all_defined_functions_from_file(params: Optional[Any] = None):
-    """Returns a JSON-RPC response with a list of all defined functions from given file"""
-    functions = _get_functions_from_source(params.source)
+    """Returns a JSON-RPC response with a list of all defined functions from given file.
+    For open documents (given by uri), the functions of the last version without
+    syntax errors are returned"""
+    result = {}
+    result["isError"] = False
+
+    index = FUNCTION_INDEXES.get(getattr(params, "uri", None))
+    if index is not None:
+        result["functions"] = index.getFunctions()
+        return result
+
+    # Files that are not open can be listed by path alone, from the workspace index
+    filePath = getattr(params, "filePath", None)
+    if getattr(params, "source", None) is None and filePath:
+        functions = _get_workspace_indexer().getFileFunctions(filePath)
+        if functions is not None:
+            result["functions"] = [_to_listed_function(function) for function in functions]
+            return result
+        params.source = _read_document(filePath)[1] or ""
+
+    try:
+        result["functions"] = _get_functions_from_source(params.source)
+    except SyntaxError:
+        result["isError"] = True
+        result["functions"] = []
+    return result
+
+def _to_listed_function(function: dict) -> dict:
+    """A function of the workspace index, as listed by custom/getDefinedFunctionsFromFile"""
+    return {"name": function["name"], "lineStart": function["lineStart"], "lineEnd": function["lineEnd"]}
+
+
+def _get_sut_ranges(filePath: str, functions):
+    """Line spans of the SUTs of a job: those sent by the client or, for SUTs picked by name
+    only, those of the workspace index. None when a span is unknown (SUTs are looked up by name)"""
+    ranges = []
+    indexed = None
+    for function in functions:
+        lineStart = getattr(function, "lineStart", None)
+        if lineStart is not None:
+            ranges.append((lineStart, function.lineEnd))
+            continue
+        if indexed is None:
+            indexed = {f["name"]: f for f in _get_workspace_indexer().getFileFunctions(filePath) or []}
+        if function.name not in indexed:
+            return None
+        ranges.append((indexed[function.name]["lineStart"], indexed[function.name]["lineEnd"]))
+    return ranges
+
+
+@LSP_SERVER.feature(lspCustom.CUSTOM_GET_WORKSPACE_FUNCTIONS)
+@offload(DOCUMENT_EXECUTOR)
+@timed("getWorkspaceFunctions")
+def on_get_workspace_functions(params: Optional[Any] = None):
+    """Returns a JSON-RPC response with the functions of all Python files of the workspace
+    whose name contains the (optional) query, as found by the background indexer"""
+    query = getattr(params, "query", None) or ""
+    limit = getattr(params, "limit", None)
+
     result = {}
     result["isError"] = False
-    result["functions"] = functions
+    indexer = _get_workspace_indexer()
+    result["functions"] = indexer.getFunctions(query, limit)
+    result["isComplete"] = indexer.isReady()
     return result
 
+
 @LSP_SERVER.feature(lspCustom.CUSTOM_GENERATE_PBT)
+@offload(GENERATION_EXECUTOR)
+@timed("generatePBT")
 def on_generate_PBT(params: Optional[Any] = None):
     """Returns a JSON-RPC response with the generated PBT"""
 
@@ -152,19 +547,25 @@ def on_generate_PBT(params: Optional[Any] = None):
     # === Generate PBT 
     # Run ghostwriter
     fileName = os.path.basename(filePath)
-    moduleName = fileName[:-3]
+    moduleName = _get_module_name(filePath)
     # (isError, pbt) = _get_PBT(moduleName, list(map(lambda f: f.name, functions)), pbtType)
     
     # Get function names
     sutNames = []
+    sutRanges = None
     if useSelection:
         sutNames = getSutNamesFromSelection(selectedCode)
     else:
         sutNames = list(map(lambda f: f.name, functions))
+        sutRanges = list(map(lambda f: (f.lineStart, f.lineEnd), functions))
     
-    sutSourceList = getSutSourceList(source, sutNames)
-    print("\n\nSOURCELIST: ", sutSourceList)
-    (isError, pbt) = _get_PBT(sutNames, sutSourceList, pbtType, moduleName)
+    with METRICS.span("generatePBT.parse"):
+        sutSourceList = getSutSourceList(source, sutNames, sutRanges)
+    log_to_output(f"SUT sources: {sutSourceList}")
+    # What the engine prints is streamed to the client while it runs
+    with METRICS.span("generatePBT.ghostwriter"), RequestProgress(params, "Generating PBT") as progress:
+        with progress.streaming_output():
+            (isError, pbt) = _get_PBT(sutNames, sutSourceList, pbtType, moduleName, moduleSource=source)
 
     # Return error
     if isError:
@@ -174,69 +575,233 @@ def on_generate_PBT(params: Optional[Any] = None):
         result["pbt"] = pbt
         return result
     
-    # Get PBT import structure
-    pbtImports = makeImportStructure(pbt)
-
-    
     # === Compute imports
-    # Read test file
+    # Read test file (the editor's buffer when it is open)
     testFileName = getTestFileName(fileName, testFileNamePattern)
-    testFileContents = ""
-    if os.path.isfile(testFileName):
-        testFile = open(testFileName, "r")
-        testFileContents = testFile.read()
-        testFile.close()
+    testFilePath = os.path.join(os.path.dirname(filePath), testFileName)
+    with METRICS.span("generatePBT.readTestFile"):
+        version, testFileContents = _read_document(testFilePath)
 
-    # Get current import structure of test file
-    testFileImports = makeImportStructure(testFileContents)
+    # Add the imports the test file lacks to its import block and end it with a blank line,
+    # where the client inserts the PBT. The rest of the file is kept as is
+    with METRICS.span("generatePBT.mergeImports"):
+        pbtImports = makeImportStructure(pbt)
+        insertions = [spliceImports(testFileContents or "", pbtImports)]
+        insertions.append((len(testFileContents or ""), _missing_newlines(insertions, testFileContents or "", 2)))
 
-    # Merge import structures
-    newImports = testFileImports + pbtImports
-    newTestFileContents = rewriteImports(testFileContents, newImports) + "\n\n"
-
-    # === Write to test file
-    testFile = open(testFileName, "w+")
-    testFile.write(newTestFileContents)
-    testFile.close()
+    # === Edit of the test file, applied by the client
+    with METRICS.span("generatePBT.edit"):
+        edit = lsp.WorkspaceEdit(document_changes=_test_file_changes(testFilePath, version, testFileContents, insertions))
 
     # === Create vscode snippet 
-    snippet = replaceNothingPlaceholder(removeImports(pbt))
+    with METRICS.span("generatePBT.snippet"):
+        pbtBody = removeImports(pbt)
+        snippet = replaceNothingPlaceholder(pbtBody)
 
+    # === Keep what generateSnippet needs: the client sends back the token, not the PBT
+    sessionToken = uuid.uuid4().hex
+    GENERATION_SESSIONS.put(sessionToken, {"pbtBody": pbtBody, "sutName": sutNames[0]}, GENERATION_SESSION_TTL)
 
     # === Return result
     result = {}
     result["isError"] = False
-    result["pbt"] = pbt
+    result["sessionToken"] = sessionToken
     result["pbtSnippet"] = snippet 
-    result["testFileName"] = os.path.dirname(filePath) + "/" + testFileName
+    result["testFileName"] = testFilePath
     result["functionParameters"] = getParameters(pbt)
-    result["functions"] = functions
+    result["edit"] = edit
 
     return result
 
+@LSP_SERVER.feature(lspCustom.CUSTOM_GENERATE_PBT_BATCH)
+@offload(GENERATION_EXECUTOR)
+@timed("generatePBTBatch")
+def on_generate_PBT_batch(params: Optional[Any] = None):
+    """Generates the PBTs of several jobs (SUTs and a PBT type each) in parallel.
+    The imports of all PBTs are merged once and each affected test file is edited once,
+    with the tests appended. Returns a JSON-RPC response with the result and time of every job,
+    and the edit of the test files for the client to apply. The result of every job (and what
+    it prints) is also sent as a partial result as soon as it is there, see RequestProgress"""
+    batchStart = time.perf_counter()
+
+    testFileNamePattern = _get_global_defaults()["testFileNamePattern"]
+    if testFileNamePattern == "":
+        testFileNamePattern = "_test"
+
+    # A job may target another file than the one of the batch (e.g. a SUT from the workspace index)
+    def getJobFile(job):
+        filePath = getattr(job, "filePath", None) or params.filePath
+        source = getattr(job, "source", None)
+        if source is None and filePath == params.filePath:
+            source = getattr(params, "source", None)
+        if source is None:
+            source = _read_document(filePath)[1]
+        if source is None:
+            raise FileNotFoundError(filePath)
+        return filePath, source
+
+    def runJob(indexedJob):
+        index, job = indexedJob
+        start = time.perf_counter()
+        try:
+            filePath, source = getJobFile(job)
+            sutNames = list(map(lambda f: f.name, job.functions))
+            sutRanges = _get_sut_ranges(filePath, job.functions)
+            sutSourceList = getSutSourceList(source, sutNames, sutRanges)
+            moduleName = _get_module_name(filePath)
+            with progress.streaming_output(index):
+                isError, pbt = _get_PBT(sutNames, sutSourceList, job.pbtType, moduleName, moduleSource=source)
+        except Exception:  # pylint: disable=broad-except
+            filePath, isError, pbt = None, True, traceback.format_exc()
+        duration = time.perf_counter() - start
+        METRICS.recordLatency("generatePBTBatch.job", duration * 1000)
+
+        jobResult = {}
+        jobResult["isError"] = isError
+        jobResult["pbt"] = pbt
+        jobResult["timeMs"] = round(duration * 1000, 1)
+        if not isError:
+            testFileName = getTestFileName(os.path.basename(filePath), testFileNamePattern)
+            jobResult["pbtSnippet"] = replaceNothingPlaceholder(removeImports(pbt))
+            jobResult["functionParameters"] = getParameters(pbt)
+            jobResult["testFileName"] = os.path.join(os.path.dirname(filePath), testFileName)
+        progress.report_job(index, jobResult)
+        return jobResult
+
+    jobs = params.jobs
+    with RequestProgress(params, f"Generating {len(jobs)} PBTs", len(jobs)) as progress:
+        jobResults = _run_in_generation_executor(runJob, list(enumerate(jobs)))
+
+    # === Merge the imports and tests per test file
+    testFiles = {}  # test file path -> [PBT]
+    for jobResult in jobResults:
+        if not jobResult["isError"]:
+            testFiles.setdefault(jobResult["testFileName"], []).append(jobResult["pbt"])
+        else:
+            log_error("Ghostwriter error:\n" + jobResult["pbt"])
+
+    # === Edit every test file once
+    documentChanges = []
+    with METRICS.span("generatePBTBatch.edit"):
+        for testFilePath, pbts in testFiles.items():
+            pbtImports = ImportStructure()
+            for pbt in pbts:
+                pbtImports += makeImportStructure(pbt)
+            version, testFileContents = _read_document(testFilePath)
+
+            insertions = [spliceImports(testFileContents or "", pbtImports)]
+            tests = "\n\n\n".join(removeImports(pbt) for pbt in pbts) + "\n"
+            end = len(testFileContents or "")
+            insertions.append((end, _missing_newlines(insertions, testFileContents or "", 3) + tests))
+            documentChanges += _test_file_changes(testFilePath, version, testFileContents, insertions)
+
+    result = {}
+    result["isError"] = False
+    result["jobs"] = jobResults
+    result["testFileNames"] = list(testFiles)
+    result["edit"] = lsp.WorkspaceEdit(document_changes=documentChanges)
+    result["timeMs"] = round((time.perf_counter() - batchStart) * 1000, 1)
+    log_to_output(
+        f"PBT batch of {len(jobs)} jobs: {result['timeMs']} ms, "
+        f"slowest job {max([r['timeMs'] for r in jobResults], default=0)} ms"
+    )
+    return result
+
+
+def _get_module_name(filePath: str) -> str:
+    """Name the engines import a SUT file by, from the workspace folder they run in:
+    'pkg/utils.py' -> 'pkg.utils'. Files outside of it are imported by their name"""
+    from auxiliary_files.workspace_index import getModuleName  # pylint: disable=import-outside-toplevel
+
+    root = _get_settings_by_document(None)["workspaceFS"]
+    try:
+        if os.path.commonpath([os.path.abspath(root), os.path.abspath(filePath)]) == os.path.abspath(root):
+            return getModuleName(os.path.abspath(root), os.path.abspath(filePath))
+    except ValueError:  # e.g. on another drive
+        pass
+    return os.path.basename(filePath)[:-3]
+
+
+def _run_in_generation_executor(function, items: list) -> list:
+    """[function(item) for item in items], run in parallel in GENERATION_EXECUTOR from one of its
+    own threads. Items no worker has started yet are run by the calling thread, so that handlers
+    waiting for their items cannot take up all workers and wait forever"""
+    futures = [GENERATION_EXECUTOR.submit(function, item) for item in items[1:]]
+    outputs = [function(items[0])] if items else []
+    for future, item in zip(futures, items[1:]):
+        outputs.append(function(item) if future.cancel() else future.result())
+    return outputs
+
+
+def _read_document(path: str):
+    """Returns (version, source) of a file: those of the editor's buffer when it is open,
+    so unsaved changes are seen, else (None, contents on disk). source is None when it does not exist"""
+    document = LSP_SERVER.workspace.get_text_document(uris.from_fs_path(path))
+    try:
+        return document.version, document.source
+    except OSError:
+        return None, None
+
+
+def _missing_newlines(insertions: list, source: str, count: int) -> str:
+    """Newlines to append so that source, with the insertions, ends with count newlines"""
+    tail = source + "".join(text for offset, text in insertions if offset == len(source))
+    present = len(tail) - len(tail.rstrip("\n"))
+    return "\n" * max(0, count - present) if tail else ""
+
+
+def _offset_to_position(source: str, offset: int) -> lsp.Position:
+    """LSP position (line and UTF-16 character) of an offset in source"""
+    line = source.count("\n", 0, offset)
+    lineStart = source.rfind("\n", 0, offset) + 1
+    character = len(source[lineStart:offset].encode("utf-16-le")) // 2
+    return lsp.Position(line=line, character=character)
+
+
+def _test_file_changes(path: str, version: Optional[int], source: Optional[str], insertions: list) -> list:
+    """documentChanges of a WorkspaceEdit that insert texts at offsets of a test file (source None
+    when it does not exist yet, then it is created). version makes the client reject the edit
+    when the buffer changed in the meantime"""
+    uri = uris.from_fs_path(path)
+    changes = []
+    if source is None:
+        changes.append(lsp.CreateFile(uri=uri, options=lsp.CreateFileOptions(ignore_if_exists=True)))
+        source = ""
+
+    # Texts inserted at the same offset are merged, so their order cannot change
+    merged = {}
+    for offset, text in insertions:
+        merged[offset] = merged.get(offset, "") + text
+    edits = []
+    for offset, text in sorted(merged.items()):
+        if text:
+            position = _offset_to_position(source, offset)
+            edits.append(lsp.TextEdit(range=lsp.Range(start=position, end=position), new_text=text))
+
+    document = lsp.OptionalVersionedTextDocumentIdentifier(uri=uri, version=version)
+    changes.append(lsp.TextDocumentEdit(text_document=document, edits=edits))
+    return changes
+
+
 @LSP_SERVER.feature(lspCustom.CUSTOM_GENERATE_SNIPPET)
+@offload(GENERATION_EXECUTOR)
+@timed("generateSnippet")
 def on_make_snippet(params: Optional[Any] = None):
-    pbt = params.pbt
+    """Returns a JSON-RPC response with the snippet of the PBT generatePBT kept for the session
+    token, with the strategies the user chose"""
+    sessionToken = params.sessionToken
     customArgStrategyZip = params.customArgStrategyZip
-    functions = params.functions
-    useSelection = params.useSelection
-    selectedCode = params.selectedCode
-
-    # Get functions that need strategy
-    customStrategyFunctions = []
-    for name, needsCustomStrategy in customArgStrategyZip:
-        if needsCustomStrategy:
-            customStrategyFunctions += [name]
 
-    sutNames = ""
-    if useSelection:
-        sutName = getSutNamesFromSelection(selectedCode)[0]
-    else:
-        sutName = list(map(lambda f: f[0], functions))[0] # since functions magically gets turned into a list from ON_GENERATE_PBT to the client
-        # sutName = list(map(lambda f: f.name, functions))[0]
+    session = GENERATION_SESSIONS.get(sessionToken)
+    if session is None:
+        result = {}
+        result["isError"] = True
+        result["pbtSnippet"] = ""
+        result["error"] = "The generation session expired, generate the PBT again"
+        return result
 
-    strategiesString, argNames, strategiesNames = makeCustomGenerators(customArgStrategyZip, sutName)
-    finalPbt = addCustomStrategyPlaceholders(removeImports(pbt), argNames, strategiesNames)
+    strategiesString, argNames, strategiesNames = makeCustomGenerators(customArgStrategyZip, session["sutName"])
+    finalPbt = addCustomStrategyPlaceholders(session["pbtBody"], argNames, strategiesNames)
     snippet = replaceNothingPlaceholder(strategiesString + finalPbt)
 
     result = {}
@@ -246,6 +811,8 @@ def on_make_snippet(params: Optional[Any] = None):
     return result
 
 @LSP_SERVER.feature(lspCustom.CUSTOM_GENERATE_EXAMPLE)
+@offload(GENERATION_EXECUTOR)
+@timed("generateExample")
 def on_make_example(params: Optional[Any]=None):
     selectedPbt = params.selectedFunctions[0]
     pbtSource = params.pbtSource
@@ -254,31 +821,26 @@ def on_make_example(params: Optional[Any]=None):
 
     # === Add example in imports
 
-    # Read test file
-    testFileName = os.path.basename(pbtFilePath)
-    testFileContents = ""
-    if os.path.isfile(testFileName):
-        testFile = open(testFileName, "r")
-        testFileContents = testFile.read()
-        testFile.close()
+    # Read test file (the editor's buffer, where the PBT was selected)
+    version, testFileContents = _read_document(pbtFilePath)
+    if testFileContents is None:
+        version, testFileContents = None, pbtSource
 
-    # Get current import structure of test file
-    testFileImports = makeImportStructure(testFileContents)
+    # Get current import structure of test file (only its import block is read)
+    testFileImports = getImportRegionStructure(testFileContents)
 
     alreadyHasExampleImport = testFileImports.containsName("hypothesis", "example")
 
+    insertedLines = 0
+    insertions = []
     if not alreadyHasExampleImport:
         # Create import structure for example
         exampleImport = makeImportStructure("from hypothesis import example")
 
-        # Merge import structures
-        newImports = testFileImports + exampleImport
-        newTestFileContents = rewriteImports(testFileContents, newImports) + "\n\n"
-
-        # Write to test file
-        testFile = open(testFileName, "w")
-        testFile.write(newTestFileContents)
-        testFile.close()
+        # Splice it into the import block
+        offset, text = spliceImports(testFileContents, exampleImport)
+        insertedLines = text.count("\n")
+        insertions.append((offset, text))
 
     # === Get PBT
     pbtName = selectedPbt.name.split(".")[::-1][0]
@@ -287,7 +849,7 @@ def on_make_example(params: Optional[Any]=None):
     # === Parse out arguments
     # from @given 
     args = getArgsFromPbt(pbt)
-    print("ARGS: ", args)
+    log_to_output(f"Arguments of the PBT: {args}")
 
     # === Create @example() snippet
     snippet = "\n" + createExampleSnippet(args)
@@ -296,48 +858,137 @@ def on_make_example(params: Optional[Any]=None):
     result = {}
     result["isError"] = False
     result["exampleSnippet"] = snippet 
-    result["line"] = line + 1
+    result["line"] = line + 1 + insertedLines
     result["column"] = col
-    result["refresh"] = not alreadyHasExampleImport
+    result["edit"] = lsp.WorkspaceEdit(document_changes=_test_file_changes(pbtFilePath, version, testFileContents, insertions))
 
     return result
 
 @LSP_SERVER.feature(lspCustom.CUSTOM_GET_TEMPLATE)
+@offload(GENERATION_EXECUTOR)
+@timed("getTemplate")
 def on_insert_snippet(params: Optional[Any]=None):
     selectedType = params.selectedType
-    typeId = selectedType.typeId
-    typeName = selectedType.name
 
-    # Get all data necessary
+    isError, snippet = _get_template(selectedType.typeId)
+
+    result = {}
+    result["isError"] = isError
+    result["snippet"] = snippet
+    return result
+
+
+# *****************************************************
+# Property templates.
+# *****************************************************
+# Templates only depend on the PBT type, so they are rendered once (in-process,
+# without temporary files) and then served from TEMPLATES. When LS_TEMPLATE_CACHE
+# is set to a file path, the rendered templates are also persisted there.
+TEMPLATES = {}  # typeId -> (isError, snippet)
+TEMPLATES_LOCK = threading.Lock()
+
+
+def _get_template_cache_version():
+    return f"{getHypothesisVersion()}|{getDefaultStyle()}"
+
+
+def _load_persisted_templates():
+    path = os.getenv("LS_TEMPLATE_CACHE", "")
+    if not path or not os.path.isfile(path):
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return
+    if data.get("version") != _get_template_cache_version():
+        return
+    for typeId, (isError, snippet) in data.get("templates", {}).items():
+        if not isError:
+            TEMPLATES.setdefault(int(typeId), (isError, snippet))
+
+
+def _persist_templates():
+    path = os.getenv("LS_TEMPLATE_CACHE", "")
+    if not path:
+        return
+    data = {"version": _get_template_cache_version(), "templates": {str(k): v for k, v in TEMPLATES.items()}}
+    try:
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+    except OSError:
+        log_warning(f"Could not persist templates to {path}")
+
+
+def _render_template(pbtType: dict):
+    """Renders the template of a PBT type for two placeholder functions"""
+    typeName = pbtType["name"]
+
     sutNames = []
     for name in [typeName, typeName + "2"]:
         sutNames += [name.replace(' ', '_').replace(',', "").replace('.', '_')]
 
     sutSourceList = [f"def {sutNames[0]}(arg):\n\tpass\n", f"def {sutNames[1]}(arg):\n\tpass\n"]
-    pbtType = selectedType
     moduleName = "temp_module"
+    source = "\n".join(sutSourceList)
+    selectedType = types.SimpleNamespace(typeId=pbtType["typeId"].value, argument=pbtType["argument"])
 
-    # Write source to temporary file (for ghostwriter CLI)
-    file = open(moduleName + ".py", "w+")
-    for f in sutSourceList:
-        file.write(f + "\n")
-    file.close()
-
-    # Get snippet
-    isError, snippet = _get_PBT(sutNames, sutSourceList, pbtType, moduleName)
-    
-    # Delete temporary file
-    os.remove(moduleName + ".py")
+    isError, snippet = _generate_PBT(sutNames, sutSourceList, selectedType, moduleName, source)
 
     ## Final touches
     snippet = snippet.replace(moduleName + ".", "").replace(f"import {moduleName}", "")
     snippet = replaceNothingPlaceholder(snippet)
-
-    result = {}
-    result["isError"] = isError
-    result["snippet"] = snippet
-    return result
-
+    return isError, snippet
+
+
+def _get_template(typeId: int):
+    """Returns the template of a PBT type, rendering it on first use"""
+    with TEMPLATES_LOCK:
+        if not TEMPLATES:
+            _load_persisted_templates()
+        if typeId in TEMPLATES:
+            return TEMPLATES[typeId]
+
+        pbtType = next((t for t in pbtTypes if t["typeId"].value == typeId), None)
+        if pbtType is None:
+            return True, f"Unknown PBT type: {typeId}"
+
+        TEMPLATES[typeId] = _render_template(pbtType)
+        if not TEMPLATES[typeId][0]:
+            _persist_templates()
+        return TEMPLATES[typeId]
+
+
+def _render_all_templates():
+    """Renders the templates of all PBT types (used to warm up after initialize).
+    Their output goes to stderr: stdout carries the LSP messages"""
+    with utils.redirect_thread_io("stdout", sys.stderr):
+        for pbtType in pbtTypes:
+            try:
+                _get_template(pbtType["typeId"].value)
+            except Exception:  # pylint: disable=broad-except
+                log_warning(f"Failed to render template:\r\n{traceback.format_exc()}")
+
+
+def _warm_up():
+    """Imports the ghostwriter (left out of the server's imports so that initialize is answered
+    sooner) and renders the templates. With LS_IMPORT_TIME set, logs the slowest imports"""
+    start = time.perf_counter()
+    try:
+        getGhostwriter()
+    except Exception:  # pylint: disable=broad-except
+        log_warning(f"Failed to import the ghostwriter:\r\n{traceback.format_exc()}")
+    STARTUP_TIMES["ghostwriterImportMs"] = round((time.perf_counter() - start) * 1000, 1)
+    _render_all_templates()
+    STARTUP_TIMES["warmUpMs"] = round((time.perf_counter() - start) * 1000, 1)
+    log_to_output(f"Startup times (ms): {json.dumps(STARTUP_TIMES)}")
+
+    if os.getenv("LS_IMPORT_TIME"):
+        # pylint: disable-next=import-outside-toplevel
+        from auxiliary_files.import_timing import formatImportTimes, measureImportTimes
+
+        entries = measureImportTimes(["lsp_server", "hypothesis.extra.ghostwriter"], os.fspath(pathlib.Path(__file__).parent))
+        log_to_output(f"Import times of the server:\r\n{formatImportTimes(entries)}")
 
 
 def _get_global_defaults():
@@ -348,6 +999,15 @@ def _get_global_defaults():
         "importStrategy": GLOBAL_SETTINGS.get("importStrategy", "useBundled"),
         "showNotifications": GLOBAL_SETTINGS.get("showNotifications", "off"),
         "testFileNamePattern":  GLOBAL_SETTINGS.get("testFileNamePattern", "_test"),
+        "ghostwriterEngine": GLOBAL_SETTINGS.get("ghostwriterEngine", "runner"),
+        "runnerPoolSize": GLOBAL_SETTINGS.get("runnerPoolSize", 2),
+        "runnerConcurrency": GLOBAL_SETTINGS.get("runnerConcurrency", 2),
+        "runnerMaxRequests": GLOBAL_SETTINGS.get("runnerMaxRequests", 500),
+        "runnerMaxMemoryMB": GLOBAL_SETTINGS.get("runnerMaxMemoryMB", 1024),
+        "runnerMemoryLimitMB": GLOBAL_SETTINGS.get("runnerMemoryLimitMB", 0),
+        "runnerIdleTimeout": GLOBAL_SETTINGS.get("runnerIdleTimeout", 900),
+        "workspaceIndex": GLOBAL_SETTINGS.get("workspaceIndex", True),
+        "metrics": GLOBAL_SETTINGS.get("metrics", True),
     }
 
 
@@ -435,12 +1095,12 @@ def getPbtUsingCli(moduleName, functionNames, pbtType = "") -> utils.RunResult:
     for f in functionNames:
         argv += [moduleName + "." + f]
 
-    print("COMMAND: " + str(argv))
+    log_to_output(f"Command: {argv}")
 
     # === Run the command
     settings = copy.deepcopy(_get_settings_by_document(None))
     cwd = settings["workspaceFS"]
-    result = utils.run_path(argv=argv, use_stdin=True, cwd=cwd)
+    result = utils.run_path(argv=argv, use_stdin=True, cwd=cwd, on_output=_get_output_listener())
 
     # === Check for error/output
     pbt = result.stdout
@@ -456,8 +1116,154 @@ def getPbtUsingCli(moduleName, functionNames, pbtType = "") -> utils.RunResult:
     return (isError, pbt if not isError else error)
 
 
-def _get_PBT(sutNames, sutSourceList, pbtType, moduleName):
-    """Runs Hypothesis' ghostwriter and sends the output back to the client"""
+def getPbtUsingGhostwriter(moduleName, functionNames, pbtType = ""):
+    """Runs Hypothesis' ghostwriter inside the server process (no subprocess)
+    Returns: (ISeRROR, PBT | ERROR)"""
+    settings = _get_settings_by_document(None)
+    cwd = settings["workspaceFS"]
+
+    isError, pbt = writeUsingGhostwriter(moduleName, functionNames, pbtType, cwd, _get_output_listener())
+
+    if isError:
+        log_error(pbt)
+    else:
+        log_to_output(f"\r\n{pbt}\r\n")
+
+    return (isError, pbt)
+
+
+def _get_runner_interpreter(settings):
+    return settings.get("interpreter") or [sys.executable]
+
+
+def _start_runners():
+    """Starts the warm runner pools of all workspaces"""
+    jsonrpc.set_runner_pool_size(_get_global_defaults()["runnerPoolSize"])
+    jsonrpc.set_runner_concurrency(_get_global_defaults()["runnerConcurrency"])
+    jsonrpc.set_runner_limits(
+        max_requests=_get_global_defaults()["runnerMaxRequests"],
+        max_rss_mb=_get_global_defaults()["runnerMaxMemoryMB"],
+        memory_limit_mb=_get_global_defaults()["runnerMemoryLimitMB"],
+        idle_timeout=_get_global_defaults()["runnerIdleTimeout"],
+    )
+    for settings in list(WORKSPACE_SETTINGS.values()):
+        try:
+            jsonrpc.start_runner_pool(
+                settings["workspaceFS"], _get_runner_interpreter(settings), settings["workspaceFS"]
+            )
+        except Exception:  # pylint: disable=broad-except
+            log_warning(f"Failed to start runners:\r\n{traceback.format_exc()}")
+
+
+def getPbtUsingRunner(moduleName, functionNames, pbtType = ""):
+    """Sends the request to one of the warm runner processes of the workspace
+    Returns: (ISeRROR, PBT | ERROR)"""
+    settings = _get_settings_by_document(None)
+    cwd = settings["workspaceFS"]
+
+    params = {"module": moduleName, "functions": functionNames, "argument": pbtType, "cwd": cwd}
+
+    try:
+        result = jsonrpc.run_request_over_json_rpc(
+            workspace=cwd,
+            interpreter=_get_runner_interpreter(settings),
+            cwd=cwd,
+            method="ghostwrite",
+            params=params,
+            timeout=RUNNER_TIMEOUT,
+            on_output=_get_output_listener(),
+        )
+    except Exception:  # pylint: disable=broad-except
+        log_warning(f"Runner failed, falling back to the CLI:\r\n{traceback.format_exc()}")
+        return None
+
+    if result.queue_ms is not None:
+        METRICS.recordLatency("runner.queue", result.queue_ms)
+        METRICS.recordLatency("runner.exec", result.exec_ms)
+
+    error = result.exception or result.stderr
+    if error:
+        log_error(error)
+        return (True, error)
+
+    log_to_output(f"\r\n{result.stdout}\r\n")
+    return (False, result.stdout)
+
+
+def _get_ghostwriter_engine():
+    settings = _get_settings_by_document(None)
+    engine = settings.get("ghostwriterEngine", _get_global_defaults()["ghostwriterEngine"])
+    return engine if engine in GHOSTWRITER_ENGINES else "cli"
+
+
+def getPbtUsingEngine(moduleName, functionNames, pbtType = "", source = None):
+    """Runs Hypothesis' ghostwriter using the engine chosen in the settings.
+    When source is given, the functions are taken from it (in-process) instead of the module file
+    Returns: (ISeRROR, PBT | ERROR)"""
+    engine = "source" if source is not None else _get_ghostwriter_engine()
+    with METRICS.span("ghostwriter." + engine):
+        return _get_PBT_using_engine(engine, moduleName, functionNames, pbtType, source)
+
+
+def _get_PBT_using_engine(engine, moduleName, functionNames, pbtType, source):
+    if engine == "source":
+        cwd = _get_settings_by_document(None)["workspaceFS"]
+        return writeUsingGhostwriterFromSource(
+            moduleName, source, functionNames, pbtType, _get_output_listener(), cwd
+        )
+
+    if engine == "runner":
+        result = getPbtUsingRunner(moduleName, functionNames, pbtType)
+        if result is not None:
+            return result
+        engine = "cli"
+
+    if engine == "inProcess":
+        return getPbtUsingGhostwriter(moduleName, functionNames, pbtType)
+
+    if engine == "compare":
+        start = time.perf_counter()
+        cliResult = getPbtUsingCli(moduleName, functionNames, pbtType)
+        cliTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        inProcessResult = getPbtUsingGhostwriter(moduleName, functionNames, pbtType)
+        inProcessTime = time.perf_counter() - start
+
+        log_to_output(
+            f"Ghostwriter engines: cli {cliTime * 1000:.1f} ms, inProcess {inProcessTime * 1000:.1f} ms, "
+            f"identical output: {cliResult == inProcessResult}"
+        )
+        return inProcessResult
+
+    return getPbtUsingCli(moduleName, functionNames, pbtType)
+
+
+def _get_PBT(sutNames, sutSourceList, pbtType, moduleName, source = None, moduleSource = None):
+    """Returns the cached PBT when the signatures of the SUTs, and the definitions of the
+    module (moduleSource) they refer to, did not change, generates it otherwise (see _generate_PBT)"""
+    try:
+        moduleTree = parseSource(moduleSource) if moduleSource is not None else None
+        fingerprint = makeSignatureFingerprint(sutNames, sutSourceList, moduleTree)
+    except SyntaxError:
+        fingerprint = None
+    if fingerprint is None:
+        return _generate_PBT(sutNames, sutSourceList, pbtType, moduleName, source)
+
+    key = (fingerprint, pbtType.typeId, moduleName, getHypothesisVersion())
+    cached = PBT_CACHE.get(key)
+    if cached is not None:
+        log_to_output(f"PBT cache hit: {PBT_CACHE.getStats()}")
+        return cached
+
+    isError, pbt = _generate_PBT(sutNames, sutSourceList, pbtType, moduleName, source)
+    PBT_CACHE.put(key, (isError, pbt), PBT_CACHE_ERROR_TTL if isError else None)
+    return isError, pbt
+
+
+def _generate_PBT(sutNames, sutSourceList, pbtType, moduleName, source = None):
+    """Runs Hypothesis' ghostwriter and sends the output back to the client.
+    source is only needed when moduleName does not exist on disk (e.g. templates)"""
 
     # === Create function objects
     # ghostwriter module only works with evaluated functions
@@ -468,59 +1274,30 @@ def _get_PBT(sutNames, sutSourceList, pbtType, moduleName):
     pbt = ""
     isError = False
 
-    print("\n\n\n===TypeId", pbtType.typeId)
+    ### == Not (or partially) supported by Hypothesis Ghostwriter: rendered from a snippet template
+    if pbtType.typeId in SNIPPET_TEMPLATES:
+        testerName = sutNames[1] if len(sutNames) > 1 else ""
+        pbt = makeSnippet(pbtType.typeId, sutSourceList[0], moduleName, sutNames[0], testerName)
 
     match pbtType.typeId:
 
         ### == Supported by Hypothesis Ghostwriter
         case PbtTypeId.ROUNDTRIP.value: # roundtrip
-            isError, pbt = getPbtUsingCli(moduleName, sutNames, pbtType.argument)
+            isError, pbt = getPbtUsingEngine(moduleName, sutNames, pbtType.argument, source)
             pass
 
         case PbtTypeId.TEST_ORACLE.value: # equivalent
-            isError, pbt = getPbtUsingCli(moduleName, sutNames, pbtType.argument)
+            isError, pbt = getPbtUsingEngine(moduleName, sutNames, pbtType.argument, source)
             pass
 
         case PbtTypeId.MODEL_BASED.value: # equivalent
-            isError, pbt = getPbtUsingCli(moduleName, sutNames, pbtType.argument)
+            isError, pbt = getPbtUsingEngine(moduleName, sutNames, pbtType.argument, source)
             pass
 
 
-        ### == Partially supported by Hypothesis Ghostwriter
-        case PbtTypeId.SOME_THINGS_NEVER_CHANGE.value: # Based on idempotent (input mustn't be changed)
-            pbt = makeSomeThingsNeverChangeSnippet(sutSourceList[0], moduleName, sutNames[0])
-            pass
-
-        case PbtTypeId.METAMORPHIC_PROP.value: # Based on equivalent (add extra step to test e.g. compiler output instead of compiler itself)
-            pbt = makeMetamorphicPropertySnippet(sutSourceList[0], moduleName, sutNames[0], sutNames[1])
-            pass
-
-
-        ### == Not supported by Hypothesis Ghostwriter
-        case PbtTypeId.THE_MORE_THINGS_CHANGE.value: # idempotent
-            # isError, pbt = getPbtUsingCli(moduleName, sutNames, pbtType.argument)
-            pbt = makeTheMoreThingsChangeSnippet(sutSourceList[0], moduleName, sutNames[0])
-            pass
-        
-        case PbtTypeId.DIFF_PATH_SAME_DEST.value: # binary_operation (with only associativity enabled)
-            pbt = makeDiffPathSameDestSnippet(sutSourceList[0], moduleName, sutNames[0])
-            pass
-
-        case PbtTypeId.SOLVE_SMALLER_PROBLEM_FIRST.value: # 
-            pbt = makeSolveSmallerProblemFirstSnippet(sutSourceList[0], moduleName, sutNames[0])
-            pass
-
-        case PbtTypeId.HARD_TO_PROVE.value: # add dummy strategy and dummy checker predicate
-            pbt = makeHardToProveEasyToVerifySnippet(sutSourceList[0], moduleName, sutNames[0], sutNames[1])
-            pass
-
-        case PbtTypeId.WITHIN_EXPECTED_BOUNDS.value: # add bounds assertions
-            pbt = makeWithinExpectedBoundsSnippet(sutSourceList[0], moduleName, sutNames[0])
-            pass
-
         ### == Unknown property
         case PbtTypeId.UNKNOWN.value: # magic
-            isError, pbt = getPbtUsingCli(moduleName, sutNames, pbtType.argument)
+            isError, pbt = getPbtUsingEngine(moduleName, sutNames, pbtType.argument, source)
             pass
 
     if isError:
@@ -529,39 +1306,11 @@ def _get_PBT(sutNames, sutSourceList, pbtType, moduleName):
     else:
         log_to_output(f"\r\n{pbt}\r\n")
 
-    print("\n\nRESULTING PBT: ")
-    print(pbt)
     return isError, pbt
 
 
 def _get_functions_from_source(source: str):
-    tree = ast.parse(source)
-    functions = {}
-
-    # Iteration through all nodes of class node
-    def getClassMethods(classNode: ast.ClassDef):
-        for node in ast.walk(classNode):
-           if isinstance(node, ast.FunctionDef):
-            fullName = classNode.name + "." + node.name
-            functions[fullName] = {"name": classNode.name + "." + node.name, "lineStart": node.lineno, "lineEnd": node.end_lineno, "class": classNode.name, "method": node.name}
-
-    # Checks if function already added (because it's a method)
-    def isAlreadyDefined(line):
-        for f in functions.values():
-            if f["lineStart"] == line:
-                return True
-        return False
-
-    # Iteration through all tree nodes
-    for node in ast.walk(tree):
-        if isinstance(node, ast.ClassDef):
-            getClassMethods(node)
-            continue
-        if isinstance(node, ast.FunctionDef):
-            if not isAlreadyDefined(node.lineno):
-                functions[node.name] = {"name": node.name, "lineStart": node.lineno, "lineEnd": node.end_lineno, "class": "", "method": ""}
-
-    return list(functions.values())
+    return getSymbolTable(source).getFunctions()
 
 
 # *****************************************************
@@ -4,6 +4,7 @@
 from __future__ import annotations
 
 import contextlib
+import importlib.machinery
 import io
 import os
 import os.path
@@ -62,14 +63,22 @@ class RunResult:
 
 
 class CustomIO(io.TextIOWrapper):
-    """Custom stream object to replace stdio."""
+    """Custom stream object to replace stdio. When on_write is given, it is also called
+    with every text written, as it is written."""
 
     name = None
 
-    def __init__(self, name, encoding="utf-8", newline=None):
+    def __init__(self, name, encoding="utf-8", newline=None, on_write=None):
         self._buffer = io.BytesIO()
         self._buffer.name = name
         super().__init__(self._buffer, encoding=encoding, newline=newline)
+        self._on_write = on_write
+
+    def write(self, text):
+        count = super().write(text)
+        if self._on_write is not None and text:
+            self._on_write(text)
+        return count
 
     def close(self):
         """Provide this close method which is used by some tools."""
@@ -86,8 +95,10 @@ def substitute_attr(obj: Any, attribute: str, new_value: Any):
     """Manage object attributes context when using runpy.run_module()."""
     old_value = getattr(obj, attribute)
     setattr(obj, attribute, new_value)
-    yield
-    setattr(obj, attribute, old_value)
+    try:
+        yield
+    finally:
+        setattr(obj, attribute, old_value)
 
 
 @contextlib.contextmanager
@@ -95,8 +106,175 @@ def redirect_io(stream: str, new_stream):
     """Redirect stdio streams to a custom stream."""
     old_stream = getattr(sys, stream)
     setattr(sys, stream, new_stream)
-    yield
-    setattr(sys, stream, old_stream)
+    try:
+        yield
+    finally:
+        setattr(sys, stream, old_stream)
+
+
+class ThreadLocalStream:
+    """Stands in for a stdio stream: what a thread writes goes to the stream it
+    redirected it to with `redirect_thread_io`, or else to the original stream."""
+
+    def __init__(self, default):
+        self._default = default
+        self._local = threading.local()
+
+    def get_target(self):
+        """Returns the stream of the current thread."""
+        return getattr(self._local, "stream", None) or self._default
+
+    def set_target(self, stream):
+        """Sets the stream of the current thread (None for the original one), returns the
+        previous one."""
+        previous = getattr(self._local, "stream", None)
+        self._local.stream = stream
+        return previous
+
+    def __getattr__(self, name):
+        return getattr(self.get_target(), name)
+
+    def __iter__(self):
+        return iter(self.get_target())
+
+
+_THREAD_LOCAL_LOCK = threading.Lock()
+
+
+def _get_thread_local_stream(stream: str) -> ThreadLocalStream:
+    with _THREAD_LOCAL_LOCK:
+        current = getattr(sys, stream)
+        if not isinstance(current, ThreadLocalStream):
+            current = ThreadLocalStream(current)
+            setattr(sys, stream, current)
+        return current
+
+
+@contextlib.contextmanager
+def redirect_thread_io(stream: str, new_stream):
+    """Redirect a stdio stream to a custom stream for the current thread only, so that
+    threads doing it at the same time do not capture each other's output."""
+    proxy = _get_thread_local_stream(stream)
+    previous = proxy.set_target(new_stream)
+    try:
+        yield
+    finally:
+        proxy.set_target(previous)
+
+
+class ThreadImportPath:
+    """Meta path finder that finds top-level modules in the folders a thread put on its
+    import path with `thread_import_path`, before those of `sys.path` (it is put right before
+    the `sys.path` finder, so built-in and frozen modules still come first)."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def push(self, path: str) -> None:
+        """Puts path first on the import path of the current thread."""
+        self._local.paths = [path, *getattr(self._local, "paths", [])]
+
+    def pop(self) -> None:
+        """Takes the last pushed path off the import path of the current thread."""
+        self._local.paths = self._local.paths[1:]
+
+    def find_spec(self, name, path=None, target=None):  # pylint: disable=unused-argument
+        """Finds top-level modules, submodules are found from their package's path."""
+        paths = getattr(self._local, "paths", None)
+        if path is not None or not paths:
+            return None
+        return importlib.machinery.PathFinder.find_spec(name, paths)
+
+
+_THREAD_IMPORT_PATH = ThreadImportPath()
+
+
+def _install_thread_import_path() -> None:
+    with _THREAD_LOCAL_LOCK:
+        if _THREAD_IMPORT_PATH not in sys.meta_path:
+            # Right before the sys.path finder: built-in and frozen modules still come first
+            index = next(
+                (
+                    index
+                    for index, finder in enumerate(sys.meta_path)
+                    if finder is importlib.machinery.PathFinder
+                ),
+                len(sys.meta_path),
+            )
+            sys.meta_path.insert(index, _THREAD_IMPORT_PATH)
+
+
+@contextlib.contextmanager
+def thread_import_path(path: str):
+    """Puts path first on the import path of the current thread only: unlike changing
+    `sys.path`, imports of other threads are not affected."""
+    _install_thread_import_path()
+    _THREAD_IMPORT_PATH.push(path)
+    try:
+        yield
+    finally:
+        _THREAD_IMPORT_PATH.pop()
+
+
+# pylint: disable-next=too-few-public-methods
+class RunContext:
+    """Working directory and streams of a run, passed explicitly instead of being set
+    for the whole process."""
+
+    def __init__(self, cwd: str | None, stdout: CustomIO, stderr: CustomIO, stdin=None):
+        self.cwd: str | None = cwd
+        self.stdout: CustomIO = stdout
+        self.stderr: CustomIO = stderr
+        self.stdin: CustomIO | None = stdin
+
+    def resolve(self, path: str) -> str:
+        """Returns a path relative to the working directory of the run as an absolute one."""
+        return os.path.join(self.cwd or SERVER_CWD, path)
+
+
+def _stream_listener(on_output: Callable[[str, str], None] | None, stream: str):
+    """on_write callback of a CustomIO that hands what is written to on_output(stream, text)"""
+    if on_output is None:
+        return None
+    return lambda text: on_output(stream, text)
+
+
+def run_in_context(
+    callback: Callable[[RunContext], Any],
+    cwd: str | None,
+    source: str = None,
+    on_output: Callable[[str, str], None] | None = None,
+) -> Tuple[Any, RunResult]:
+    """Runs callback(context) in the calling thread, with cwd and its own streams in the
+    context. Nothing process-wide is changed (no chdir, no stdio or argv swap, no lock):
+    what the thread prints goes to the context's streams and cwd (if any) is first on its
+    import path, so several runs can happen at the same time, including on free-threaded
+    builds. Returns what callback returned (None when it raised SystemExit) and the output.
+    on_output("stdout" | "stderr", text) is called as the output is written."""
+    context = RunContext(
+        cwd,
+        CustomIO("<stdout>", on_write=_stream_listener(on_output, "stdout")),
+        CustomIO("<stderr>", on_write=_stream_listener(on_output, "stderr")),
+    )
+    if source is not None:
+        context.stdin = CustomIO("<stdin>", newline="\n")
+        context.stdin.write(source)
+        context.stdin.seek(0)
+
+    value = None
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(redirect_thread_io("stdout", context.stdout))
+        stack.enter_context(redirect_thread_io("stderr", context.stderr))
+        if context.stdin is not None:
+            stack.enter_context(redirect_thread_io("stdin", context.stdin))
+        if cwd:
+            stack.enter_context(thread_import_path(cwd))
+        try:
+            value = callback(context)
+        except SystemExit:
+            pass
+
+    return value, RunResult(context.stdout.get_value(), context.stderr.get_value())
 
 
 @contextlib.contextmanager
@@ -116,11 +294,11 @@ def _run_module(
 
     try:
         with substitute_attr(sys, "argv", argv):
-            with redirect_io("stdout", str_output):
-                with redirect_io("stderr", str_error):
+            with redirect_thread_io("stdout", str_output):
+                with redirect_thread_io("stderr", str_error):
                     if use_stdin and source is not None:
                         str_input = CustomIO("<stdin>", encoding="utf-8", newline="\n")
-                        with redirect_io("stdin", str_input):
+                        with redirect_thread_io("stdin", str_input):
                             str_input.write(source)
                             str_input.seek(0)
                             runpy.run_module(module, run_name="__main__")
@@ -135,7 +313,8 @@ def _run_module(
 def run_module(
     module: str, argv: Sequence[str], use_stdin: bool, cwd: str, source: str = None
 ) -> RunResult:
-    """Runs as a module."""
+    """Runs as a module. The working directory and sys.argv are process-wide, so runs wait
+    for each other (see `run_in_context` for runs that do not)."""
     with CWD_LOCK:
         if is_same_path(os.getcwd(), cwd):
             return _run_module(module, argv, use_stdin, source)
@@ -144,9 +323,16 @@ def run_module(
 
 
 def run_path(
-    argv: Sequence[str], use_stdin: bool, cwd: str, source: str = None
+    argv: Sequence[str],
+    use_stdin: bool,
+    cwd: str,
+    source: str = None,
+    on_output: Callable[[str, str], None] | None = None,
 ) -> RunResult:
-    """Runs as an executable."""
+    """Runs as an executable. on_output("stdout" | "stderr", text) is called with every
+    line of output, as the process prints it."""
+    if on_output is not None:
+        return _run_path_streaming(argv, use_stdin, cwd, source, on_output)
     if use_stdin:
         with subprocess.Popen(
             argv,
@@ -169,6 +355,43 @@ def run_path(
         return RunResult(result.stdout, result.stderr)
 
 
+def _run_path_streaming(
+    argv: Sequence[str],
+    use_stdin: bool,
+    cwd: str,
+    source: str | None,
+    on_output: Callable[[str, str], None],
+) -> RunResult:
+    with subprocess.Popen(
+        argv,
+        encoding="utf-8",
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        stdin=subprocess.PIPE if use_stdin else subprocess.DEVNULL,
+        cwd=cwd,
+    ) as process:
+        if use_stdin:
+            try:
+                process.stdin.write(source or "")
+            except BrokenPipeError:
+                pass
+            process.stdin.close()
+
+        # Both pipes are read at the same time, so that neither fills up and blocks the process
+        output = {"stdout": [], "stderr": []}
+
+        def read(stream: str):
+            for line in getattr(process, stream):
+                output[stream].append(line)
+                on_output(stream, line)
+
+        reader = threading.Thread(target=read, args=("stderr",), daemon=True)
+        reader.start()
+        read("stdout")
+        reader.join()
+    return RunResult("".join(output["stdout"]), "".join(output["stderr"]))
+
+
 def run_api(
     callback: Callable[[Sequence[str], CustomIO, CustomIO, CustomIO | None], None],
     argv: Sequence[str],
@@ -176,7 +399,8 @@ def run_api(
     cwd: str,
     source: str = None,
 ) -> RunResult:
-    """Run a API."""
+    """Run a API. The working directory and sys.argv are process-wide, so runs wait
+    for each other (see `run_in_context` for runs that do not)."""
     with CWD_LOCK:
         if is_same_path(os.getcwd(), cwd):
             return _run_api(callback, argv, use_stdin, source)
@@ -195,11 +419,11 @@ def _run_api(
 
     try:
         with substitute_attr(sys, "argv", argv):
-            with redirect_io("stdout", str_output):
-                with redirect_io("stderr", str_error):
+            with redirect_thread_io("stdout", str_output):
+                with redirect_thread_io("stderr", str_error):
                     if use_stdin and source is not None:
                         str_input = CustomIO("<stdin>", encoding="utf-8", newline="\n")
-                        with redirect_io("stdin", str_input):
+                        with redirect_thread_io("stdin", str_input):
                             str_input.write(source)
                             str_input.seek(0)
                             callback(argv, str_output, str_error, str_input)
@@ -115,6 +115,16 @@ def tests(session: nox.Session) -> None:
     session.run("pytest", "src/test/python_tests")
 
 
+@nox.session()
+def benchmarks(session: nox.Session) -> None:
+    """Runs the microbenchmarks of the server and writes their results to benchmark_results.json."""
+    session.install("-r", "./requirements.txt")
+    session.install("-r", "src/test/python_tests/requirements.txt")
+    output = os.fspath(pathlib.Path(__file__).parent / "benchmark_results.json")
+    session.chdir("src/test/python_tests")
+    session.run("python", "-m", "benchmarks", "--output", output, *session.posargs)
+
+
 @nox.session()
 def lint(session: nox.Session) -> None:
     """Runs linter and formatter checks on python files."""
@@ -140,9 +150,9 @@ def lint(session: nox.Session) -> None:
 
     # check import sorting using isort
     session.install("isort")
-    session.run("isort", "--check", "./bundled/tool")
-    session.run("isort", "--check", "./src/test/python_tests")
-    session.run("isort", "--check", "noxfile.py")
+    session.run("isort", "--profile", "black", "--check", "./bundled/tool")
+    session.run("isort", "--profile", "black", "--check", "./src/test/python_tests")
+    session.run("isort", "--profile", "black", "--check", "noxfile.py")
 
     # check typescript code
     session.run("npm", "run", "lint", external=True)
@@ -15,7 +15,7 @@ import { traceError, traceInfo, traceVerbose } from './log/logging';
 import { getDebuggerPath } from './python';
 import { getExtensionSettings, getGlobalSettings, getWorkspaceSettings, ISettings } from './settings';
 import { getLSClientTraceLevel, getProjectRoot } from './utilities';
-import { isVirtualWorkspace } from './vscodeapi';
+import { createFileSystemWatcher, isVirtualWorkspace } from './vscodeapi';
 
 export type IInitOptions = { settings: ISettings[]; globalSettings: ISettings };
 
@@ -72,6 +72,10 @@ async function createServer(
         traceOutputChannel: outputChannel,
         revealOutputChannelOn: RevealOutputChannelOn.Never,
         initializationOptions,
+        synchronize: {
+            // Keeps the workspace function index of the server up to date
+            fileEvents: createFileSystemWatcher('**/*.py'),
+        },
     };
 
     return new LanguageClient(serverId, serverName, serverOptions, clientOptions);
@@ -7,6 +7,15 @@ import { getConfiguration, getWorkspaceFolders } from './vscodeapi';
 
 export interface ISettings {
     testFileNamePattern: string;
+    ghostwriterEngine: string;
+    runnerPoolSize: number;
+    runnerConcurrency: number;
+    runnerMaxRequests: number;
+    runnerMaxMemoryMB: number;
+    runnerMemoryLimitMB: number;
+    runnerIdleTimeout: number;
+    workspaceIndex: boolean;
+    metrics: boolean;
     cwd: string;
     workspace: string;
     args: string[];
@@ -64,6 +73,15 @@ export async function getWorkspaceSettings(
 
     const workspaceSetting = {
         testFileNamePattern: config.get<string>('testFileNamePattern') ?? 'not found',
+        ghostwriterEngine: config.get<string>('ghostwriterEngine') ?? 'runner',
+        runnerPoolSize: config.get<number>('runnerPoolSize') ?? 2,
+        runnerConcurrency: config.get<number>('runnerConcurrency') ?? 2,
+        runnerMaxRequests: config.get<number>('runnerMaxRequests') ?? 500,
+        runnerMaxMemoryMB: config.get<number>('runnerMaxMemoryMB') ?? 1024,
+        runnerMemoryLimitMB: config.get<number>('runnerMemoryLimitMB') ?? 0,
+        runnerIdleTimeout: config.get<number>('runnerIdleTimeout') ?? 900,
+        workspaceIndex: config.get<boolean>('workspaceIndex') ?? true,
+        metrics: config.get<boolean>('metrics') ?? true,
         cwd: workspace.uri.fsPath,
         workspace: workspace.uri.toString(),
         args: resolveVariables(config.get<string[]>(`args`) ?? [], workspace),
@@ -93,6 +111,15 @@ export async function getGlobalSettings(namespace: string, includeInterpreter?:
 
     const setting = {
         testFileNamePattern: getGlobalValue<string>(config, 'testFileNamePattern', '_test'),
+        ghostwriterEngine: getGlobalValue<string>(config, 'ghostwriterEngine', 'runner'),
+        runnerPoolSize: getGlobalValue<number>(config, 'runnerPoolSize', 2),
+        runnerConcurrency: getGlobalValue<number>(config, 'runnerConcurrency', 2),
+        runnerMaxRequests: getGlobalValue<number>(config, 'runnerMaxRequests', 500),
+        runnerMaxMemoryMB: getGlobalValue<number>(config, 'runnerMaxMemoryMB', 1024),
+        runnerMemoryLimitMB: getGlobalValue<number>(config, 'runnerMemoryLimitMB', 0),
+        runnerIdleTimeout: getGlobalValue<number>(config, 'runnerIdleTimeout', 900),
+        workspaceIndex: getGlobalValue<boolean>(config, 'workspaceIndex', true),
+        metrics: getGlobalValue<boolean>(config, 'metrics', true),
         cwd: process.cwd(),
         workspace: process.cwd(),
         args: getGlobalValue<string[]>(config, 'args', []),
@@ -107,6 +134,15 @@ export async function getGlobalSettings(namespace: string, includeInterpreter?:
 export function checkIfConfigurationChanged(e: ConfigurationChangeEvent, namespace: string): boolean {
     const settings = [
         `${namespace}.testFileNamePattern`,
+        `${namespace}.ghostwriterEngine`,
+        `${namespace}.runnerPoolSize`,
+        `${namespace}.runnerConcurrency`,
+        `${namespace}.runnerMaxRequests`,
+        `${namespace}.runnerMaxMemoryMB`,
+        `${namespace}.runnerMemoryLimitMB`,
+        `${namespace}.runnerIdleTimeout`,
+        `${namespace}.workspaceIndex`,
+        `${namespace}.metrics`,
         `${namespace}.args`,
         `${namespace}.path`,
         `${namespace}.interpreter`,
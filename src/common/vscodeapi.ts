@@ -7,6 +7,7 @@ import {
     commands,
     ConfigurationScope,
     Disposable,
+    FileSystemWatcher,
     LogOutputChannel,
     Uri,
     window,
@@ -41,3 +42,7 @@ export function getWorkspaceFolders(): readonly WorkspaceFolder[] {
 export function getWorkspaceFolder(uri: Uri): WorkspaceFolder | undefined {
     return workspace.getWorkspaceFolder(uri);
 }
+
+export function createFileSystemWatcher(globPattern: string): FileSystemWatcher {
+    return workspace.createFileSystemWatcher(globPattern);
+}
@@ -2,7 +2,7 @@
 // Licensed under the MIT License.
 
 import * as vscode from 'vscode';
-import { LanguageClient } from 'vscode-languageclient/node';
+import { LanguageClient, ProgressType, WorkDoneProgress } from 'vscode-languageclient/node';
 import { registerLogger, traceError, traceLog, traceVerbose } from './common/log/logging';
 import {
     checkVersion,
@@ -32,6 +32,15 @@ const namespace: string = extensionName + '.' + publisherName;
 let pbtTypes: any = null; // For PBT Types Caching
 let testFileNamePattern: string = '_test';
 
+// Progress tokens of the generation requests, see sendRequestWithProgress
+let progressTokenCount: number = 0;
+let previewCount: number = 0;
+
+// PBTs of the running batches, shown read-only as the server sends them (see previewPartialResults)
+const previewScheme: string = 'easypbt-preview';
+const previewContents = new Map<string, string>();
+const previewChanged = new vscode.EventEmitter<vscode.Uri>();
+
 export async function activate(context: vscode.ExtensionContext): Promise<void> {
     // This is required to get server name and module. This should be
     // the first thing that we do in this extension.
@@ -53,6 +62,20 @@ export async function activate(context: vscode.ExtensionContext): Promise<void>
     );
     context.subscriptions.push(generatePbtSelectionCommand);
 
+    // === Generate PBTs for several functions at once
+    const generatePbtBatchCommand = vscode.commands.registerCommand(
+        `${serverId}.generatePbtBatch`,
+        async () => await getPbtBatch(),
+    );
+    context.subscriptions.push(generatePbtBatchCommand);
+
+    // === Generate PBTs for functions picked from the whole workspace
+    const generatePbtWorkspaceCommand = vscode.commands.registerCommand(
+        `${serverId}.generatePbtWorkspace`,
+        async () => await getPbtWorkspace(),
+    );
+    context.subscriptions.push(generatePbtWorkspaceCommand);
+
     const generateExampleCommand = vscode.commands.registerCommand(`${serverId}.generateExample`, async () =>
         generateExample(),
     );
@@ -65,6 +88,16 @@ export async function activate(context: vscode.ExtensionContext): Promise<void>
     );
     context.subscriptions.push(insertTemplateCommand);
 
+    // === Preview of the PBTs of a batch while the rest are generated
+    context.subscriptions.push(
+        vscode.workspace.registerTextDocumentContentProvider(previewScheme, {
+            onDidChange: previewChanged.event,
+            provideTextDocumentContent: (uri: vscode.Uri) => previewContents.get(uri.path) ?? '',
+        }),
+        vscode.workspace.onDidCloseTextDocument((document) => previewContents.delete(document.uri.path)),
+        previewChanged,
+    );
+
     // Setup logging
     const outputChannel = createOutputChannel(serverName);
     context.subscriptions.push(outputChannel, registerLogger(outputChannel));
@@ -165,14 +198,12 @@ async function generateExample() {
     var exampleSnippet = result.exampleSnippet;
     const line = result.line - 3;
     const column = result.column;
-    const refresh = result.refresh;
 
     console.log('Snippet: ' + exampleSnippet);
     console.log('location: ' + [line, column]);
 
-    if (refresh) {
-        await refreshFileContents();
-    }
+    // == Add the missing import to the test file
+    await applyWorkspaceEdit(result.edit);
 
     // == Insert snippet in the right place
     const testDocument = await vscode.workspace.openTextDocument(vscode.Uri.file(pbtFilePath as string));
@@ -211,15 +242,20 @@ async function getPbt(useSelection: boolean): Promise<void> {
     }
 
     // == Generate PBT
-    const result: any = await lsClient?.sendRequest('custom/generatePBT', {
-        functions: selectedFunctions,
-        pbtType: selectedType,
-        source: source,
-        filePath: filePath,
-        testFileNamePattern: testFileNamePattern,
-        useSelection: useSelection,
-        selectedCode: selectedCode,
-    });
+    const result: any = await sendRequestWithProgress(
+        'custom/generatePBT',
+        {
+            functions: selectedFunctions,
+            pbtType: selectedType,
+            source: source,
+            filePath: filePath,
+            testFileNamePattern: testFileNamePattern,
+            useSelection: useSelection,
+            selectedCode: selectedCode,
+        },
+        'Generating PBT',
+        logOutput,
+    );
 
     console.log('RESULT: ');
     console.log(result);
@@ -228,25 +264,213 @@ async function getPbt(useSelection: boolean): Promise<void> {
     var pbtSnippet = result.pbtSnippet;
     const testFileName: string = result.testFileName;
     const functionParameters = result.functionParameters;
-    const pbt = result.pbt;
-    const functions = result.functions;
 
     const customArgStrategyZip = await promptArgsCustomStrategy(functionParameters);
 
+    // The server kept the PBT of the generation: only its session token and the choices are sent
     const result2: any = await lsClient?.sendRequest('custom/generateSnippet', {
-        pbt: pbt,
+        sessionToken: result.sessionToken,
         customArgStrategyZip: customArgStrategyZip,
-        functions: functions,
-        useSelection: useSelection,
-        selectedCode: selectedCode,
     });
+    if (result2.isError) {
+        vscode.window.showWarningMessage(result2.error);
+        return;
+    }
 
     pbtSnippet = result2.pbtSnippet;
 
+    // == Add the missing imports to the test file
+    await applyWorkspaceEdit(result.edit);
+
     // == Insert PBT snippet at the end of the test file
     await insertSnippetAtEndOfFile(pbtSnippet, testFileName);
 }
 
+async function getPbtBatch(): Promise<void> {
+    // == Prompt PBT type
+    const selectedType = await promptPbtType();
+
+    // == Prompt SUTs
+    const editor = vscode.window.activeTextEditor;
+    const source = editor?.document.getText();
+    const filePath = editor?.document.fileName;
+    if (source === undefined) {
+        vscode.window.showInformationMessage('The file is empty');
+        return Promise.reject('The file is empty');
+    }
+
+    const functions: any[] = await getDefinedFunctions(source, editor?.document.uri.toString());
+    const selectedFunctions: any = await vscode.window.showQuickPick(functions, {
+        title: 'System Under Test (SUT) selection',
+        placeHolder: 'Select the functions to generate PBTs for',
+        canPickMany: true,
+    });
+    if (!selectedFunctions || selectedFunctions.length < 1) {
+        return Promise.reject('No function selected');
+    }
+
+    // Types that need two functions make one job of the selection, the others one job per function
+    const toFunction = (selected: any) => {
+        return { name: selected.label, lineStart: selected.lineStart, lineEnd: selected.lineEnd };
+    };
+    const jobs = selectedType.twoFunctions
+        ? [{ functions: selectedFunctions.map(toFunction), pbtType: selectedType }]
+        : selectedFunctions.map((selected: any) => {
+              return { functions: [toFunction(selected)], pbtType: selectedType };
+          });
+
+    // == Generate all PBTs, the server returns the edit that adds them to the test file(s)
+    const result: any = await sendRequestWithProgress(
+        'custom/generatePBTBatch',
+        { jobs: jobs, source: source, filePath: filePath },
+        `Generating ${jobs.length} PBTs`,
+        previewPartialResults(),
+    );
+
+    const failedJobs = result.jobs.filter((job: any) => job.isError).length;
+    if (failedJobs > 0) {
+        vscode.window.showWarningMessage(`${failedJobs} of ${jobs.length} PBTs could not be generated`);
+    }
+    await applyWorkspaceEdit(result.edit);
+
+    if (result.testFileNames.length > 0) {
+        const testDocument = await vscode.workspace.openTextDocument(vscode.Uri.file(result.testFileNames[0]));
+        await vscode.window.showTextDocument(testDocument);
+    }
+}
+
+async function getPbtWorkspace(): Promise<void> {
+    // == Prompt PBT type
+    const selectedType = await promptPbtType();
+
+    // == Prompt SUTs among the functions the server indexed in the workspace
+    const response: any = await lsClient?.sendRequest('custom/getWorkspaceFunctions', {});
+    if (!response.isComplete) {
+        vscode.window.showInformationMessage('The workspace is still being indexed, some functions may be missing');
+    }
+    const functions = response.functions.map((f: any) => {
+        return {
+            label: f.name,
+            description: f.module,
+            detail: f.signature,
+            filePath: f.path,
+            lineStart: f.lineStart,
+            lineEnd: f.lineEnd,
+        };
+    });
+    const selectedFunctions: any = await vscode.window.showQuickPick(functions, {
+        title: 'System Under Test (SUT) selection',
+        placeHolder: 'Search a function of the workspace',
+        canPickMany: true,
+        matchOnDescription: true,
+    });
+    if (!selectedFunctions || selectedFunctions.length < 1) {
+        return Promise.reject('No function selected');
+    }
+
+    // Each job names its file: the server reads it (open editor or disk) and writes its test file
+    const toFunction = (selected: any) => {
+        return { name: selected.label, lineStart: selected.lineStart, lineEnd: selected.lineEnd };
+    };
+    const jobs = selectedType.twoFunctions
+        ? [
+              {
+                  functions: selectedFunctions.map(toFunction),
+                  pbtType: selectedType,
+                  filePath: selectedFunctions[0].filePath,
+              },
+          ]
+        : selectedFunctions.map((selected: any) => {
+              return { functions: [toFunction(selected)], pbtType: selectedType, filePath: selected.filePath };
+          });
+
+    const result: any = await sendRequestWithProgress(
+        'custom/generatePBTBatch',
+        { jobs: jobs, filePath: jobs[0].filePath },
+        `Generating ${jobs.length} PBTs`,
+        previewPartialResults(),
+    );
+
+    const failedJobs = result.jobs.filter((job: any) => job.isError).length;
+    if (failedJobs > 0) {
+        vscode.window.showWarningMessage(`${failedJobs} of ${jobs.length} PBTs could not be generated`);
+    }
+    await applyWorkspaceEdit(result.edit);
+
+    if (result.testFileNames.length > 0) {
+        const testDocument = await vscode.workspace.openTextDocument(vscode.Uri.file(result.testFileNames[0]));
+        await vscode.window.showTextDocument(testDocument);
+    }
+}
+
+// Sends a generation request with progress tokens: the server's work done progress is shown in a
+// notification, and its partial results (output chunks, finished jobs) are handed to onPartialResult
+async function sendRequestWithProgress(
+    method: string,
+    params: any,
+    title: string,
+    onPartialResult: (value: any) => void,
+): Promise<any> {
+    progressTokenCount += 1;
+    const workDoneToken = `${extensionName}-${progressTokenCount}`;
+    const partialResultToken = `${workDoneToken}-partial`;
+
+    const options = { location: vscode.ProgressLocation.Notification, title: title };
+    return vscode.window.withProgress(options, async (progress) => {
+        let percentage = 0;
+        const listeners = [
+            lsClient?.onProgress(WorkDoneProgress.type, workDoneToken, (value) => {
+                if (value.kind === 'report' && value.percentage !== undefined) {
+                    progress.report({ message: value.message, increment: value.percentage - percentage });
+                    percentage = value.percentage;
+                }
+            }),
+            lsClient?.onProgress(new ProgressType<any>(), partialResultToken, onPartialResult),
+        ];
+        try {
+            return await lsClient?.sendRequest(method, { ...params, workDoneToken, partialResultToken });
+        } finally {
+            listeners.forEach((listener) => listener?.dispose());
+        }
+    });
+}
+
+// Logs what the engines print while generating
+function logOutput(value: any) {
+    for (const chunk of value.output ?? []) {
+        if (chunk.text.trim()) {
+            traceLog(chunk.text.trimEnd());
+        }
+    }
+}
+
+// Shows the PBTs of a batch in a read-only preview as the server finishes them, so the first
+// one can be read while the others are generated. The test files are edited once all are done
+function previewPartialResults(): (value: any) => void {
+    previewCount += 1;
+    const uri = vscode.Uri.parse(`${previewScheme}:PBTs-${previewCount}.py`);
+    return (value: any) => {
+        logOutput(value);
+        const pbts = (value.jobs ?? []).filter((job: any) => !job.isError).map((job: any) => job.pbt);
+        if (pbts.length === 0) {
+            return;
+        }
+        const isShown = previewContents.has(uri.path);
+        previewContents.set(uri.path, [previewContents.get(uri.path), ...pbts].filter(Boolean).join('\n\n'));
+        if (isShown) {
+            previewChanged.fire(uri);
+        } else {
+            vscode.workspace.openTextDocument(uri).then((document) =>
+                vscode.window.showTextDocument(document, {
+                    viewColumn: vscode.ViewColumn.Beside,
+                    preserveFocus: true,
+                    preview: true,
+                }),
+            );
+        }
+    };
+}
+
 async function insertSnippetAtEndOfFile(pbtSnippet: string, fileName: string) {
     const testDocument = await vscode.workspace.openTextDocument(vscode.Uri.file(fileName));
     const editor = await vscode.window.showTextDocument(testDocument);
@@ -264,8 +488,15 @@ async function getPbtTypes(): Promise<void> {
     return;
 }
 
-async function getDefinedFunctions(source: string): Promise<[{ name: string; lineStart: number; lineEnd: number }]> {
-    const response: any = await lsClient?.sendRequest('custom/getDefinedFunctionsFromFile', { source: source });
+async function getDefinedFunctions(
+    source: string,
+    uri?: string,
+): Promise<[{ name: string; lineStart: number; lineEnd: number }]> {
+    // The server answers from its index of the open document when the uri is given
+    const response: any = await lsClient?.sendRequest('custom/getDefinedFunctionsFromFile', {
+        source: source,
+        uri: uri,
+    });
     const definedFunctions = await response.functions.map((cell: any) => {
         return {
             label: cell.name,
@@ -292,7 +523,7 @@ async function promptFunctionsToTest(
         vscode.window.showInformationMessage('The file is empty');
         return Promise.reject('The file is empty');
     }
-    const functions: any[] = await getDefinedFunctions(source);
+    const functions: any[] = await getDefinedFunctions(source, editor?.document.uri.toString());
 
     // Check if no functions are defined
     if (functions.length < 1) {
@@ -414,16 +645,17 @@ async function addPbtToEditor(pbt: string, lineNumber: number): Promise<void> {
     });
 }
 
-async function refreshFileContents() {
-    const editor = vscode.window.activeTextEditor;
-    if (editor) {
-        const uri = editor.document.uri;
-        const viewColumn = editor.viewColumn;
-        await vscode.commands.executeCommand('workbench.action.closeActiveEditor');
-        await vscode.workspace.openTextDocument(uri).then((newDocument) => {
-            vscode.window.showTextDocument(newDocument, viewColumn);
-        });
+async function applyWorkspaceEdit(edit: any): Promise<boolean> {
+    // The server computes the edits of test files, the editor's buffers stay the source of truth
+    if (!edit || !lsClient) {
+        return true;
+    }
+    const workspaceEdit = await lsClient.protocol2CodeConverter.asWorkspaceEdit(edit);
+    const applied = await vscode.workspace.applyEdit(workspaceEdit);
+    if (!applied) {
+        vscode.window.showWarningMessage('The test file changed in the meantime, please try again');
     }
+    return applied;
 }
 
 async function insertTemplate() {
@@ -0,0 +1,6 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Microbenchmarks of the server's hot functions, run with `python -m benchmarks`
+from src/test/python_tests (or `nox --session benchmarks`).
+"""
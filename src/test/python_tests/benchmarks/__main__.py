@@ -0,0 +1,211 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Runs the microbenchmarks and writes their results as JSON.
+
+    python -m benchmarks [--quick] [--filter NAME] [--output FILE] [--compare BASELINE]
+"""
+
+# pylint: disable=invalid-name
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from lsp_test_client.constants import TOOL_ROOT
+
+if os.fspath(TOOL_ROOT) not in sys.path:
+    sys.path.insert(0, os.fspath(TOOL_ROOT))
+
+# pylint: disable=wrong-import-position,import-error
+from auxiliary_files.document_cache import DOCUMENT_CACHE
+from auxiliary_files.import_structs import makeImportStructure
+from auxiliary_files.other import (
+    addImports,
+    getSutSourceList,
+    replaceNothingPlaceholder,
+)
+from auxiliary_files.snippet_generators import (
+    SNIPPET_TEMPLATES,
+    addCustomStrategyPlaceholders,
+    makeSnippet,
+)
+from auxiliary_files.symbol_table import getSymbolTable
+from pbt_types import PbtTypeId
+
+from .corpora import makeFunction, makeModule, makeNestedClasses, makePbt, makeTestFile
+
+FUNCTION_COUNTS = [10, 1000, 50000]
+NESTING_DEPTHS = [10, 50]
+IMPORT_COUNTS = [10, 1000, 10000]
+ARGUMENT_COUNTS = [2, 50]
+
+
+def _get_benchmarks(quick: bool):
+    """Yields (name, parameters, function to time). Parsing is cached by content, so the
+    document cache is cleared before every run: the numbers are those of a first request
+    """
+    functionCounts = FUNCTION_COUNTS[:2] if quick else FUNCTION_COUNTS
+    importCounts = IMPORT_COUNTS[:2] if quick else IMPORT_COUNTS
+
+    for count in functionCounts:
+        source = makeModule(count)
+        yield "getDefinedFunctions", {
+            "functions": count
+        }, lambda s=source: getSymbolTable(s).getFunctions()
+        # The last method of the file, with its class stub
+        name = getSymbolTable(source).getFunctions()[-1]["name"]
+        yield "getSutSourceList", {
+            "functions": count
+        }, lambda s=source, n=name: getSutSourceList(s, [n])
+
+    for depth in NESTING_DEPTHS:
+        source = makeNestedClasses(depth)
+        name = getSymbolTable(source).getFunctions()[-1]["name"]
+        yield "getDefinedFunctions", {
+            "nesting": depth
+        }, lambda s=source: getSymbolTable(s).getFunctions()
+        yield "getSutSourceList", {
+            "nesting": depth
+        }, lambda s=source, n=name: getSutSourceList(s, [n])
+
+    for count in importCounts:
+        testFile = makeTestFile(count)
+        pbtImports = makeImportStructure(
+            makePbt(2) + "import math\nfrom hypothesis import example\n"
+        )
+        yield "makeImportStructure", {
+            "imports": count
+        }, lambda s=testFile: makeImportStructure(s)
+        yield "addImports", {
+            "imports": count
+        }, lambda s=testFile, i=pbtImports: addImports(s, i)
+
+    for count in ARGUMENT_COUNTS:
+        pbt = makePbt(count)
+        strategies = [f"strategy_{index}" for index in range(count)]
+        yield "replaceNothingPlaceholder", {
+            "arguments": count
+        }, lambda p=pbt: replaceNothingPlaceholder(p)
+        yield "addCustomStrategyPlaceholders", {"arguments": count}, (
+            lambda p=pbt, s=strategies: addCustomStrategyPlaceholders(p, [], s)
+        )
+
+        function = makeFunction(count)
+        for typeId in SNIPPET_TEMPLATES:
+            parameters = {"type": PbtTypeId(typeId).name, "arguments": count}
+            yield "makeSnippet", parameters, lambda t=typeId, f=function: makeSnippet(
+                t, f, "sample", "function", "oracle"
+            )
+
+
+def _time(function, minRuns: int, minSeconds: float) -> list[float]:
+    """Durations (in ms) of at least minRuns runs, and of as many as fit in minSeconds"""
+    durations = []
+    deadline = time.perf_counter() + minSeconds
+    while len(durations) < minRuns or time.perf_counter() < deadline:
+        DOCUMENT_CACHE.clear()
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def _summarize(name: str, parameters: dict, durations: list[float]) -> dict:
+    return {
+        "name": name,
+        "parameters": parameters,
+        "runs": len(durations),
+        "minMs": round(min(durations), 4),
+        "medianMs": round(statistics.median(durations), 4),
+        "meanMs": round(statistics.fmean(durations), 4),
+        "maxMs": round(max(durations), 4),
+    }
+
+
+def _get_key(result: dict) -> str:
+    return result["name"] + json.dumps(result["parameters"], sort_keys=True)
+
+
+def _compare(results: list[dict], baselinePath: str):
+    with open(baselinePath, "r", encoding="utf-8") as file:
+        baseline = {_get_key(result): result for result in json.load(file)["results"]}
+    print(f"\n{'benchmark':<70} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for result in results:
+        before = baseline.get(_get_key(result))
+        if before is None:
+            continue
+        ratio = (
+            result["medianMs"] / before["medianMs"]
+            if before["medianMs"]
+            else float("inf")
+        )
+        print(
+            f"{_get_key(result):<70} {before['medianMs']:>10.3f}ms "
+            f"{result['medianMs']:>10.3f}ms {ratio:>7.2f}x"
+        )
+
+
+def main(argv=None):
+    """Runs the benchmarks selected by the command line arguments (argv)."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("--quick", action="store_true", help="skip the largest corpora")
+    parser.add_argument(
+        "--filter", default="", help="only run the benchmarks whose name contains this"
+    )
+    parser.add_argument(
+        "--runs", type=int, default=5, help="minimum number of runs per benchmark"
+    )
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.2,
+        help="minimum time spent per benchmark",
+    )
+    parser.add_argument(
+        "--output",
+        default="benchmark_results.json",
+        help="JSON file the results are written to",
+    )
+    parser.add_argument(
+        "--compare", default="", help="JSON results of an earlier run to compare with"
+    )
+    args = parser.parse_args(argv)
+
+    results = []
+    for name, parameters, function in _get_benchmarks(args.quick):
+        if args.filter.lower() not in name.lower():
+            continue
+        result = _summarize(
+            name, parameters, _time(function, args.runs, args.min_seconds)
+        )
+        results.append(result)
+        print(
+            f"{_get_key(result):<70} median {result['medianMs']:>10.3f}ms  "
+            f"min {result['minMs']:>10.3f}ms"
+        )
+
+    report = {
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        _compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Synthetic inputs of the benchmarks: modules, nested classes, test files and PBTs.
+"""
+
+# pylint: disable=invalid-name
+
+
+def makeModule(functionCount: int) -> str:
+    """Module with functionCount functions: top-level functions and classes of 10 methods."""
+    parts = ["import math\nfrom typing import Optional\n\n\n"]
+    index = 0
+    while index < functionCount:
+        if index % 20 < 10:
+            parts.append(
+                f"def function_{index}(value: int, scale: float = 1.0, "
+                "name: Optional[str] = None) -> float:\n"
+                f'    """Function {index}"""\n'
+                f"    if name is None:\n"
+                f"        name = str(value)\n"
+                f"    return math.sqrt(abs(value)) * scale\n\n\n"
+            )
+            index += 1
+        else:
+            parts.append(
+                f"class Class{index}:\n    total: int\n\n"
+                "    def __init__(self, total):\n        self.total = total\n"
+            )
+            for method in range(min(10, functionCount - index)):
+                parts.append(
+                    f"\n    def method_{method}(self, a, b=2):\n        return self.total + a * b\n"
+                )
+                index += 1
+            parts.append("\n\n")
+    return "".join(parts)
+
+
+def makeNestedClasses(depth: int) -> str:
+    """Classes nested depth levels deep, each with one method."""
+    lines = []
+    for level in range(depth):
+        indent = "    " * level
+        lines.append(f"{indent}class Level{level}:\n")
+        lines.append(
+            f"{indent}    def method_{level}(self, x):\n{indent}        return x + {level}\n\n"
+        )
+    return "".join(lines)
+
+
+def makeTestFile(importCount: int) -> str:
+    """Test file with importCount imports (plain, from, aliased) followed by a few tests."""
+    lines = ['"""Tests"""\n']
+    for index in range(importCount):
+        if index % 3 == 0:
+            lines.append(f"import package_{index}.module_{index}\n")
+        elif index % 3 == 1:
+            lines.append(
+                f"from package_{index // 10} import name_{index}, other_{index} as alias_{index}\n"
+            )
+        else:
+            lines.append(f"from hypothesis import given, strategies as st  # {index}\n")
+    lines.append("\n\n")
+    for index in range(20):
+        lines.append(
+            f"@given(x=st.integers())\ndef test_{index}(x):\n    assert x == x\n\n\n"
+        )
+    return "".join(lines)
+
+
+def makePbt(argumentCount: int) -> str:
+    """Ghostwriter-like PBT whose arguments all have the st.nothing() placeholder strategy."""
+    arguments = [f"arg_{index}" for index in range(argumentCount)]
+    given = ", ".join(f"{argument}=st.nothing()" for argument in arguments)
+    call = ", ".join(f"{argument}={argument}" for argument in arguments)
+    return (
+        "import sample\nfrom hypothesis import given, strategies as st\n\n\n"
+        f"@given({given})\n"
+        f"def test_fuzz_function({', '.join(arguments)}) -> None:\n"
+        f"    sample.function({call})\n"
+    )
+
+
+def makeFunction(argumentCount: int) -> str:
+    """Function with argumentCount untyped arguments."""
+    arguments = ", ".join(f"arg_{index}" for index in range(argumentCount))
+    return f"def function({arguments}):\n    return None\n"
@@ -0,0 +1,13 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Makes the bundled tool modules importable by the unit tests.
+"""
+
+import os
+import sys
+
+from .lsp_test_client.constants import TOOL_ROOT
+
+if os.fspath(TOOL_ROOT) not in sys.path:
+    sys.path.insert(0, os.fspath(TOOL_ROOT))
@@ -8,3 +8,4 @@ import pathlib
 TEST_ROOT = pathlib.Path(__file__).parent.parent
 PROJECT_ROOT = TEST_ROOT.parent.parent.parent
 TEST_DATA = TEST_ROOT / "test_data"
+TOOL_ROOT = PROJECT_ROOT / "bundled" / "tool"
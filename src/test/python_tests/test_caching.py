@@ -0,0 +1,119 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test for the server caches.
+"""
+
+import ast
+import time
+
+from auxiliary_files.caching import LruCache, makeSignatureFingerprint
+from auxiliary_files.document_cache import getParsedDocument
+from hamcrest import assert_that, is_, is_not
+
+SOURCE = "def add(a: int, b: int = 1) -> int:\n    return a + b\n"
+
+
+def test_body_only_edits_keep_the_fingerprint():
+    """Changing the body of a SUT does not change its fingerprint."""
+    edited = "def add(a: int, b: int = 1) -> int:\n    c = a\n    return c + b\n"
+
+    assert_that(
+        makeSignatureFingerprint(["add"], [edited]),
+        is_(makeSignatureFingerprint(["add"], [SOURCE])),
+    )
+
+
+def test_signature_edits_change_the_fingerprint():
+    """Annotations and defaults are part of the fingerprint."""
+    annotation = "def add(a: float, b: int = 1) -> int:\n    return a + b\n"
+    default = "def add(a: int, b: int = 2) -> int:\n    return a + b\n"
+    original = makeSignatureFingerprint(["add"], [SOURCE])
+
+    assert_that(makeSignatureFingerprint(["add"], [annotation]), is_not(original))
+    assert_that(makeSignatureFingerprint(["add"], [default]), is_not(original))
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """The cache is bounded and counts hits, misses and evictions."""
+    cache = LruCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert_that(cache.get("b"), is_(None))
+    assert_that(cache.get("a"), is_(1))
+    assert_that(
+        cache.getStats(),
+        is_(
+            {
+                "size": 2,
+                "maxSize": 2,
+                "weight": 2,
+                "maxWeight": None,
+                "hits": 2,
+                "misses": 1,
+                "evictions": 1,
+            }
+        ),
+    )
+
+
+def test_lru_cache_expires_entries():
+    """Entries with a time to live disappear once it has passed."""
+    cache = LruCache(2)
+    cache.put("error", "failed", ttl=0.01)
+    time.sleep(0.02)
+
+    assert_that(cache.get("error"), is_(None))
+
+
+def test_lru_cache_bounds_total_weight():
+    """Entries are evicted once their total weight exceeds the bound."""
+    cache = LruCache(10, maxWeight=100)
+    cache.put("a", 1, weight=60)
+    cache.put("b", 2, weight=60)
+
+    assert_that(cache.get("a"), is_(None))
+    assert_that(cache.get("b"), is_(2))
+
+
+def test_documents_are_parsed_once():
+    """The same source maps to the same parsed document and derived data."""
+    source = "def shared_document(x):\n    return x\n"
+    calls = []
+
+    def compute(tree):
+        calls.append(tree)
+        return len(tree.body)
+
+    document = getParsedDocument(source)
+
+    assert_that(getParsedDocument(source) is document, is_(True))
+    assert_that(document.getDerived("count", compute), is_(1))
+    assert_that(document.getDerived("count", compute), is_(1))
+    assert_that(len(calls), is_(1))
+
+
+def test_referenced_definitions_are_part_of_the_fingerprint():
+    """Editing a type or alias the signature refers to changes the fingerprint."""
+    module = (
+        "from dataclasses import dataclass\n\n\n@dataclass\nclass Point:\n    x: int\n\n\n"
+        "Points = list[Point]\n\n\ndef centre(points: Points) -> Point:\n    return points[0]\n"
+    )
+    sut = "def centre(points: Points) -> Point:\n    return points[0]\n"
+
+    def fingerprint(source):
+        return makeSignatureFingerprint(["centre"], [sut], ast.parse(source))
+
+    original = fingerprint(module)
+    assert_that(
+        fingerprint(module.replace("return points[0]", "return points[-1]")),
+        is_(original),
+    )
+    assert_that(fingerprint(module.replace("x: int", "x: float")), is_not(original))
+    assert_that(
+        fingerprint(module.replace("list[Point]", "tuple[Point, ...]")),
+        is_not(original),
+    )
@@ -0,0 +1,18 @@
+import json
+
+
+def encode(value: int) -> str:
+    return json.dumps(value)
+
+
+def decode(text: str) -> int:
+    return json.loads(text)
+
+
+def sort_list(values: list):
+    return sorted(values)
+
+
+class Calculator:
+    def add(self, a: int, b: int) -> int:
+        return a + b
@@ -0,0 +1,60 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test for the incremental function index of open documents.
+"""
+
+from auxiliary_files.function_index import FunctionIndex, mergeFunctions, parseBlocks
+from hamcrest import assert_that, is_
+
+SOURCE = """def encode(s):
+    return s
+
+
+class Calculator:
+    def add(self, a, b):
+        return a + b
+
+
+def decode(s):
+    return s
+"""
+
+
+def _full_index(lines):
+    return mergeFunctions(b.functions for b in parseBlocks("".join(lines)))
+
+
+def _edit(index, lines, start, end, text):
+    """Replaces the (0-based) lines start..end-1 like a didChange range would"""
+    lines = lines[:start] + text.splitlines(True) + lines[end:]
+    index.update([(start, end, text)], lines)
+    return lines
+
+
+def test_incremental_updates_match_a_full_parse():
+    """Edits only re-parse the touched blocks, with the same result as a full parse."""
+    lines = SOURCE.splitlines(True)
+    index = FunctionIndex(lines)
+
+    lines = _edit(index, lines, 1, 1, "    s = s.strip()\n")
+    lines = _edit(index, lines, 0, 0, "def sort_list(l):\n    return sorted(l)\n\n\n")
+    lines = _edit(
+        index, lines, 9, 9, "    def sub(self, a, b):\n        return a - b\n"
+    )
+
+    assert_that(index.getFunctions(), is_(_full_index(lines)))
+    assert_that(index.fullParses, is_(1))
+
+
+def test_last_good_functions_are_kept_on_syntax_errors():
+    """While the document does not parse, the last good functions are served."""
+    lines = SOURCE.splitlines(True)
+    index = FunctionIndex(lines)
+    good = index.getFunctions()
+
+    lines = _edit(index, lines, 5, 6, "    def add(self, a, b:\n")
+    assert_that(index.getFunctions(), is_(good))
+
+    lines = _edit(index, lines, 5, 6, "    def add(self, a, b, c):\n")
+    assert_that(index.getFunctions(), is_(_full_index(lines)))
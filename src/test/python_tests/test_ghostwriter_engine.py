@@ -0,0 +1,108 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test that the in-process ghostwriter engine matches `hypothesis write`.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+from auxiliary_files.ghostwriter_engine import (
+    getWriterName,
+    loadModule,
+    writeUsingGhostwriter,
+    writeUsingGhostwriterFromSource,
+)
+from hamcrest import assert_that, is_
+
+from .lsp_test_client import constants
+
+SAMPLE_DIR = os.fspath(constants.TEST_DATA / "sample2")
+
+
+@pytest.mark.parametrize(
+    "functions, argument",
+    [
+        (["encode", "decode"], "--roundtrip"),
+        (["encode", "decode"], "--equivalent"),
+        (["sort_list"], "--idempotent"),
+        (["sort_list"], ""),
+        (["Calculator.add"], "--equivalent"),
+    ],
+)
+def test_in_process_output_matches_cli(functions, argument):
+    """The in-process engine writes exactly what the CLI prints."""
+    if shutil.which("hypothesis") is None:
+        pytest.skip("hypothesis CLI is not installed")
+
+    argv = ["hypothesis", "write"] + ([argument] if argument else [])
+    argv += ["sample_module." + f for f in functions]
+    cli = subprocess.run(
+        argv, cwd=SAMPLE_DIR, capture_output=True, encoding="utf-8", check=False
+    )
+
+    is_error, pbt = writeUsingGhostwriter(
+        "sample_module", functions, argument, SAMPLE_DIR
+    )
+
+    assert_that(is_error, is_(False))
+    assert_that(pbt, is_(cli.stdout))
+
+
+def test_writer_name_follows_cli_rules():
+    """Single-function roundtrip/equivalent fall back like the CLI does."""
+    assert_that(getWriterName("--roundtrip", 1), is_("idempotent"))
+    assert_that(getWriterName("--equivalent", 1), is_("fuzz"))
+    assert_that(getWriterName("--equivalent", 2), is_("equivalent"))
+    assert_that(getWriterName("", 1), is_("magic"))
+
+
+def test_unknown_function_is_reported_as_error():
+    """Errors are returned instead of raised."""
+    is_error, error = writeUsingGhostwriter(
+        "sample_module", ["missing"], "", SAMPLE_DIR
+    )
+
+    assert_that(is_error, is_(True))
+    assert_that("AttributeError" in error, is_(True))
+
+
+def test_workspace_modules_are_imported_and_reloaded(tmp_path):
+    """Sibling imports resolve from cwd, and an edited sibling is picked up."""
+    (tmp_path / "helpers_gw.py").write_text("def scale(x: int) -> int:\n    return x\n")
+    (tmp_path / "uses_helpers_gw.py").write_text(
+        "from helpers_gw import scale\n\n\ndef double(x: int) -> int:\n    return scale(x) * 2\n"
+    )
+    module = loadModule("uses_helpers_gw", str(tmp_path))
+    assert_that(str(tmp_path) in sys.path, is_(False))
+    assert_that(module.double(2), is_(4))
+
+    (tmp_path / "helpers_gw.py").write_text(
+        "def scale(x: int) -> int:\n    return x * 10\n"
+    )
+    os.utime(tmp_path / "helpers_gw.py", (1, 1))
+    assert_that(loadModule("uses_helpers_gw", str(tmp_path)).double(2), is_(40))
+
+
+def test_source_imports_resolve_from_cwd_without_changing_sys_path(tmp_path):
+    """A source's sibling imports are found in cwd; sys.path is left as it was."""
+    (tmp_path / "helpers_src.py").write_text(
+        "def scale(x: int) -> int:\n    return x\n"
+    )
+    source = (
+        "from helpers_src import scale\n\n\n"
+        "def triple(x: int) -> int:\n    return scale(x) * 3\n"
+    )
+    path = sys.path
+    try:
+        is_error, pbt = writeUsingGhostwriterFromSource(
+            "unsaved_src", source, ["triple"], "", cwd=str(tmp_path)
+        )
+    finally:
+        sys.modules.pop("helpers_src", None)
+
+    assert_that((is_error, "def test_fuzz_triple" in pbt), is_((False, True)))
+    assert_that(sys.path is path and str(tmp_path) not in sys.path, is_(True))
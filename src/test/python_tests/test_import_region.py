@@ -0,0 +1,62 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test for adding imports to the import block of a test file.
+"""
+
+from auxiliary_files.import_structs import makeImportStructure
+from auxiliary_files.other import addImports, findImportRegion
+from hamcrest import assert_that, is_
+
+TEST_FILE = '''"""Tests of the codec."""
+import codec  # the module under test
+from hypothesis import given, strategies as st
+
+
+@given(s=st.text())
+def test_roundtrip(s):
+    # keep this comment
+    assert codec.decode(codec.encode(s)) == s
+'''
+
+
+def test_only_missing_imports_are_added():
+    """The rest of the file is kept byte for byte."""
+    imports = makeImportStructure(
+        "import codec\nfrom hypothesis import given, example\nimport math"
+    )
+    result = addImports(TEST_FILE, imports)
+
+    _, end = findImportRegion(TEST_FILE)
+    assert_that(result[:end], is_(TEST_FILE[:end]))
+    assert_that(
+        result[end:].startswith("from hypothesis import example\nimport math\n"),
+        is_(True),
+    )
+    assert_that(result.endswith(TEST_FILE[end:]), is_(True))
+
+
+def test_nothing_changes_when_all_imports_are_present():
+    """A test file that already has the imports is returned as is."""
+    imports = makeImportStructure("from hypothesis import given, strategies as st")
+
+    assert_that(addImports(TEST_FILE, imports), is_(TEST_FILE))
+
+
+def test_imports_further_down_are_not_added_again():
+    """Module-level imports after the top block count, those inside functions do not."""
+    source = TEST_FILE + "\n\nimport math\n\n\ndef test_local():\n    import json\n"
+    result = addImports(source, makeImportStructure("import math\nimport json"))
+
+    assert_that(result.count("import math"), is_(1))
+    assert_that(result.count("import json"), is_(2))
+
+
+def test_region_of_a_source_that_does_not_parse():
+    """A test file being edited still gets its imports after its top block."""
+    source = TEST_FILE + "\ndef test_unfinished(:\n"
+    result = addImports(source, makeImportStructure("import math"))
+
+    _, end = findImportRegion(TEST_FILE)
+    assert_that(findImportRegion(source), is_(findImportRegion(TEST_FILE)))
+    assert_that(result, is_(source[:end] + "import math\n" + source[end:]))
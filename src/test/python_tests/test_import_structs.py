@@ -0,0 +1,55 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test for merging import structures.
+"""
+
+from auxiliary_files.import_structs import ImportEntry, MaybeAlias, makeImportStructure
+from hamcrest import assert_that, is_
+
+
+def test_merging_keeps_every_import_once():
+    """Names are kept in import order, once, and namespace imports survive merges."""
+    structure = makeImportStructure("from hypothesis import given\nimport numpy as np")
+    structure += makeImportStructure(
+        "import hypothesis\nfrom hypothesis import given, strategies as st"
+    )
+    structure += makeImportStructure("from numpy import array")
+
+    assert_that(
+        structure.toSource(),
+        is_(
+            "import hypothesis\nfrom hypothesis import given, strategies as st\n"
+            "import numpy as np\nfrom numpy import array\n"
+        ),
+    )
+    assert_that(structure.containsName("hypothesis", "strategies"), is_(True))
+
+
+def test_merges_do_not_change_their_operands():
+    """+ returns a new structure; entries do not share their names."""
+    first = makeImportStructure("from hypothesis import given")
+    second = makeImportStructure("from hypothesis import example")
+    merged = first + second
+
+    assert_that(merged.containsName("hypothesis", "example"), is_(True))
+    assert_that(first.containsName("hypothesis", "example"), is_(False))
+
+    ImportEntry(MaybeAlias("os")).addName(MaybeAlias("path"))
+    assert_that(ImportEntry(MaybeAlias("os")).names, is_({}))
+
+
+def test_aliased_imports_are_different_imports():
+    """'x as y' is not imported by 'x', so it is still missing."""
+    test_file = makeImportStructure(
+        "from hypothesis import given, strategies\nimport numpy"
+    )
+    pbt = makeImportStructure(
+        "from hypothesis import given, strategies as st\nimport numpy as np"
+    )
+
+    assert_that(
+        pbt.without(test_file).toSource(),
+        is_("from hypothesis import strategies as st\nimport numpy as np\n"),
+    )
+    assert_that(pbt.without(test_file + pbt).toSource(), is_(""))
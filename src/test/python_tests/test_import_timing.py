@@ -0,0 +1,35 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test for the import time report.
+"""
+
+from auxiliary_files.import_timing import formatImportTimes, parseImportTimes
+from hamcrest import assert_that, is_
+
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _json
+import time:      1500 |       1620 |   json
+import time:       300 |       1920 | server
+"""
+
+
+def test_import_times_are_parsed():
+    """Every `-X importtime` line becomes an entry, with its nesting depth."""
+    entries = parseImportTimes(IMPORTTIME_OUTPUT)
+    assert_that(
+        [(e["module"], e["selfUs"], e["cumulativeUs"], e["depth"]) for e in entries],
+        is_(
+            [("_json", 120, 120, 2), ("json", 1500, 1620, 1), ("server", 300, 1920, 0)]
+        ),
+    )
+
+
+def test_slowest_imports_come_first():
+    """The report lists the imports by decreasing cumulative time."""
+    report = formatImportTimes(parseImportTimes(IMPORTTIME_OUTPUT), limit=2)
+    lines = report.splitlines()
+    assert_that(lines[0], is_("Imports: 3 modules, 1.9 ms"))
+    assert_that(
+        [line.split("|")[-1].strip() for line in lines[2:]], is_(["server", "json"])
+    )
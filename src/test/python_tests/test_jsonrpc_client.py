@@ -0,0 +1,151 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test for the multiplexed JSON-RPC client of the runners.
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import lsp_jsonrpc as jsonrpc
+import pytest
+from hamcrest import assert_that, is_
+
+
+def _connect():
+    """A client, and the other end of its connection (a fake runner)"""
+    to_runner, to_client = os.pipe(), os.pipe()
+    # pylint: disable=consider-using-with
+    client = jsonrpc.JsonRpcClient(
+        jsonrpc.create_json_rpc(open(to_client[0], "rb"), open(to_runner[1], "wb"))
+    )
+    runner = jsonrpc.create_json_rpc(open(to_runner[0], "rb"), open(to_client[1], "wb"))
+    return client, runner
+
+
+def test_replies_are_dispatched_by_id():
+    """Requests in flight together get their own reply, whatever the order of the replies."""
+    client, runner = _connect()
+
+    def answer_in_reverse_order():
+        requests = [runner.receive_data() for _ in range(3)]
+        for request in reversed(requests):
+            runner.send_data({"id": request["id"], "result": request["value"] * 2})
+
+    thread = threading.Thread(target=answer_in_reverse_order)
+    thread.start()
+    with ThreadPoolExecutor(3) as executor:
+        replies = executor.map(
+            lambda v: client.request(
+                {"id": str(v), "method": "double", "value": v}, 10
+            ),
+            [1, 2, 3],
+        )
+        assert_that([reply["result"] for reply in replies], is_([2, 4, 6]))
+    thread.join(10)
+    assert_that(client.pending_count, is_(0))
+    client.close()
+    runner.close()
+
+
+def test_requests_time_out_and_fail_when_the_runner_exits():
+    """A request without reply times out; those in flight when the connection closes fail."""
+    client, runner = _connect()
+    with pytest.raises(TimeoutError):
+        client.request({"id": "1", "method": "slow"}, 0.1)
+
+    with ThreadPoolExecutor(1) as executor:
+        waiting = executor.submit(client.request, {"id": "2", "method": "slow"}, 10)
+        runner.receive_data()
+        runner.receive_data()
+        runner.close()
+        with pytest.raises(jsonrpc.StreamClosedException):
+            waiting.result(10)
+    with pytest.raises(jsonrpc.StreamClosedException):
+        client.request({"id": "3", "method": "slow"}, 10)
+    client.close()
+
+
+def test_runner_is_restarted_after_it_exits(tmp_path):
+    """A runner that died is replaced by a new one on the next request."""
+    workspace = str(tmp_path)
+    first = jsonrpc.get_or_start_json_rpc(workspace, [sys.executable], workspace)
+    first.notify({"id": "1", "method": "exit"})
+    deadline = time.monotonic() + 30
+    while not first.closed and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    second = jsonrpc.get_or_start_json_rpc(workspace, [sys.executable], workspace)
+    assert_that(second is first, is_(False))
+    assert_that(second.closed, is_(False))
+    second.notify({"id": "2", "method": "exit"})
+
+
+def test_runner_runs_requests_concurrently(tmp_path):
+    """A slow request does not hold up the others, and replies report their timings."""
+    workspace = str(tmp_path)
+    (tmp_path / "slow_module.py").write_text(
+        "import time\ntime.sleep(2)\n\ndef f(x: int) -> int:\n    return x\n",
+        encoding="utf-8",
+    )
+    env = {**os.environ, "LS_RUNNER_CONCURRENCY": "2"}
+    runner = jsonrpc.get_or_start_json_rpc(workspace, [sys.executable], workspace, env)
+
+    with ThreadPoolExecutor(2) as executor:
+        slow = executor.submit(
+            runner.request,
+            {
+                "id": "1",
+                "method": "ghostwrite",
+                "module": "slow_module",
+                "functions": ["f"],
+                "argument": "",
+                "cwd": workspace,
+            },
+            60,
+        )
+        time.sleep(0.5)
+        fast = runner.request({"id": "2", "method": "unknown"}, 60)
+        assert_that(slow.done(), is_(False))
+        assert_that(fast["exception"], is_(True))
+
+        reply = slow.result(60)
+        assert_that("def test_" in reply["result"], is_(True))
+        assert_that(reply["execMs"] >= 2000, is_(True))
+        assert_that(reply["queueMs"] < 1000, is_(True))
+    runner.notify({"id": "3", "method": "exit"})
+
+
+def test_notifications_of_a_request_reach_its_listener():
+    """Messages with a method sent with the id of a request before its reply (e.g. its
+    output) go to the listener of that request, and do not end it."""
+    client, runner = _connect()
+    notifications = []
+
+    def answer_with_output():
+        request = runner.receive_data()
+        for text in ("a", "b"):
+            runner.send_data(
+                {
+                    "id": request["id"],
+                    "method": "output",
+                    "stream": "stdout",
+                    "text": text,
+                }
+            )
+        runner.send_data({"id": "other", "method": "output", "text": "dropped"})
+        runner.send_data({"id": request["id"], "result": "done"})
+
+    thread = threading.Thread(target=answer_with_output)
+    thread.start()
+    reply = client.request(
+        {"id": "1", "method": "ghostwrite"}, 10, notifications.append
+    )
+    thread.join(10)
+    assert_that(reply["result"], is_("done"))
+    assert_that([n["text"] for n in notifications], is_(["a", "b"]))
+    client.close()
+    runner.close()
@@ -0,0 +1,74 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test for the framing and codecs of the runner transport.
+"""
+
+import io
+import os
+import threading
+
+import lsp_jsonrpc as jsonrpc
+from hamcrest import assert_that, is_
+
+
+def _frame(content: bytes, extra_header: bytes = b"") -> bytes:
+    return extra_header + b"Content-Length: %d\r\n\r\n" % len(content) + content
+
+
+def test_messages_are_read_from_one_stream():
+    """Several messages, headers in any case, and multi-byte content are read in order."""
+    stream = io.BytesIO(
+        _frame(b'{"id": 1}')
+        + _frame(
+            '{"source": "é = 1\\n"}'.encode("utf-8"),
+            b"Content-Type: application/json\r\n",
+        )
+        + _frame(b'{"id": 3}').replace(b"Content-Length", b"content-length")
+    )
+    reader = jsonrpc.JsonReader(stream)
+    assert_that(reader.read(), is_({"id": 1}))
+    assert_that(reader.read(), is_({"source": "é = 1\n"}))
+    assert_that(reader.read(), is_({"id": 3}))
+
+
+def test_large_messages_round_trip_with_every_codec():
+    """What is written is read back, whichever codec both ends use."""
+    message = {
+        "id": "1",
+        "method": "ghostwriteSource",
+        "source": "def f(x):\n    return 'ü'\n" * 20000,
+    }
+    for name in jsonrpc.get_available_codecs():
+        read_end, write_end = os.pipe()
+        with open(read_end, "rb") as readable, open(write_end, "wb") as writable:
+            reader = jsonrpc.JsonReader(readable, jsonrpc.get_codec(name))
+            writer = jsonrpc.JsonWriter(writable, jsonrpc.get_codec(name))
+            thread = threading.Thread(
+                target=lambda w: [w.write(message) for _ in range(2)], args=(writer,)
+            )
+            thread.start()
+            assert_that([reader.read(), reader.read()], is_([message, message]))
+            thread.join()
+
+
+def test_codec_is_negotiated(monkeypatch):
+    """Both ends switch to the first codec offered that the answering end has."""
+    monkeypatch.setenv("LS_RPC_CODECS", "unknown,json")
+    to_runner, to_server = os.pipe(), os.pipe()
+    # pylint: disable=consider-using-with
+    server = jsonrpc.create_json_rpc(open(to_server[0], "rb"), open(to_runner[1], "wb"))
+    runner = jsonrpc.create_json_rpc(open(to_runner[0], "rb"), open(to_server[1], "wb"))
+
+    thread = threading.Thread(
+        target=lambda: runner.answer_codec_negotiation(runner.receive_data())
+    )
+    thread.start()
+    assert_that(server.negotiate_codec(), is_("json"))
+    thread.join()
+    assert_that(runner.codec, is_("json"))
+
+    server.send_data({"id": "2", "method": "exit"})
+    assert_that(runner.receive_data(), is_({"id": "2", "method": "exit"}))
+    server.close()
+    runner.close()
@@ -0,0 +1,110 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test for the helpers of the server: offloading of handlers, edits of the test file and
+generation sessions kept between generatePBT and generateSnippet.
+"""
+
+# pylint: disable=protected-access
+
+import asyncio
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import lsp_server
+from hamcrest import assert_that, is_
+from lsprotocol import types as lsp
+
+
+def test_offloaded_handlers_run_at_the_same_time():
+    """Blocking handlers do not hold up the event loop nor each other."""
+    barrier = threading.Barrier(2)
+    executor = ThreadPoolExecutor(max_workers=2)
+
+    @lsp_server.offload(executor)
+    def handler(name):
+        barrier.wait(5)
+        return name
+
+    async def main():
+        return await asyncio.gather(handler("a"), handler("b"))
+
+    try:
+        assert_that(asyncio.run(main()), is_(["a", "b"]))
+    finally:
+        executor.shutdown()
+
+
+def test_positions_are_in_utf16_code_units():
+    """Characters outside the BMP count twice, non-ASCII ones of the BMP once."""
+    source = "import math\ns = 'é😀'  # x\n"
+    offset = source.index("#")
+
+    position = lsp_server._offset_to_position(source, offset)
+
+    assert_that((position.line, position.character), is_((1, 11)))
+    assert_that(
+        lsp_server._offset_to_position(source, len(source)).line,
+        is_(2),
+    )
+
+
+def test_insertions_at_the_same_offset_are_merged_in_order(tmp_path):
+    """One edit per offset, with the texts in the order they were given."""
+    source = "import os\n\n\ndef test():\n    pass\n"
+    changes = lsp_server._test_file_changes(
+        str(tmp_path / "test_x.py"),
+        3,
+        source,
+        [(10, "import a\n"), (0, ""), (10, "import b\n"), (len(source), "# end\n")],
+    )
+
+    assert_that(len(changes), is_(1))
+    assert_that(changes[0].text_document.version, is_(3))
+    edits = [
+        (edit.range.start.line, edit.range.start.character, edit.new_text)
+        for edit in changes[0].edits
+    ]
+    assert_that(edits, is_([(1, 0, "import a\nimport b\n"), (5, 0, "# end\n")]))
+
+
+def test_a_missing_test_file_is_created_first(tmp_path):
+    """The edit creates the file, then inserts into it from its start."""
+    changes = lsp_server._test_file_changes(
+        str(tmp_path / "test_new.py"), None, None, [(0, "import hypothesis\n")]
+    )
+
+    assert_that(isinstance(changes[0], lsp.CreateFile), is_(True))
+    assert_that(changes[0].uri, is_(changes[1].text_document.uri))
+    assert_that(changes[1].text_document.version, is_(None))
+    assert_that(changes[1].edits[0].range.start, is_(lsp.Position(line=0, character=0)))
+
+
+def _make_snippet(token):
+    params = types.SimpleNamespace(
+        sessionToken=token, customArgStrategyZip=[("x", False)]
+    )
+    return asyncio.run(lsp_server.on_make_snippet(params))
+
+
+def test_snippet_of_an_unknown_or_expired_session_is_an_error():
+    """generateSnippet asks to generate again instead of failing."""
+    session = {
+        "pbtBody": "@given(x=st.nothing())\ndef test_fuzz_f(x):\n    f(x=x)",
+        "sutName": "f",
+    }
+    lsp_server.GENERATION_SESSIONS.put("live", session)
+    lsp_server.GENERATION_SESSIONS.put("expired", session, ttl=0.01)
+    time.sleep(0.02)
+
+    for token in ("unknown", "expired"):
+        result = _make_snippet(token)
+        assert_that(
+            (result["isError"], result["pbtSnippet"], "expired" in result["error"]),
+            is_((True, "", True)),
+        )
+    result = _make_snippet("live")
+    assert_that(result["isError"], is_(False))
+    assert_that("def test_fuzz_f(x)" in result["pbtSnippet"], is_(True))
@@ -0,0 +1,113 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test for the in-process runs that leave the process' state alone.
+"""
+
+import importlib
+import os
+import sys
+import threading
+
+import lsp_utils as utils
+from hamcrest import assert_that, is_
+
+
+def test_runs_in_threads_get_their_own_output_and_import_path(tmp_path):
+    """Threads running at the same time each get their own output and import modules
+    from their own working directory, without changing the process' cwd or sys.path."""
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / f"thread_module_{name}.py").write_text("", encoding="utf-8")
+    cwd, path = os.getcwd(), list(sys.path)
+    barrier = threading.Barrier(2)
+    results = {}
+
+    def run(context):
+        name = os.path.basename(context.cwd)
+        other = "b" if name == "a" else "a"
+        barrier.wait(10)
+        print(name)
+        try:
+            importlib.import_module(f"thread_module_{other}")
+        except ModuleNotFoundError:
+            pass
+        else:
+            return "imported the module of the other thread"
+        barrier.wait(10)
+        importlib.import_module(f"thread_module_{name}")
+        return "ok"
+
+    def target(name):
+        results[name] = utils.run_in_context(run, str(tmp_path / name))
+
+    threads = [threading.Thread(target=target, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    for name in ("a", "b"):
+        sys.modules.pop(f"thread_module_{name}", None)
+
+    for name in ("a", "b"):
+        value, output = results[name]
+        assert_that((value, output.stdout), is_(("ok", f"{name}\n")))
+    assert_that((os.getcwd(), sys.path), is_((cwd, path)))
+
+
+def test_thread_import_path_comes_before_sys_path(tmp_path):
+    """A module of the thread's import path shadows one of the same name on sys.path."""
+    for name in ("thread", "process"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "shadowed_module.py").write_text(
+            f"WHERE = {name!r}\n", encoding="utf-8"
+        )
+    sys.path.insert(0, str(tmp_path / "process"))
+    try:
+        with utils.thread_import_path(str(tmp_path / "thread")):
+            module = importlib.import_module("shadowed_module")
+    finally:
+        sys.path.remove(str(tmp_path / "process"))
+        sys.modules.pop("shadowed_module", None)
+
+    assert_that(module.WHERE, is_("thread"))
+
+
+def test_run_gets_its_input_and_survives_exit(tmp_path):
+    """The source is the run's stdin, and SystemExit ends the run, not the caller."""
+
+    def run(context):
+        print(context.stdin.read().upper())
+        sys.exit(2)
+
+    value, output = utils.run_in_context(run, str(tmp_path), source="input")
+    assert_that((value, output.stdout), is_((None, "INPUT\n")))
+
+
+def test_output_is_streamed_while_the_run_goes_on(tmp_path):
+    """on_output gets what is printed as it is printed, in-process and from a process."""
+    chunks = []
+
+    def run(_context):
+        print("first")
+        seen = list(chunks)
+        print("second", file=sys.stderr)
+        return seen
+
+    value, output = utils.run_in_context(
+        run, str(tmp_path), on_output=lambda *chunk: chunks.append(chunk)
+    )
+    assert_that(value, is_([("stdout", "first"), ("stdout", "\n")]))
+    assert_that(chunks[2:], is_([("stderr", "second"), ("stderr", "\n")]))
+    assert_that(output.stdout, is_("first\n"))
+
+    chunks.clear()
+    output = utils.run_path(
+        [sys.executable, "-c", "import sys; print(sys.stdin.read()); print('two')"],
+        use_stdin=True,
+        cwd=str(tmp_path),
+        source="one",
+        on_output=lambda *chunk: chunks.append(chunk),
+    )
+    assert_that(chunks, is_([("stdout", "one\n"), ("stdout", "two\n")]))
+    assert_that((output.stdout, output.stderr), is_(("one\ntwo\n", "")))
@@ -0,0 +1,33 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test for the latency and payload size metrics of the server.
+"""
+
+from auxiliary_files.metrics import NULL_SPAN, Metrics
+from hamcrest import assert_that, is_
+
+
+def test_percentiles_are_computed_per_name():
+    """Every name has its own histogram with count, mean, max and percentiles."""
+    metrics = Metrics()
+    for value in range(1, 101):
+        metrics.recordLatency("generatePBT", value)
+    metrics.recordSize("generatePBT.request", 10)
+
+    stats = metrics.getStats()
+    assert_that(
+        stats["latencyMs"]["generatePBT"],
+        is_({"count": 100, "mean": 50.5, "max": 100, "p50": 51, "p95": 96, "p99": 100}),
+    )
+    assert_that(stats["payloadSize"]["generatePBT.request"]["count"], is_(1))
+
+
+def test_nothing_is_recorded_while_disabled():
+    """Disabled metrics hand out a no-op span."""
+    metrics = Metrics(enabled=False)
+    with metrics.span("generatePBT") as span:
+        pass
+
+    assert_that(span, is_(NULL_SPAN))
+    assert_that(metrics.getStats()["latencyMs"], is_({}))
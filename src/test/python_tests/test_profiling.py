@@ -0,0 +1,36 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test for the on-demand profiling of requests.
+"""
+
+from auxiliary_files.profiling import Profiler, parseProfileSpec
+from hamcrest import assert_that, is_
+
+
+def test_profile_specs_are_parsed():
+    """LS_PROFILE holds the handlers and the number of requests to profile."""
+    assert_that(
+        parseProfileSpec("generatePBT,getTemplate:3"),
+        is_((["generatePBT", "getTemplate"], 3)),
+    )
+    assert_that(parseProfileSpec("5"), is_((["*"], 5)))
+    assert_that(parseProfileSpec("generatePBT"), is_((["generatePBT"], 1)))
+
+
+def test_only_the_armed_requests_are_profiled(tmp_path):
+    """The next count requests of the armed handler are profiled, the others are not."""
+    profiler = Profiler()
+    messages = []
+    profiler.log = messages.append
+    profiler.arm(["generatePBT"], 1, str(tmp_path))
+
+    assert_that(profiler.take("getTemplate"), is_(False))
+    assert_that(profiler.take("generatePBT"), is_(True))
+    assert_that(profiler.take("generatePBT"), is_(False))
+
+    assert_that(profiler.run("generatePBT", sorted, [3, 1, 2]), is_([1, 2, 3]))
+    assert_that(
+        sorted(path.suffix for path in tmp_path.iterdir()), is_([".pstats", ".txt"])
+    )
+    assert_that(len(messages), is_(1))
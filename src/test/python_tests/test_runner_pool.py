@@ -0,0 +1,173 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test for the supervisor of the warm runner processes.
+"""
+
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+
+import lsp_jsonrpc as jsonrpc
+import pytest
+from hamcrest import assert_that, is_
+
+
+# pylint: disable-next=too-few-public-methods
+class FakeClient:
+    """Stands for the connection to a runner process."""
+
+
+@pytest.fixture(name="processes")
+def fixture_processes(monkeypatch):
+    """Runner processes by id, started and stopped without spawning anything"""
+    processes = {}
+
+    def get_or_start(key, *_args):
+        return processes.setdefault(key, FakeClient())
+
+    monkeypatch.setattr(jsonrpc, "get_or_start_json_rpc", get_or_start)
+    monkeypatch.setattr(
+        jsonrpc._process_manager,  # pylint: disable=protected-access
+        "stop_process",
+        lambda key: processes.pop(key, None),
+    )
+    return processes
+
+
+def test_requests_go_to_the_least_busy_runner(processes):
+    """Runners take requests in turn, up to their concurrency."""
+    pool = jsonrpc.RunnerPool(size=2, concurrency=2)
+    indexes = [pool.acquire("ws", [sys.executable], "ws")[0] for _ in range(4)]
+    assert_that(sorted(indexes), is_([0, 0, 1, 1]))
+    assert_that(len(processes), is_(2))
+
+    pool.release("ws", 1, {"id": "1"})
+    assert_that(pool.acquire("ws", [sys.executable], "ws")[0], is_(1))
+
+
+def test_runners_are_recycled_past_their_limits(processes):
+    """A runner is replaced after max_requests requests or past max_rss_mb of memory,
+    once its requests in flight are answered."""
+    pool = jsonrpc.RunnerPool(size=1, concurrency=2)
+    pool.set_limits(max_requests=2, max_rss_mb=500)
+
+    _, first = pool.acquire("ws", [sys.executable], "ws")
+    pool.acquire("ws", [sys.executable], "ws")
+    pool.release("ws", 0, {"id": "1", "rssMb": 100})
+    pool.release("ws", 0, {"id": "2", "rssMb": 100})
+    assert_that(processes, is_({}))
+
+    _, second = pool.acquire("ws", [sys.executable], "ws")
+    assert_that(second is first, is_(False))
+    pool.release("ws", 0, {"id": "3", "rssMb": 600})
+    assert_that(processes, is_({}))
+    assert_that(pool.get_stats()["recycled"], is_(2))
+
+
+def test_idle_runners_are_stopped(processes):
+    """Runners without requests for idle_timeout seconds are stopped, busy ones are kept."""
+    pool = jsonrpc.RunnerPool(size=2, concurrency=1)
+    pool.set_limits(idle_timeout=60)
+    pool.acquire("ws", [sys.executable], "ws")
+    pool.acquire("ws", [sys.executable], "ws")
+    pool.release("ws", 0, {"id": "1"})
+
+    for runner in pool._runners["ws"]:  # pylint: disable=protected-access
+        runner.last_used -= 120
+    pool.evict_idle_runners()
+    assert_that(list(processes), is_(["ws#1"]))
+    assert_that(pool.get_stats()["evicted"], is_(1))
+
+
+def test_request_is_replayed_when_the_runner_crashes(tmp_path):
+    """A runner that exits with the request in flight is replaced and the request sent again."""
+    workspace = str(tmp_path)
+    (tmp_path / "crashing_module.py").write_text(
+        "import os\n"
+        "if not os.path.exists('crashed'):\n"
+        "    open('crashed', 'w').close()\n"
+        "    os._exit(1)\n\n"
+        "def f(x: int) -> int:\n"
+        "    return x\n",
+        encoding="utf-8",
+    )
+    params = {
+        "module": "crashing_module",
+        "functions": ["f"],
+        "argument": "",
+        "cwd": workspace,
+    }
+    result = jsonrpc.run_request_over_json_rpc(
+        workspace, [sys.executable], workspace, "ghostwrite", params, 60
+    )
+    assert_that("def test_" in result.stdout, is_(True))
+    assert_that((tmp_path / "crashed").exists(), is_(True))
+    jsonrpc.shutdown_json_rpc()
+
+
+def test_runner_that_cannot_start_is_not_started_again(tmp_path, monkeypatch):
+    """A runner that exits before it is ready fails its request, and the next requests
+    fail at once instead of starting it again, until the pool is started again."""
+    workspace = str(tmp_path)
+    interpreter = [sys.executable, "-c", "raise SystemExit(3)"]
+    starts = []
+    # pylint: disable-next=protected-access
+    start_process = jsonrpc._process_manager.start_process
+    monkeypatch.setattr(
+        jsonrpc._process_manager,  # pylint: disable=protected-access
+        "start_process",
+        lambda *args: starts.append(args) or start_process(*args),
+    )
+
+    pool = jsonrpc.RunnerPool(size=1)
+    for _ in range(3):
+        with pytest.raises(jsonrpc.RunnerStartError):
+            pool.acquire(workspace, interpreter, workspace)
+    assert_that(len(starts), is_(1))
+    assert_that(pool.get_stats()["runners"][workspace][0]["inFlight"], is_(0))
+    assert_that("code 3" in pool.get_stats()["startErrors"][workspace], is_(True))
+
+    with pytest.raises(jsonrpc.RunnerStartError):
+        pool.start(workspace, interpreter, workspace)
+    assert_that(len(starts), is_(2))
+
+
+def _get_oldest_interpreter():
+    """The oldest Python the runner supports (3.8): LS_TEST_OLDEST_PYTHON, or python3.8"""
+    for candidate in (os.getenv("LS_TEST_OLDEST_PYTHON"), shutil.which("python3.8")):
+        if not candidate:
+            continue
+        version = subprocess.run(
+            [candidate, "-c", "import sys; print(sys.version_info[:2])"],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        if version.returncode == 0 and version.stdout.strip() == "(3, 8)":
+            return candidate
+    return None
+
+
+def test_runner_modules_load_on_the_oldest_supported_interpreter():
+    """The runner runs under the workspace interpreter: what it imports must load on 3.8.
+    The runner itself is compiled, importing it would start serving requests."""
+    interpreter = _get_oldest_interpreter()
+    if interpreter is None:
+        pytest.skip("Python 3.8 not found, set LS_TEST_OLDEST_PYTHON")
+    tool = pathlib.Path(jsonrpc.__file__).parent
+    result = subprocess.run(
+        [
+            interpreter,
+            "-c",
+            "import lsp_jsonrpc, lsp_utils, auxiliary_files.ghostwriter_engine\n"
+            "compile(open('lsp_runner.py').read(), 'lsp_runner.py', 'exec')",
+        ],
+        cwd=tool,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    assert_that(result.stderr, is_(""))
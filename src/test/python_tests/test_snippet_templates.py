@@ -0,0 +1,56 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test for the snippet templates of the PBT types not supported by the ghostwriter.
+"""
+
+from auxiliary_files.snippet_generators import (
+    SnippetTemplate,
+    getSignatureDescriptor,
+    makeSnippet,
+)
+from hamcrest import assert_that, is_
+from pbt_types import PbtTypeId
+
+
+def test_template_is_filled_from_the_signature():
+    """Tab stops are numbered after the strategy placeholders of the @given arguments."""
+    snippet = makeSnippet(
+        PbtTypeId.WITHIN_EXPECTED_BOUNDS.value,
+        "def clamp(x, limit):\n    pass",
+        "numbers",
+        "clamp",
+    )
+
+    assert_that(
+        snippet,
+        is_(
+            "import unittest\nfrom hypothesis import given, strategies as st\nimport numbers\n\n"
+            "class TestWithinExpectedBoundsClamp(unittest.TestCase):\n\n"
+            "\t@given(x=st.nothing(), limit=st.nothing())\n"
+            "\tdef test_within_expected_bounds_clamp(self, x, limit):\n"
+            "\t\tlowerBound, upperBound = '${3:lowerBound}', '${4:upperBound}'\n"
+            "\t\toutput = numbers.clamp(x=x, limit=limit)\n"
+            "\t\tassert lowerBound <= output and output <= upperBound\n"
+        ),
+    )
+
+
+def test_extra_arguments_are_given_but_not_passed_to_the_sut():
+    """Arguments of the template only are in @given and the PBT signature."""
+    template = SnippetTemplate(
+        "@given({given})\ndef test({params}):\n\t{module}.{sut}({call}) == '{$:expected}'",
+        ("seed",),
+    )
+    signature = getSignatureDescriptor(
+        "def run(self, items):\n    pass", "cards", "Shuffle.run"
+    )
+
+    assert_that(
+        template.render(signature),
+        is_(
+            "@given(self=st.nothing(), items=st.nothing(), seed=st.nothing())\n"
+            "def test(self, items, seed):\n"
+            "\tcards.Shuffle.run(self=self, items=items) == '${4:expected}'"
+        ),
+    )
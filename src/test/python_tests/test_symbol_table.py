@@ -0,0 +1,71 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test for the symbol table used to look up SUTs.
+"""
+
+from auxiliary_files.other import getSutSourceList
+from auxiliary_files.symbol_table import getSymbolTable
+from hamcrest import assert_that, is_
+
+SOURCE = """def encode(s):
+    return s
+
+
+class Calculator:
+    total: int
+
+    def __init__(self, total):
+        self.total = total
+
+    def add(self, a, b):
+        return a + b
+
+    def sub(self, a, b):
+        return a - b
+
+
+def encode(s, strict=True):
+    return s
+"""
+
+
+def test_functions_and_methods_are_listed():
+    """Methods are named after their class; later definitions replace earlier ones."""
+    functions = getSymbolTable(SOURCE).getFunctions()
+
+    assert_that(
+        [(f["name"], f["lineStart"]) for f in functions],
+        is_(
+            [
+                ("encode", 18),
+                ("Calculator.__init__", 8),
+                ("Calculator.add", 11),
+                ("Calculator.sub", 14),
+            ]
+        ),
+    )
+
+
+def test_methods_come_with_a_minimal_class_stub():
+    """Only the method, the fields and the __init__ signature of its class are kept."""
+    (method,) = getSutSourceList(SOURCE, ["Calculator.add"])
+
+    assert_that(
+        method,
+        is_(
+            "class Calculator:\n\n"
+            "    def add(self, a, b):\n        return a + b\n"
+            "    total: int\n\n"
+            "    def __init__(self, total):\n        ..."
+        ),
+    )
+
+
+def test_line_ranges_pick_one_of_equally_named_functions():
+    """The line range sent by the client selects the definition the user picked."""
+    (first,) = getSutSourceList(SOURCE, ["encode"], [(1, 2)])
+    (last,) = getSutSourceList(SOURCE, ["encode"])
+
+    assert_that(first, is_("def encode(s):\n    return s"))
+    assert_that(last, is_("def encode(s, strict=True):\n    return s"))
@@ -0,0 +1,72 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Test for the workspace-wide function index.
+"""
+
+from auxiliary_files.workspace_index import WorkspaceIndex, WorkspaceIndexer
+from hamcrest import assert_that, is_
+
+
+def test_workspace_functions_are_indexed(tmp_path):
+    """All Python files are indexed, except those in ignored directories."""
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "__init__.py").write_text("")
+    (tmp_path / "pkg" / "codec.py").write_text(
+        "def encode(value: int) -> str:\n    return str(value)\n\n\n"
+        "class Codec:\n    def decode(self, text):\n        return int(text)\n"
+    )
+    (tmp_path / ".venv").mkdir()
+    (tmp_path / ".venv" / "ignored.py").write_text("def encode_ignored():\n    pass\n")
+
+    index = WorkspaceIndex(str(tmp_path))
+    index.scan(None)
+
+    assert_that(
+        [(f["module"], f["name"], f["signature"]) for f in index.getFunctions("code")],
+        is_(
+            [
+                ("pkg.codec", "encode", "(value: int) -> str"),
+                ("pkg.codec", "Codec.decode", "(self, text)"),
+            ]
+        ),
+    )
+
+
+def test_workspace_index_follows_file_changes(tmp_path):
+    """Changed files are re-indexed and deleted files dropped."""
+    module = tmp_path / "module.py"
+    module.write_text("def first():\n    pass\n")
+    index = WorkspaceIndex(str(tmp_path))
+    index.scan(None)
+
+    module.write_text("def second():\n    pass\n")
+    index.update(None, [str(module)])
+    assert_that([f["name"] for f in index.getFunctions()], is_(["second"]))
+
+    module.unlink()
+    index.remove([str(module)])
+    assert_that(index.getFunctions(), is_([]))
+
+
+def test_worker_processes_index_the_workspace(tmp_path):
+    """Files are parsed by the worker processes, which exit on shutdown."""
+    for number in range(5):
+        (tmp_path / f"module_{number}.py").write_text(
+            f"def function_{number}(x: int) -> int:\n    return x\n"
+        )
+    indexer = WorkspaceIndexer()
+    index = indexer.indexes[str(tmp_path)] = WorkspaceIndex(str(tmp_path))
+    index.scan(indexer._getExecutor())  # pylint: disable=protected-access
+    processes = [process for process, _ in indexer.executor.workers]
+    indexer.shutdown()
+
+    assert_that(
+        sorted(f["name"] for f in index.getFunctions()),
+        is_([f"function_{n}" for n in range(5)]),
+    )
+    assert_that(len(processes) > 0, is_(True))
+    assert_that(
+        [process.poll() is not None for process in processes],
+        is_([True] * len(processes)),
+    )